@@ -0,0 +1,64 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold start of the MCP servers and assistants: each import runs in a fresh interpreter so nothing is
+# served from sys.modules. The working directory is a throwaway one to catch import-time file writes
+MODULES = ["tfsa_mcp_server", "e_transfer_mcp_server", "tfsa_assistant", "e_transfer_assistant"]
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _env() -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.getenv("PYTHONPATH")])))
+    # Importing must not need credentials that only a search uses
+    env.pop("TAVILY_API_KEY", None)
+    return env
+
+
+def time_import(module: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cwd:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", f"import {module}"], cwd=cwd, env=_env(), check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+            leftovers = os.listdir(cwd)
+            if leftovers:
+                print(f"  WARNING: importing {module} wrote {leftovers}")
+    return timings
+
+
+def top_imports(module: str, top: int) -> list:
+    """(cumulative_us, name) of the slowest top-level imports, from python -X importtime"""
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd,
+                                env=_env(), check=True, capture_output=True, text=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only direct children of the measured module: deeper entries are already in their totals
+        if name.startswith("   ") and not name.startswith("    "):
+            entries.append((int(cumulative), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cold import time of the MCP servers and assistants")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        timings = time_import(module, args.runs)
+        print(f"{module}: median {statistics.median(timings) * 1000:.0f} ms, "
+              f"min {min(timings) * 1000:.0f} ms over {args.runs} runs")
+        for cumulative, name in top_imports(module, args.top):
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+import tfsa_assistant
+from tfsa_policy_snapshot import PolicySnapshotStore
+
+# Sequential vs parallel TFSA graph latency with every external call replaced by a stub that sleeps
+# for a fixed delay, so the difference is purely the graph shape
+
+
+class DelayedLLM:
+    """Answers the document and policy prompts after a fixed delay"""
+
+    def __init__(self, delay: float, needs_search: bool):
+        self.delay = delay
+        self.needs_search = needs_search
+
+    def _respond(self, prompt: str) -> AIMessage:
+        if "needs_current_search" in prompt:
+            return AIMessage(content=json.dumps({"policy_summary": "Stub summary",
+                                                 "needs_current_search": self.needs_search}))
+        return AIMessage(content=json.dumps({"current_limit": "$7,000", "penalty_info": "1% per month",
+                                             "withdrawal_rules": "Re-added next calendar year"}))
+
+    def invoke(self, prompt: str) -> AIMessage:
+        time.sleep(self.delay)
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        await asyncio.sleep(self.delay)
+        return self._respond(prompt)
+
+
+def install_stubs(profile_delay: float, search_delay: float, llm_delay: float, needs_search: bool):
+    profile = tfsa_assistant.retrieve_user_profile.invoke("user_123")
+
+    @tool
+    def retrieve_user_profile(user_id: str) -> dict:
+        """Stub profile lookup"""
+        time.sleep(profile_delay)
+        return profile
+
+    @tool
+    def search_cra_tfsa_policy(query: str) -> list:
+        """Stub policy search"""
+        time.sleep(search_delay)
+        return [{"content": "TFSA limit $7,000"}]
+
+    @tool
+    async def asearch_cra_tfsa_policy(query: str) -> list:
+        """Stub async policy search"""
+        await asyncio.sleep(search_delay)
+        return [{"content": "TFSA limit $7,000"}]
+
+    # The search must really run: no snapshot, no rules shortcut in document_agent
+    tfsa_assistant.retrieve_user_profile = retrieve_user_profile
+    tfsa_assistant.search_cra_tfsa_policy = search_cra_tfsa_policy
+    tfsa_assistant.asearch_cra_tfsa_policy = asearch_cra_tfsa_policy
+    tfsa_assistant.llm = DelayedLLM(llm_delay, needs_search)
+    tfsa_assistant.policy_snapshots = PolicySnapshotStore(path=None)
+    tfsa_assistant.TFSA_DOCUMENT_AGENT_MODE = "llm"
+
+
+def run_once(app, is_async: bool) -> float:
+    state = tfsa_assistant._initial_state("Can I contribute $500 to my TFSA?", "user_123")
+    start = time.perf_counter()
+    if is_async:
+        async def consume():
+            async for _ in app.astream(state):
+                pass
+
+        asyncio.run(consume())
+    else:
+        for _ in app.stream(state):
+            pass
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sequential and parallel TFSA graph latency")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--profile-ms", type=float, default=100)
+    parser.add_argument("--search-ms", type=float, default=400)
+    parser.add_argument("--llm-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    for needs_search in (True, False):
+        install_stubs(args.profile_ms / 1000, args.search_ms / 1000, args.llm_ms / 1000, needs_search)
+        print(f"document_agent needs_current_search={needs_search}")
+        for mode in ("sequential", "parallel"):
+            app = tfsa_assistant.build_workflow(mode).compile()
+            for is_async in (False, True):
+                timings = [run_once(app, is_async) for _ in range(args.runs)]
+                print(f"  {mode:<10} {'astream' if is_async else 'stream':<7} "
+                      f"median {statistics.median(timings) * 1000:6.0f} ms  min {min(timings) * 1000:6.0f} ms")
@@ -1,12 +1,24 @@
+import asyncio
 import datetime
+import functools
 import operator
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import TypedDict, Annotated, Optional
 
 from dotenv import load_dotenv
-from langchain.tools import tool
+from langchain_core.tools import tool
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 
+from etransfer_eligibility import ELIGIBILITY_RULES
+from fraud_scoring import fraud_scorer
+from llm_cache import cached_llm
+from single_flight import SingleFlight, coalesce
+from transaction_journal import journal
+
 load_dotenv('.env')
 
 # Configuration for Deepseek. Initialize DeepSeek LLM: pip install -U langchain-deepseek
@@ -15,13 +27,21 @@ load_dotenv('.env')
 # DEEPSEEK_API_KEY = os.environ['DEEPSEEK_API_KEY']
 # llm = ChatDeepSeek(model="deepseek-chat", temperature=0, api_key=DEEPSEEK_API_KEY)
 
-# Configuration for Ollama. Initialize Ollama with qwen2.5vl:7b model locally
-from langchain_ollama import ChatOllama
+# Configuration for Ollama. Initialize Ollama with qwen2.5vl:7b model locally, on first use
+llm = None
+
 
-llm = ChatOllama(
-    model="qwen2.5vl:7b",
-    # other params...
-    temperature=0)  # Use your preferred qwen2.5vl:7b variant
+def get_llm():
+    """LLM shared by the agents, constructed on first use so importing this module stays cheap"""
+    global llm
+    if llm is None:
+        from langchain_ollama import ChatOllama
+
+        llm = cached_llm(ChatOllama(
+            model="qwen2.5vl:7b",
+            # other params...
+            temperature=0))  # Use your preferred qwen2.5vl:7b variant
+    return llm
 
 
 # Configuration for Watsonx.ai
@@ -71,6 +91,7 @@ class AgentState(TypedDict):
     user_id: str
     user_profile: Optional[dict]
     current_limit: Optional[float]
+    eligibility: Optional[dict]
     eligibility_status: Optional[bool]
     eligibility_reason: Optional[str]
     new_limit: Optional[float]
@@ -80,7 +101,12 @@ class AgentState(TypedDict):
 # ======================
 # 2. Tool Definitions
 # ======================
+# Identical concurrent profile reads (page refreshes, polling front ends) share one lookup
+profile_reads = SingleFlight("etransfer_profile")
+
+
 @tool
+@coalesce(profile_reads, key=lambda user_id: user_id)
 def retrieve_user_profile(user_id: str) -> dict:
     """Retrieves user's profile from bank database"""
     return {
@@ -94,56 +120,40 @@ def retrieve_user_profile(user_id: str) -> dict:
     }
 
 
+def evaluate_eligibility(user_id: str, profile: dict) -> dict:
+    """Eligibility rules applied to an already retrieved profile"""
+    # Declarative rules and limit tiers, shared with the vectorized campaign evaluator. The streaming
+    # fraud scorer's current risk for the user is evaluated alongside the static fraud flags
+    return ELIGIBILITY_RULES.evaluate({**profile, "fraud_score": fraud_scorer.risk(user_id)})
+
+
 @tool
 def check_eligibility(user_id: str) -> dict:
     """Checks if user is eligible for e-Transfer limit increase"""
-    profile = retrieve_user_profile.invoke(user_id)
-
-    # Eligibility rules
-    eligible = True
-    reasons = []
-
-    if profile["account_age"] < 6:
-        eligible = False
-        reasons.append("Account must be at least 6 months old")
-
-    if profile["account_status"] != "active":
-        eligible = False
-        reasons.append("Account must be in active status")
-
-    if profile["kyc_status"] != "verified":
-        eligible = False
-        reasons.append("KYC verification required")
-
-    if profile["fraud_flags"] > 0:
-        eligible = False
-        reasons.append("Account has fraud flags")
-
-    return {
-        "eligible": eligible,
-        "reasons": reasons,
-        "max_possible_limit": 10000.00  # Based on account profile
-    }
+    return evaluate_eligibility(user_id, retrieve_user_profile.invoke(user_id))
 
 
 @tool
 def increase_etransfer_limit(user_id: str, new_limit: float) -> dict:
     """Executes e-Transfer limit increase in core banking system"""
-    # In real system, would integrate with core banking API
+    # In real system, would integrate with core banking API. Until then the durable journal is the
+    # system of record and issues the reference ID
+    fraud_score = fraud_scorer.observe(user_id, "etransfer_limit_increase", new_limit)
+    record = journal.append("etransfer_limit_increase", "LIMIT", {"user_id": user_id, "new_limit": new_limit,
+                                                                  "fraud_score": fraud_score})
     return {
         "success": True,
         "new_limit": new_limit,
-        "effective_date": datetime.datetime.now().isoformat(),
-        "reference_id": f"LIMIT-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        "effective_date": record["committed_at"],
+        "reference_id": record["id"],
+        "fraud_score": fraud_score
     }
 
 
 # ======================
 # 3. Agent Definitions
 # ======================
-def profile_agent(state: AgentState):
-    """Retrieves user profile and current limit"""
-    profile = retrieve_user_profile.invoke(state["user_id"])
+def _profile_update(profile: dict):
     return {
         "user_profile": profile,
         "current_limit": profile["current_etransfer_limit"],
@@ -154,12 +164,47 @@ def profile_agent(state: AgentState):
     }
 
 
-def eligibility_agent(state: AgentState):
-    """Determines eligibility for limit increase"""
-    result = check_eligibility.invoke(state["user_id"])
+def profile_agent(state: AgentState):
+    """Retrieves user profile and current limit"""
+    return _profile_update(retrieve_user_profile.invoke(state["user_id"]))
+
+
+async def aprofile_agent(state: AgentState):
+    """Async variant of profile_agent"""
+    return _profile_update(await retrieve_user_profile.ainvoke(state["user_id"]))
+
+
+# "concurrent" decides eligibility from the profile alone and generates the explanation and
+# confirmation with the LLM while the core banking call runs; "template" renders both texts without
+# an LLM; "sequential" makes the LLM calls one after another around the core banking call
+E_TRANSFER_RESPONSE_MODE = os.getenv("E_TRANSFER_RESPONSE_MODE", "concurrent")
+
+# Stands in for the reference ID in a confirmation generated before the core banking call returns
+REFERENCE_ID_PLACEHOLDER = "[REFERENCE_ID]"
+
+# Runs the core banking call and the LLM calls side by side for the sync graph (app.stream)
+_response_executor: Optional[ThreadPoolExecutor] = None
+_response_executor_lock = threading.Lock()
+
+
+def _get_response_executor() -> ThreadPoolExecutor:
+    # Created on the first concurrent response, so importing this module starts no threads
+    global _response_executor
+    with _response_executor_lock:
+        if _response_executor is None:
+            _response_executor = ThreadPoolExecutor(max_workers=int(os.getenv("E_TRANSFER_RESPONSE_WORKERS", "8")),
+                                                    thread_name_prefix="etransfer-response")
+        return _response_executor
+
 
+def _text(response) -> str:
+    # Chat models return an AIMessage, text models a str
+    return response.content if hasattr(response, "content") else response
+
+
+def _eligibility_prompt(state: AgentState, result: dict) -> str:
     # Generate natural language explanation
-    prompt = f"""
+    return f"""
     <|system|>
     You are a banking assistant explaining eligibility for e-Transfer limit increases.
     Eligibility result: {result['eligible']}
@@ -170,125 +215,364 @@ def eligibility_agent(state: AgentState):
     Provide a concise 1-2 sentence explanation for the user.
     </s>
     """
-    explanation = llm.invoke(prompt)
 
+
+def _eligibility_template(result: dict) -> str:
+    if result["eligible"]:
+        return (f"You meet all requirements for an e-Transfer limit increase "
+                f"(up to ${result['max_possible_limit']:.2f}).")
+    return f"You are not yet eligible for an e-Transfer limit increase: {'; '.join(result['reasons'])}."
+
+
+def _eligibility_update(result: dict, explanation: Optional[str]):
     return {
+        "eligibility": result,
         "eligibility_status": result["eligible"],
         "eligibility_reason": explanation,
         "messages": [{
             "role": "eligibility_agent",
-            "content": explanation
+            "content": explanation if explanation is not None else
+            f"Eligible: {result['eligible']} ({', '.join(result['reasons']) or 'all requirements met'})"
         }]
     }
 
 
-def limit_adjustment_agent(state: AgentState):
-    """Determines and applies new limit"""
-    if not state["eligibility_status"]:
-        return {
-            "messages": [{
-                "role": "assistant",
-                "content": "⚠️ Unable to increase limit: " + state["eligibility_reason"]
-            }]
-        }
-
-    # Calculate new limit (business logic)
-    profile = state["user_profile"]
-    result = check_eligibility.invoke(state["user_id"])
-    new_limit = min(
-        result["max_possible_limit"],
-        state["current_limit"] * 1.67  # Standard increase to $5k from $3k
-    )
+def _eligibility_explanation(state: AgentState, result: dict) -> Optional[str]:
+    # concurrent mode leaves the explanation to limit_adjustment_agent, off the critical path
+    if E_TRANSFER_RESPONSE_MODE == "template":
+        return _eligibility_template(result)
+    if E_TRANSFER_RESPONSE_MODE == "sequential":
+        return _text(get_llm().invoke(_eligibility_prompt(state, result)))
+    return None
+
+
+def eligibility_agent(state: AgentState):
+    """Determines eligibility for limit increase"""
+    # The profile is already in state, so the rules run without another lookup
+    result = evaluate_eligibility(state["user_id"], state["user_profile"])
+    return _eligibility_update(result, _eligibility_explanation(state, result))
+
+
+async def aeligibility_agent(state: AgentState):
+    """Async variant of eligibility_agent"""
+    result = evaluate_eligibility(state["user_id"], state["user_profile"])
+    if E_TRANSFER_RESPONSE_MODE == "sequential":
+        return _eligibility_update(result, _text(await get_llm().ainvoke(_eligibility_prompt(state, result))))
+    return _eligibility_update(result, _eligibility_explanation(state, result))
+
+
+def _ineligible_update(explanation: str):
+    return {
+        "eligibility_reason": explanation,
+        "messages": [{
+            "role": "assistant",
+            "content": "⚠️ Unable to increase limit: " + explanation
+        }]
+    }
+
+
+def retrieve_recent_etransfers(user_id: str) -> list:
+    """(timestamp, amount) of the e-Transfers the user sent in the last 30 days"""
+    # Mock implementation - replace with the payments history API
+    now = datetime.datetime.now().timestamp()
+    return [(now - 2 * 3600, 500.00), (now - 86400, 1200.00), (now - 3 * 86400, 2500.00), (now - 12 * 86400, 800.00)]
+
+
+def etransfer_usage(user_id: str) -> dict:
+    """Amounts sent in the last 24 hours / 7 days / 30 days and the busiest day of the 30"""
+    # Imported on first use: the tracker needs NumPy, which the rest of the assistant does not
+    from etransfer_usage import usage_tracker
+
+    usage_tracker.seed(user_id, lambda: retrieve_recent_etransfers(user_id))
+    return usage_tracker.usage(user_id)
 
-    # Execute limit increase
-    increase_result = increase_etransfer_limit.invoke({"user_id": state["user_id"], "new_limit": new_limit})
 
+def _new_limit(state: AgentState, result: dict) -> float:
+    # Calculate new limit (business logic): standard increase, e.g. to $5k from $3k, or enough for the
+    # customer's busiest recent day, capped at the tier maximum
+    usage = etransfer_usage(state["user_id"])
+    return ELIGIBILITY_RULES.new_limit(state["current_limit"], result["max_possible_limit"], usage["peak_day_30d"])
+
+
+def _no_increase_update(state: AgentState, new_limit: float):
+    # The tier maximum can sit below a limit the customer already has; never lower it
+    return _ineligible_update(f"Your current limit of ${state['current_limit']:.2f} is already at or above the "
+                              f"${new_limit:.2f} available for your account")
+
+
+def _confirmation_prompt(state: AgentState, new_limit: float, reference_id: str) -> str:
     # Generate confirmation message
-    prompt = f"""
+    return f"""
     <|system|>
     You are a banking assistant confirming a successful e-Transfer limit increase.
     Details:
     - Previous limit: ${state['current_limit']:.2f}
     - New limit: ${new_limit:.2f}
     - Effective immediately
-    - Reference ID: {increase_result['reference_id']}
+    - Reference ID: {reference_id}
 
     Create a friendly confirmation message with emojis.
     </s>
     """
-    confirmation = llm.invoke(prompt)
 
-    return {
+
+def _confirmation_template(state: AgentState, new_limit: float, reference_id: str) -> str:
+    return (f"✅ Your e-Transfer limit has been increased from ${state['current_limit']:.2f} to "
+            f"${new_limit:.2f}, effective immediately. Reference ID: {reference_id}")
+
+
+def _fill_reference_id(confirmation: str, reference_id: str) -> str:
+    # The confirmation was written before the core banking call returned the real ID
+    if REFERENCE_ID_PLACEHOLDER in confirmation:
+        return confirmation.replace(REFERENCE_ID_PLACEHOLDER, reference_id)
+    return f"{confirmation}\nReference ID: {reference_id}"
+
+
+def _outcome(draft):
+    # A finished future or task's result, or the exception it raised
+    return draft.exception() or draft.result()
+
+
+def _committed_update(state: AgentState, result: dict, new_limit: float, reference_id: str,
+                      confirmation, explanation) -> dict:
+    # The increase has committed, so a failed LLM draft falls back to the template instead of
+    # failing the request
+    if isinstance(confirmation, BaseException):
+        confirmation = _confirmation_template(state, new_limit, reference_id)
+    else:
+        confirmation = _fill_reference_id(_text(confirmation), reference_id)
+    if isinstance(explanation, BaseException):
+        explanation = state["eligibility_reason"] or _eligibility_template(result)
+    else:
+        explanation = _text(explanation)
+    return _limit_update(new_limit, confirmation, explanation)
+
+
+def _limit_update(new_limit: float, confirmation: str, explanation: Optional[str] = None):
+    update = {
         "new_limit": new_limit,
         "messages": [{
             "role": "assistant",
             "content": confirmation
         }]
     }
+    if explanation is not None:
+        update["eligibility_reason"] = explanation
+        update["messages"].insert(0, {"role": "eligibility_agent", "content": explanation})
+    return update
+
+
+def limit_adjustment_agent(state: AgentState):
+    """Determines and applies new limit"""
+    result = state["eligibility"]
+    if E_TRANSFER_RESPONSE_MODE == "concurrent":
+        explanation = _get_response_executor().submit(lambda: get_llm().invoke(_eligibility_prompt(state, result)))
+        if not state["eligibility_status"]:
+            return _ineligible_update(_text(explanation.result()))
+
+        new_limit = _new_limit(state, result)
+        if new_limit <= state["current_limit"]:
+            explanation.cancel()
+            return _no_increase_update(state, new_limit)
+        # The confirmation is drafted while the core banking call runs
+        confirmation = _get_response_executor().submit(lambda: get_llm().invoke(
+            _confirmation_prompt(state, new_limit, REFERENCE_ID_PLACEHOLDER)))
+        try:
+            increase_result = increase_etransfer_limit.invoke({"user_id": state["user_id"], "new_limit": new_limit})
+        except BaseException:
+            explanation.cancel()
+            confirmation.cancel()
+            raise
+        return _committed_update(state, result, new_limit, increase_result["reference_id"],
+                                 _outcome(confirmation), _outcome(explanation))
+
+    if not state["eligibility_status"]:
+        return _ineligible_update(state["eligibility_reason"])
+
+    new_limit = _new_limit(state, result)
+    if new_limit <= state["current_limit"]:
+        return _no_increase_update(state, new_limit)
+
+    # Execute limit increase
+    increase_result = increase_etransfer_limit.invoke({"user_id": state["user_id"], "new_limit": new_limit})
+    if E_TRANSFER_RESPONSE_MODE == "template":
+        return _limit_update(new_limit, _confirmation_template(state, new_limit, increase_result["reference_id"]))
+    try:
+        confirmation = _text(get_llm().invoke(_confirmation_prompt(state, new_limit, increase_result["reference_id"])))
+    except Exception:
+        confirmation = _confirmation_template(state, new_limit, increase_result["reference_id"])
+    return _limit_update(new_limit, confirmation)
+
+
+async def alimit_adjustment_agent(state: AgentState):
+    """Async variant of limit_adjustment_agent"""
+    result = state["eligibility"]
+    if E_TRANSFER_RESPONSE_MODE == "concurrent":
+        # Started right away so the explanation overlaps the limit calculation and core banking call
+        explanation = asyncio.create_task(get_llm().ainvoke(_eligibility_prompt(state, result)))
+        if not state["eligibility_status"]:
+            return _ineligible_update(_text(await explanation))
+
+        try:
+            new_limit = _new_limit(state, result)
+            if new_limit <= state["current_limit"]:
+                explanation.cancel()
+                return _no_increase_update(state, new_limit)
+            # A failed draft is returned, not raised, so it cannot mask a committed increase
+            confirmation, increase_result = await asyncio.gather(
+                get_llm().ainvoke(_confirmation_prompt(state, new_limit, REFERENCE_ID_PLACEHOLDER)),
+                increase_etransfer_limit.ainvoke({"user_id": state["user_id"], "new_limit": new_limit}),
+                return_exceptions=True)
+            if isinstance(increase_result, BaseException):
+                raise increase_result
+        except BaseException:
+            explanation.cancel()
+            raise
+        await asyncio.wait([explanation])
+        return _committed_update(state, result, new_limit, increase_result["reference_id"],
+                                 confirmation, _outcome(explanation))
+
+    if not state["eligibility_status"]:
+        return _ineligible_update(state["eligibility_reason"])
+
+    new_limit = _new_limit(state, result)
+    if new_limit <= state["current_limit"]:
+        return _no_increase_update(state, new_limit)
+
+    increase_result = await increase_etransfer_limit.ainvoke({"user_id": state["user_id"], "new_limit": new_limit})
+    if E_TRANSFER_RESPONSE_MODE == "template":
+        return _limit_update(new_limit, _confirmation_template(state, new_limit, increase_result["reference_id"]))
+    try:
+        confirmation = _text(await get_llm().ainvoke(
+            _confirmation_prompt(state, new_limit, increase_result["reference_id"])))
+    except Exception:
+        confirmation = _confirmation_template(state, new_limit, increase_result["reference_id"])
+    return _limit_update(new_limit, confirmation)
 
 
 # ======================
 # 4. Graph Construction
 # ======================
-workflow = StateGraph(AgentState)
+def build_workflow() -> StateGraph:
+    workflow = StateGraph(AgentState)
+
+    # Define nodes. Each node has a sync body for app.stream and an async body for app.astream
+    workflow.add_node("profile_agent", RunnableLambda(profile_agent, afunc=aprofile_agent))
+    workflow.add_node("eligibility_agent", RunnableLambda(eligibility_agent, afunc=aeligibility_agent))
+    workflow.add_node("limit_adjustment_agent", RunnableLambda(limit_adjustment_agent, afunc=alimit_adjustment_agent))
 
-# Define nodes
-workflow.add_node("profile_agent", profile_agent)
-workflow.add_node("eligibility_agent", eligibility_agent)
-workflow.add_node("limit_adjustment_agent", limit_adjustment_agent)
+    # Define edges
+    workflow.set_entry_point("profile_agent")
+    workflow.add_edge("profile_agent", "eligibility_agent")
+    workflow.add_edge("eligibility_agent", "limit_adjustment_agent")
+    workflow.add_edge("limit_adjustment_agent", END)
+    return workflow
 
-# Define edges
-workflow.set_entry_point("profile_agent")
-workflow.add_edge("profile_agent", "eligibility_agent")
-workflow.add_edge("eligibility_agent", "limit_adjustment_agent")
-workflow.add_edge("limit_adjustment_agent", END)
 
-# Compile the graph
-app = workflow.compile()
+@functools.lru_cache(maxsize=None)
+def get_app():
+    """Compiled graph, built on first use"""
+    return build_workflow().compile()
 
-png_graph = app.get_graph().draw_mermaid_png()
-with open("e_transfer_graph.png", "wb") as f:
-    f.write(png_graph)
 
-print(f"Graph saved as 'e_transfer_graph.png' in {os.getcwd()}")
+def build_limit_workflow() -> StateGraph:
+    """Read-only pipeline that stops at current_limit: profile_agent only.
+
+    A limit check never reaches eligibility_agent (LLM explanation) or limit_adjustment_agent
+    (which would call increase_etransfer_limit).
+    """
+    workflow = StateGraph(AgentState)
+    workflow.add_node("profile_agent", RunnableLambda(profile_agent, afunc=aprofile_agent))
+    workflow.set_entry_point("profile_agent")
+    workflow.add_edge("profile_agent", END)
+    return workflow
+
+
+@functools.lru_cache(maxsize=None)
+def get_limit_app():
+    """Compiled limit-only graph, built on first use"""
+    return build_limit_workflow().compile()
+
+
+def render_graph(path: str = "e_transfer_graph.png"):
+    """Render the workflow as a Mermaid PNG (only when explicitly requested)"""
+    png_graph = get_app().get_graph().draw_mermaid_png()
+    with open(path, "wb") as f:
+        f.write(png_graph)
+
+    print(f"Graph saved as '{path}' in {os.getcwd()}")
 
 
 # ======================
 # 5. Execution Function
 # ======================
-def run_etransfer_limit_increase(user_input: str, user_id: str = "user_456"):
-    """Run the agent workflow for limit increase"""
-    state = {
+def _initial_state(user_input: str, user_id: str) -> AgentState:
+    return {
         "user_input": user_input,
         "user_id": user_id,
         "user_profile": None,
         "current_limit": None,
+        "eligibility": None,
         "eligibility_status": None,
         "eligibility_reason": None,
         "new_limit": None,
         "messages": []
     }
 
+
+def _print_step(node_name: str, node_output: dict):
+    # Print node output (concurrent mode's limit_adjustment_agent emits the explanation too)
+    for msg in node_output.get('messages') or []:
+        print(f"🔹 [{node_name.upper()}]: {msg['content']}")
+
+
+def run_etransfer_limit_increase(user_input: str, user_id: str = "user_456"):
+    """Run the agent workflow for limit increase"""
+    state = _initial_state(user_input, user_id)
+
     print(f"\n🔹 USER REQUEST: '{user_input}'")
     accumulated_state = state.copy()
     # Execute workflow
-    for step in app.stream(state):
+    for step in get_app().stream(state):
         for node_name, node_output in step.items():
             # Update accumulated state with node value
             accumulated_state.update(node_output)
+            _print_step(node_name, node_output)
+
+    return accumulated_state
+
 
-            # Print node output
-            if 'messages' in node_output and node_output['messages']:
-                msg = node_output['messages'][-1]
-                print(f"🔹 [{node_name.upper()}]: {msg['content']}")
+async def arun_etransfer_limit_increase(user_input: str, user_id: str = "user_456"):
+    """Run the limit increase workflow on the event loop with async LLM and tool calls"""
+    state = _initial_state(user_input, user_id)
+
+    print(f"\n🔹 USER REQUEST: '{user_input}'")
+    accumulated_state = state.copy()
+    async for step in get_app().astream(state):
+        for node_name, node_output in step.items():
+            accumulated_state.update(node_output)
+            _print_step(node_name, node_output)
 
     return accumulated_state
 
 
+def run_current_limit(user_id: str = "user_456") -> AgentState:
+    """Final state of the read-only limit pipeline (current_limit and user_profile)"""
+    return get_limit_app().invoke(_initial_state("What's my e-Transfer limit?", user_id))
+
+
+async def arun_current_limit(user_id: str = "user_456") -> AgentState:
+    """Async variant of run_current_limit"""
+    return await get_limit_app().ainvoke(_initial_state("What's my e-Transfer limit?", user_id))
+
+
 # ======================
 # 6. Example Usage
 # ======================
 if __name__ == "__main__":
+    if "--render-graph" in sys.argv:
+        render_graph()
+
     print("===== E-TRANSFER LIMIT INCREASE ASSISTANT =====")
     final_state = run_etransfer_limit_increase("How do I increase my e-Transfer limit?")
 
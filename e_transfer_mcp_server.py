@@ -1,10 +1,17 @@
 import re
 from datetime import datetime
-from typing import Dict, Annotated
+from typing import Dict, Annotated, Optional
 
 from mcp.server.fastmcp import FastMCP
 
-from e_transfer_assistant import run_etransfer_limit_increase
+from e_transfer_assistant import (arun_current_limit, arun_etransfer_limit_increase, profile_reads, run_current_limit,
+                                  run_etransfer_limit_increase)
+from fraud_scoring import fraud_scorer
+from idempotency import IdempotencyStore
+from llm_cache import llm_response_cache
+from mcp_server_runtime import BoundedExecutor, create_http_app as create_mcp_http_app, parse_server_args, run_server
+from single_flight import SingleFlight
+from transaction_journal import journal
 
 # ... (Keep all your existing agent code above) ...
 
@@ -17,6 +24,17 @@ mcp = FastMCP(
     version="1.0.0"
 )
 
+# Workflow runs use the async graph on the event loop, or the sync graph on a thread/process pool
+workflow_executor = BoundedExecutor()
+etransfer_workflow = workflow_executor.select(run_etransfer_limit_increase, arun_etransfer_limit_increase)
+# Limit checks only need profile_agent; the full graph would go on to increase the limit
+limit_workflow = workflow_executor.select(run_current_limit, arun_current_limit)
+
+# Bursts of identical limit checks for a user share one workflow run. Writes are never coalesced
+limit_reads = SingleFlight("etransfer_limit")
+# Increases sent with an idempotency key run once per key; retries replay the stored result
+limit_writes = IdempotencyStore("limit_increase")
+
 
 # ==============================================
 # resources, tools, and prompts to be added here
@@ -29,10 +47,10 @@ mcp = FastMCP(
 # Tools
 # ======
 @mcp.tool()
-def check_e_transfer_limit(user_id: Annotated[str, "bank user ID"]) -> Dict:
+async def check_e_transfer_limit(user_id: Annotated[str, "bank user ID"]) -> Dict:
     """Check user's e-Transfer limit?"""
     try:
-        result = run_etransfer_limit_increase("What's my e-Transfer limit??", user_id)
+        result = await limit_reads.ado(user_id, workflow_executor.run, limit_workflow, user_id)
         return {
             "current_limit": result.get("current_limit"),
             "user_id": user_id,
@@ -46,36 +64,48 @@ def check_e_transfer_limit(user_id: Annotated[str, "bank user ID"]) -> Dict:
         }
 
 
-@mcp.tool()
-def increase_limit(user_input: Annotated[str, "User input contains a contribution transaction amount"],
-                   user_id: Annotated[str, "bank user ID"]) -> Dict:
-    """Endpoint for e-Transfer limit increase requests"""
-    try:
-        # Execute agent workflow
-        result = run_etransfer_limit_increase(user_input, user_id)
+async def _increase_limit(user_input: str, user_id: str) -> Dict:
+    # Execute agent workflow
+    result = await workflow_executor.run(etransfer_workflow, user_input, user_id)
 
-        # Extract final message
-        final_message = result["messages"][-1]["content"] if result.get("messages") else "No response generated"
+    # Extract final message
+    final_message = result["messages"][-1]["content"] if result.get("messages") else "No response generated"
 
-        # Prepare response
-        if result.get("new_limit"):
-            success = "✅" in final_message
+    # Prepare response
+    if result.get("new_limit"):
+        success = "✅" in final_message
 
-            return {
-                "success": success,
-                "user_id": user_id,
-                "new_limit": result["new_limit"],
-                "response": final_message,
-                "transaction_id": re.search(r"LIMIT-\S+", final_message).group() if "LIMIT" in final_message else None,
-                "timestamp": datetime.now().isoformat()
-            }
-        else:
-            return {
-                "error": result.get("eligibility_reason", "Eligibility check failed"),
-                "user_id": user_id,
-                "response": final_message,
-                "timestamp": datetime.now().isoformat()
-            }
+        return {
+            "success": success,
+            "user_id": user_id,
+            "new_limit": result["new_limit"],
+            "response": final_message,
+            "transaction_id": re.search(r"LIMIT-\S+", final_message).group() if "LIMIT" in final_message else None,
+            "timestamp": datetime.now().isoformat()
+        }
+    else:
+        return {
+            "error": result.get("eligibility_reason", "Eligibility check failed"),
+            "user_id": user_id,
+            "response": final_message,
+            "timestamp": datetime.now().isoformat()
+        }
+
+
+@mcp.tool()
+async def increase_limit(user_input: Annotated[str, "User input contains a contribution transaction amount"],
+                   user_id: Annotated[str, "bank user ID"],
+                   idempotency_key: Annotated[Optional[str], "Optional unique key for this request; "
+                                              "send the same key when retrying"] = None) -> Dict:
+    """Endpoint for e-Transfer limit increase requests"""
+    try:
+        if not idempotency_key:
+            return await _increase_limit(user_input, user_id)
+        # A retry with the same key gets the original result back without re-running the workflow
+        outcome = await limit_writes.arun(f"{user_id}:{idempotency_key}",
+                                          {"user_input": user_input, "user_id": user_id},
+                                          _increase_limit, user_input, user_id)
+        return {**outcome["result"], "idempotency_key": idempotency_key, "idempotent_replay": outcome["replayed"]}
 
     except Exception as e:
         return {
@@ -86,13 +116,13 @@ def increase_limit(user_input: Annotated[str, "User input contains a contributio
 
 
 @mcp.resource("etransfer-service://{user_input}/{user_id}")
-def handle_etransfer_request(user_input: str, user_id: str = "user_456") -> Dict:
+async def handle_etransfer_request(user_input: str, user_id: str = "user_456") -> Dict:
     """Endpoint for handling e-Transfer related requests"""
     print(
         f"[{datetime.now().isoformat()}] Resource called: handle_etransfer_request with parameters: user_input='{user_input}', user_id='{user_id}'")
     try:
         # Execute workflow
-        result = run_etransfer_limit_increase(user_input, user_id)
+        result = await workflow_executor.run(etransfer_workflow, user_input, user_id)
 
         # Prepare response
         if result.get("new_limit"):
@@ -115,7 +145,53 @@ def handle_etransfer_request(user_input: str, user_id: str = "user_456") -> Dict
         }
 
 
+@mcp.resource("etransfer-metrics://executor")
+def get_executor_metrics() -> Dict:
+    """Concurrency limit, in-flight runs and queue depth of the workflow executor"""
+    return {**workflow_executor.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("etransfer-metrics://llm-cache")
+def get_llm_cache_metrics() -> Dict:
+    """Hit rate of the shared LLM response cache"""
+    return {**llm_response_cache.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("etransfer-metrics://journal")
+def get_journal_metrics() -> Dict:
+    """Group commit statistics of the durable transaction journal"""
+    return {**journal.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("etransfer-metrics://idempotency")
+def get_idempotency_metrics() -> Dict:
+    """How many keyed limit increase retries were replayed instead of re-executed"""
+    return {**limit_writes.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("etransfer-metrics://fraud")
+def get_fraud_metrics() -> Dict:
+    """Transactions scored and flagged by the streaming fraud scorer"""
+    return {**fraud_scorer.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("etransfer-metrics://single-flight")
+def get_single_flight_metrics() -> Dict:
+    """How many identical read calls were coalesced or served from the short result cache"""
+    return {
+        "etransfer_limit": limit_reads.stats(),
+        "user_profile": profile_reads.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def create_http_app():
+    """App factory used by uvicorn for the streamable HTTP transport"""
+    return create_mcp_http_app(mcp)
+
+
 if __name__ == "__main__":
+    args = parse_server_args("e-transfer Assistant MCP Server", default_port=8002)
     print("Starting e-transfer Assistant MCP Server...")
     # Initialize and run the server
-    mcp.run(transport='stdio')
+    run_server(mcp, "e_transfer_mcp_server:create_http_app", args)
@@ -0,0 +1,116 @@
+import argparse
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+from etransfer_eligibility import ELIGIBILITY_RULES, EligibilityRules
+from etransfer_usage import usage_tracker
+
+
+# ======================
+# 1. Data Access
+# ======================
+def retrieve_user_profiles_batch(user_ids: np.ndarray) -> Dict[str, np.ndarray]:
+    """Retrieves the eligibility-related profile fields for many users as columns"""
+    # Mock implementation - replace with a columnar warehouse/DB export
+    n = len(user_ids)
+    return {
+        "account_age": np.full(n, 18, dtype=np.int64),
+        "account_status": np.full(n, "active"),
+        "kyc_status": np.full(n, "verified"),
+        "fraud_flags": np.zeros(n, dtype=np.int64),
+        "fraud_score": np.zeros(n),
+        "avg_balance": np.full(n, 15000.0),
+        "current_etransfer_limit": np.full(n, 3000.0),
+    }
+
+
+def peak_daily_usage_batch(user_ids: np.ndarray) -> np.ndarray:
+    """Busiest day of the last 30 for each user, from the shared e-Transfer usage tracker"""
+    # Not registered: limit_adjustment_agent must still seed their history on first contact
+    return usage_tracker.usage_batch(user_ids, register=False)["peak_day_30d"]
+
+
+# ======================
+# 2. Campaign Evaluation
+# ======================
+def run_limit_increase_campaign(user_ids: Iterable[str], chunk_size: int = 100_000,
+                                rules: Optional[EligibilityRules] = None,
+                                profile_loader: Callable[[np.ndarray], Dict[str, np.ndarray]]
+                                = retrieve_user_profiles_batch,
+                                usage_loader: Callable[[np.ndarray], np.ndarray]
+                                = peak_daily_usage_batch) -> Iterator[Dict[str, np.ndarray]]:
+    """Pre-approves e-Transfer limit increases for many users, yielding one chunk at a time.
+
+    Each chunk is one columnar profile load, one usage load and the vectorized eligibility
+    rules, and only contains users who are eligible and would actually get a higher limit.
+    The new limit uses the same rules and busiest-day usage as limit_adjustment_agent. The
+    default usage_loader reads the usage tracker, where users whose recent e-Transfers have
+    not been loaded yet count as having no usage; point it at a payments history export to
+    size their limits the way the agent will.
+    """
+    rules = rules or ELIGIBILITY_RULES
+    user_ids = np.asarray(user_ids)
+
+    for start in range(0, len(user_ids), chunk_size):
+        chunk_ids = user_ids[start:start + chunk_size]
+        profiles = profile_loader(chunk_ids)
+        result = rules.evaluate_batch(profiles)
+        current_limit = np.asarray(profiles["current_etransfer_limit"], dtype=np.float64)
+        new_limit = rules.new_limit(current_limit, result["max_possible_limit"], usage_loader(chunk_ids))
+        selected = result["eligible"] & (new_limit > current_limit)
+        yield {
+            "user_id": chunk_ids[selected],
+            "current_limit": current_limit[selected],
+            "new_limit": new_limit[selected],
+        }
+
+
+# ======================
+# 3. Benchmark
+# ======================
+def synthetic_profiles(user_ids: np.ndarray) -> Dict[str, np.ndarray]:
+    """Randomized but plausible profiles for benchmarking"""
+    rng = np.random.default_rng(len(user_ids))
+    n = len(user_ids)
+    return {
+        "account_age": rng.integers(0, 240, n),
+        "account_status": rng.choice(np.array(["active", "dormant", "closed"]), n, p=[0.9, 0.07, 0.03]),
+        "kyc_status": rng.choice(np.array(["verified", "pending"]), n, p=[0.95, 0.05]),
+        "fraud_flags": rng.binomial(3, 0.01, n),
+        "fraud_score": rng.beta(1, 12, n),
+        "avg_balance": rng.lognormal(9, 1.2, n).round(2),
+        "current_etransfer_limit": rng.choice(np.array([1000.0, 3000.0, 5000.0, 10000.0]), n),
+    }
+
+
+def _rows(columns: Dict[str, np.ndarray]) -> Iterator[Dict]:
+    for i in range(len(next(iter(columns.values())))):
+        yield {field: column[i].item() for field, column in columns.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized e-Transfer limit increase campaign")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    user_ids = np.array([f"user_{i}" for i in range(args.users)])
+    start = time.perf_counter()
+    approved = 0
+    for chunk in run_limit_increase_campaign(user_ids, args.chunk_size, profile_loader=synthetic_profiles):
+        approved += len(chunk["user_id"])
+    elapsed = time.perf_counter() - start
+    print(f"Evaluated {args.users:,} users in {elapsed:.2f}s ({args.users / elapsed:,.0f} users/second), "
+          f"{approved:,} pre-approved")
+
+    # Same rules through the per-user path used by eligibility_agent, on a sample
+    sample = synthetic_profiles(user_ids[:min(args.users, 100_000)])
+    start = time.perf_counter()
+    per_user = [ELIGIBILITY_RULES.evaluate(profile) for profile in _rows(sample)]
+    elapsed = time.perf_counter() - start
+    print(f"Per-user evaluate(): {len(per_user) / elapsed:,.0f} users/second")
+    batch = ELIGIBILITY_RULES.evaluate_batch(sample)
+    assert [result["eligible"] for result in per_user] == batch["eligible"].tolist()
+    assert [result["max_possible_limit"] for result in per_user] == batch["max_possible_limit"].tolist()
@@ -0,0 +1,137 @@
+import json
+import operator
+import os
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv('.env')
+
+# Eligibility rules and limit tiers. Campaigns and policy changes edit this file (or point
+# E_TRANSFER_ELIGIBILITY_RULES_FILE at another one) without a code change
+E_TRANSFER_ELIGIBILITY_RULES_FILE = os.getenv(
+    "E_TRANSFER_ELIGIBILITY_RULES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "etransfer_eligibility_rules.json"))
+
+# Comparison operators; each works on a scalar profile field and elementwise on a NumPy column
+OPERATORS = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "in": lambda field, values: field in values,
+}
+
+
+class Condition:
+    """One `field op value` test, e.g. account_age >= 6"""
+
+    def __init__(self, field: str, op: str, value: Any, reason: str = ""):
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator {op!r} in eligibility rule for {field!r}")
+        self.field = field
+        self.op = op
+        self.value = value
+        self.reason = reason or f"{field} must be {op} {value}"
+        self.test = OPERATORS[op]
+
+    def holds(self, profile: Dict) -> bool:
+        return bool(self.test(profile[self.field], self.value))
+
+    def holds_batch(self, columns: Dict):
+        """Boolean mask over a columnar batch"""
+        import numpy as np
+
+        column = np.asarray(columns[self.field])
+        if self.op == "in":
+            return np.isin(column, list(self.value))
+        return np.asarray(self.test(column, self.value), dtype=bool)
+
+
+class EligibilityRules:
+    """Declarative e-Transfer limit increase rules compiled for one profile or a columnar batch.
+
+    `rules` must all hold for a user to be eligible; each failing rule contributes its reason.
+    `limit_tiers` are tried in order and the first whose conditions all hold sets the maximum
+    possible limit (a tier without conditions is the default). evaluate() serves
+    eligibility_agent; evaluate_batch() applies the same rules to whole NumPy columns for
+    campaigns.
+    """
+
+    def __init__(self, rules: List[Dict], limit_tiers: List[Dict], increase_factor: float = 1.67,
+                 usage_headroom: float = 1.25):
+        self.rules = [Condition(**rule) for rule in rules]
+        if len(self.rules) > 32:
+            raise ValueError("At most 32 eligibility rules fit the failed-rule bitmask")
+        self.tiers = [(float(tier["max_limit"]), [Condition(**condition) for condition in tier.get("when", [])])
+                      for tier in limit_tiers]
+        self.increase_factor = increase_factor
+        self.usage_headroom = usage_headroom
+
+    def threshold(self, field: str) -> Optional[Any]:
+        """Value the first rule on `field` compares against (e.g. the fraud_score cutoff), or None"""
+        return next((rule.value for rule in self.rules if rule.field == field), None)
+
+    def max_possible_limit(self, profile: Dict) -> float:
+        for max_limit, conditions in self.tiers:
+            if all(condition.holds(profile) for condition in conditions):
+                return max_limit
+        return 0.0
+
+    def evaluate(self, profile: Dict) -> Dict:
+        """{"eligible", "reasons", "max_possible_limit"} for one profile"""
+        reasons = [rule.reason for rule in self.rules if not rule.holds(profile)]
+        return {
+            "eligible": not reasons,
+            "reasons": reasons,
+            "max_possible_limit": self.max_possible_limit(profile),
+        }
+
+    def evaluate_batch(self, columns: Dict) -> Dict:
+        """Vectorized evaluate() over equal-length columns.
+
+        Returns NumPy arrays: `eligible`, `failed_rules` (bit i set when rules[i] failed; decode
+        with reasons()) and `max_possible_limit`.
+        """
+        # NumPy is only needed for batch runs, so importing the assistant stays light
+        import numpy as np
+
+        n = len(next(iter(columns.values())))
+        failed = np.zeros(n, dtype=np.uint32)
+        for bit, rule in enumerate(self.rules):
+            failed |= (~rule.holds_batch(columns)).astype(np.uint32) << np.uint32(bit)
+
+        tier_masks = [np.logical_and.reduce([condition.holds_batch(columns) for condition in conditions])
+                      if conditions else np.ones(n, dtype=bool)
+                      for _, conditions in self.tiers]
+        return {
+            "eligible": failed == 0,
+            "failed_rules": failed,
+            "max_possible_limit": np.select(tier_masks, [max_limit for max_limit, _ in self.tiers], default=0.0),
+        }
+
+    def reasons(self, failed_rules: int) -> List[str]:
+        """Reasons for one entry of evaluate_batch()["failed_rules"]"""
+        return [rule.reason for bit, rule in enumerate(self.rules) if int(failed_rules) >> bit & 1]
+
+    def new_limit(self, current_limit, max_possible_limit, peak_daily_usage=0.0):
+        """Standard increase (current limit x increase_factor), or more when the busiest recent day
+        (x usage_headroom) needs it, capped at the tier maximum (scalar or array). The cap can put
+        it at or below current_limit; callers only apply it when it is higher."""
+        proposed = current_limit * self.increase_factor
+        needed = peak_daily_usage * self.usage_headroom
+        if isinstance(proposed, (int, float)) and isinstance(needed, (int, float)):
+            return min(max_possible_limit, max(proposed, needed))
+        import numpy as np
+
+        return np.minimum(max_possible_limit, np.maximum(proposed, needed))
+
+
+def load_eligibility_rules(path: str = E_TRANSFER_ELIGIBILITY_RULES_FILE) -> EligibilityRules:
+    with open(path) as f:
+        return EligibilityRules(**json.load(f))
+
+
+ELIGIBILITY_RULES = load_eligibility_rules()
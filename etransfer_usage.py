@@ -0,0 +1,269 @@
+import argparse
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+HOURS = 24
+DAYS = 30
+WEEK = 7
+
+
+def _advance(ring: np.ndarray, epoch: np.ndarray, rows: np.ndarray, now: np.ndarray):
+    """Move each row's ring forward to bucket `now`, zeroing the buckets that left the window"""
+    width = ring.shape[1]
+    last = epoch[rows]
+    gap = now - last
+    lapped = gap >= width
+    if lapped.any():
+        ring[rows[lapped]] = 0
+    partial = (gap > 0) & ~lapped
+    if partial.any():
+        moved, moved_last, moved_gap = rows[partial], last[partial], gap[partial]
+        for k in range(1, int(moved_gap.max()) + 1):
+            cleared = moved_gap >= k
+            ring[moved[cleared], (moved_last[cleared] + k) % width] = 0
+    epoch[rows] = np.maximum(last, now)
+
+
+def _advance_one(ring_row: np.ndarray, last: int, now: int) -> int:
+    """Scalar _advance for one row; returns the new epoch"""
+    width = len(ring_row)
+    if now <= last:
+        return last
+    if now - last >= width:
+        ring_row[:] = 0
+    else:
+        for bucket in range(last + 1, now + 1):
+            ring_row[bucket % width] = 0
+    return now
+
+
+class UsageTracker:
+    """Sliding-window e-Transfer amounts sent per user over the last 24 hours, 7 days and 30 days.
+
+    Each user is one row of two ring buffers of int32 cents, 24 hourly and 30 daily (UTC)
+    buckets, plus the hour and day each ring was last advanced to: 224 bytes per user. Recording
+    a transfer zeroes the buckets that left the window since the user's previous update (each
+    bucket at most once per lap) and adds to the current bucket, so updates are O(1) amortized.
+    Windows have bucket granularity: the 24-hour total covers the current hour and the 23 before
+    it, the 7 and 30-day totals the current UTC day and the days before it. Transfers older than
+    a window are ignored by it. Rows grow by doubling.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._rows: Dict[str, int] = {}
+        self.hourly = np.zeros((capacity, HOURS), dtype=np.int32)
+        self.daily = np.zeros((capacity, DAYS), dtype=np.int32)
+        self.hour_epoch = np.zeros(capacity, dtype=np.int32)
+        self.day_epoch = np.zeros(capacity, dtype=np.int32)
+        self.updates = 0
+        self.queries = 0
+
+    # ----- rows -----
+    def _grow(self, needed: int):
+        capacity = len(self.hour_epoch)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("hourly", "daily", "hour_epoch", "day_epoch"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _row(self, user_id: str) -> int:
+        row = self._rows.get(user_id)
+        if row is None:
+            row = self._rows[user_id] = len(self._rows)
+            self._grow(row + 1)
+        return row
+
+    def _rows_for(self, user_ids: Iterable[str]) -> np.ndarray:
+        user_ids = np.asarray(user_ids).tolist()
+        rows = list(map(self._rows.get, user_ids))
+        if None in rows:
+            for i, row in enumerate(rows):
+                if row is None:
+                    rows[i] = self._rows.setdefault(user_ids[i], len(self._rows))
+            self._grow(len(self._rows))
+        return np.array(rows, dtype=np.int64)
+
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self._rows
+
+    # ----- updates -----
+    def record(self, user_id: str, amount: float, timestamp: Optional[float] = None):
+        """Add one sent transfer (timestamp defaults to now)"""
+        timestamp = time.time() if timestamp is None else timestamp
+        hour, day = int(timestamp // 3600), int(timestamp // 86400)
+        cents = round(amount * 100)
+        with self._lock:
+            row = self._row(user_id)
+            self.hour_epoch[row] = _advance_one(self.hourly[row], int(self.hour_epoch[row]), hour)
+            self.day_epoch[row] = _advance_one(self.daily[row], int(self.day_epoch[row]), day)
+            if hour > self.hour_epoch[row] - HOURS:
+                self.hourly[row, hour % HOURS] += cents
+            if day > self.day_epoch[row] - DAYS:
+                self.daily[row, day % DAYS] += cents
+            self.updates += 1
+
+    def record_batch(self, user_ids: Iterable[str], amounts: Iterable[float], timestamps: Iterable[float]):
+        """Vectorized record() for many transfers, e.g. replaying a payments feed"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        cents = np.round(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int32)
+        hours = (timestamps // 3600).astype(np.int32)
+        with self._lock:
+            rows = self._rows_for(user_ids)
+            # One pass per distinct hour so the rings only ever move forward within a pass
+            order = np.argsort(hours, kind="stable")
+            rows, cents, hours = rows[order], cents[order], hours[order]
+            boundaries = np.flatnonzero(np.diff(hours)) + 1
+            for group in np.split(np.arange(len(hours)), boundaries):
+                if not len(group):
+                    continue
+                hour = hours[group[0]]
+                group_rows = rows[group]
+                for ring, epoch, bucket, width in ((self.hourly, self.hour_epoch, hour, HOURS),
+                                                   (self.daily, self.day_epoch, hour // 24, DAYS)):
+                    _advance(ring, epoch, group_rows, bucket)
+                    recent = bucket > epoch[group_rows] - width
+                    np.add.at(ring, (group_rows[recent], bucket % width), cents[group][recent])
+            self.updates += len(cents)
+
+    def seed(self, user_id: str, load_history: Callable[[], Iterable[Tuple[float, float]]]) -> bool:
+        """Record load_history()'s (timestamp, amount) transfers for a user seen for the first time"""
+        with self._lock:
+            if self.has_user(user_id):
+                return False
+            self._row(user_id)
+            for timestamp, amount in load_history():
+                self.record(user_id, amount, timestamp)
+            return True
+
+    # ----- queries -----
+    def usage(self, user_id: str, now: Optional[float] = None) -> Dict[str, float]:
+        """Dollars sent in the last 24 hours, 7 days and 30 days, and the busiest day of the 30"""
+        now = time.time() if now is None else now
+        hour, day = int(now // 3600), int(now // 86400)
+        with self._lock:
+            self.queries += 1
+            row = self._rows.get(user_id)
+            if row is None:
+                return {"last_24h": 0.0, "last_7d": 0.0, "last_30d": 0.0, "peak_day_30d": 0.0}
+            self.hour_epoch[row] = _advance_one(self.hourly[row], int(self.hour_epoch[row]), hour)
+            self.day_epoch[row] = _advance_one(self.daily[row], int(self.day_epoch[row]), day)
+            # Plain Python sums beat NumPy's per-call overhead on 24/30-element rows
+            daily = self.daily[row].tolist()
+            return {
+                "last_24h": sum(self.hourly[row].tolist()) / 100,
+                "last_7d": sum(daily[(day - offset) % DAYS] for offset in range(WEEK)) / 100,
+                "last_30d": sum(daily) / 100,
+                "peak_day_30d": max(daily) / 100,
+            }
+
+    def usage_batch(self, user_ids: Iterable[str], now: Optional[float] = None,
+                    register: bool = True) -> Dict[str, np.ndarray]:
+        """Vectorized usage() for many users.
+
+        Users it has not seen are registered, or with register=False reported as zero usage and
+        left out, so a later seed() still loads their history.
+        """
+        now = time.time() if now is None else now
+        hour, day = int(now // 3600), int(now // 86400)
+        with self._lock:
+            known = None
+            if register:
+                rows = self._rows_for(user_ids)
+            else:
+                found = list(map(self._rows.get, np.asarray(user_ids).tolist()))
+                known = np.array([row is not None for row in found], dtype=bool)
+                rows = np.array([row for row in found if row is not None], dtype=np.int64)
+            self.queries += len(rows)
+            _advance(self.hourly, self.hour_epoch, rows, hour)
+            _advance(self.daily, self.day_epoch, rows, day)
+            daily = self.daily[rows]
+            usage = {
+                "last_24h": self.hourly[rows].sum(axis=1, dtype=np.int64) / 100,
+                "last_7d": daily[:, np.arange(day - WEEK + 1, day + 1) % DAYS].sum(axis=1, dtype=np.int64) / 100,
+                "last_30d": daily.sum(axis=1, dtype=np.int64) / 100,
+                "peak_day_30d": daily.max(axis=1, initial=0) / 100,
+            }
+        if known is not None:
+            for name, values in usage.items():
+                usage[name] = np.zeros(len(known))
+                usage[name][known] = values
+        return usage
+
+    def can_send(self, user_id: str, amount: float, daily_limit: float, now: Optional[float] = None) -> bool:
+        """Whether sending amount keeps the user's last-24-hour total within daily_limit"""
+        return self.usage(user_id, now)["last_24h"] + amount <= daily_limit
+
+    def stats(self) -> Dict:
+        users = len(self._rows)
+        row_bytes = (self.hourly.itemsize * HOURS + self.daily.itemsize * DAYS
+                     + self.hour_epoch.itemsize + self.day_epoch.itemsize)
+        return {
+            "users": users,
+            "capacity": len(self.hour_epoch),
+            "bytes_per_user": row_bytes,
+            "allocated_bytes": row_bytes * len(self.hour_epoch),
+            "updates": self.updates,
+            "queries": self.queries,
+        }
+
+
+usage_tracker = UsageTracker()
+
+
+# ======================
+# Benchmark
+# ======================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sliding-window e-Transfer usage tracker")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--events", type=int, default=10_000_000, help="transfers over 30 days loaded in bulk")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=200_000, help="single-user updates and queries")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    now = time.time()
+    user_ids = np.array([f"user_{i}" for i in range(args.users)])
+    tracker = UsageTracker()
+
+    timestamps = np.sort(rng.uniform(now - 30 * 86400, now, args.events))
+    start = time.perf_counter()
+    for offset in range(0, args.events, args.chunk_size):
+        size = min(args.chunk_size, args.events - offset)
+        tracker.record_batch(user_ids[rng.integers(0, args.users, size)], rng.uniform(5, 500, size).round(2),
+                             timestamps[offset:offset + size])
+    elapsed = time.perf_counter() - start
+    print(f"record_batch: {args.events:,} transfers for {args.users:,} users in {elapsed:.2f}s "
+          f"({args.events / elapsed:,.0f} updates/second)")
+
+    sample_users = user_ids[rng.integers(0, args.users, args.samples)].tolist()
+    sample_amounts = rng.uniform(5, 500, args.samples).round(2).tolist()
+    start = time.perf_counter()
+    for user_id, amount in zip(sample_users, sample_amounts):
+        tracker.record(user_id, amount, now)
+    elapsed = time.perf_counter() - start
+    print(f"record:       {args.samples / elapsed:,.0f} updates/second")
+
+    start = time.perf_counter()
+    for user_id in sample_users:
+        tracker.usage(user_id, now)
+    elapsed = time.perf_counter() - start
+    print(f"usage:        {args.samples / elapsed:,.0f} queries/second")
+
+    start = time.perf_counter()
+    totals = tracker.usage_batch(user_ids, now)
+    elapsed = time.perf_counter() - start
+    print(f"usage_batch:  {args.users:,} users in {elapsed:.2f}s ({args.users / elapsed:,.0f} queries/second)")
+
+    print(f"{sample_users[0]}: {tracker.usage(sample_users[0], now)}")
+    stats = tracker.stats()
+    print(f"Memory: {stats['bytes_per_user']} bytes/user, {stats['allocated_bytes'] / 2 ** 20:,.0f} MiB allocated")
@@ -0,0 +1,260 @@
+import argparse
+import datetime
+import importlib
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from etransfer_eligibility import ELIGIBILITY_RULES
+from transaction_journal import TransactionJournal, journal
+
+load_dotenv('.env')
+
+# "streaming" (default), "none", or "module:factory" for a custom FraudScorer
+FRAUD_SCORER = os.getenv("FRAUD_SCORER", "streaming")
+# Scores at or above the e-Transfer fraud_score eligibility rule's cutoff count as flagged; the rule
+# set is the only place the threshold lives (without a fraud_score rule nothing is flagged)
+_threshold = ELIGIBILITY_RULES.threshold("fraud_score")
+FRAUD_FLAG_SCORE = math.inf if _threshold is None else float(_threshold)
+# How quickly a user's risk fades after an anomalous transaction
+FRAUD_RISK_HALF_LIFE_HOURS = float(os.getenv("FRAUD_RISK_HALF_LIFE_HOURS", "24"))
+
+
+class FraudScorer:
+    """Scores write transactions for fraud risk as they happen.
+
+    observe() is called by the write tools for every transaction and returns its score in
+    [0, 1]; risk() is a user's current risk, read by eligibility checks. This base class scores
+    everything 0, so FRAUD_SCORER=none disables scoring without touching the call sites.
+
+    State shared between processes has to come from outside the scorer: the streaming scorer
+    replays the shared transaction journal, so TFSA contributions journaled by one MCP server
+    count towards e-Transfer eligibility in the other.
+    """
+
+    def observe(self, user_id: str, kind: str, amount: float, timestamp: Optional[float] = None) -> float:
+        return 0.0
+
+    def risk(self, user_id: str, now: Optional[float] = None) -> float:
+        return 0.0
+
+    def stats(self) -> Dict:
+        return {"scorer": type(self).__name__}
+
+
+# Journaled transaction kinds the scorer folds in, and the payload field holding the amount
+SCORED_KINDS = {"tfsa_contribution": "amount", "etransfer_limit_increase": "new_limit"}
+
+
+class _Stats:
+    """Running statistics for one (user, transaction kind)"""
+    __slots__ = ("count", "mean", "m2", "rate", "last_seen", "hours")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.rate = 0.0
+        self.last_seen = 0.0
+        self.hours = [0] * 24
+
+
+class StreamingFraudScorer(FraudScorer):
+    """Incremental anomaly score from amount, velocity and time of day, in constant memory per user.
+
+    For each (user, kind) it keeps Welford's running mean/variance of amounts, an exponentially
+    decayed transaction rate and a 24-bucket hour-of-day histogram. A transaction is scored
+    against the statistics before it is folded in:
+    - amount: how many standard deviations above the user's mean it is (capped at z_cap)
+    - velocity: how many other transactions of the kind happened in roughly the last hour
+    - time of day: how rarely the user transacts at this hour compared to a uniform spread
+    The components are weighted into [0, 1]. Amount and time of day only count once the user has
+    min_history transactions. A user's risk is their highest recent score, halving every
+    FRAUD_RISK_HALF_LIFE_HOURS.
+
+    With a journal, observe() only scores: transactions (and their journaled scores) are folded
+    in when they are read back from the journal, before every observe() and risk(), whichever
+    process appended them. Without one, observe() folds each transaction in directly.
+    """
+
+    def __init__(self, min_history: int = 5, z_cap: float = 8.0, velocity_half_life: float = 3600.0,
+                 velocity_cap: float = 5.0, weights: Tuple[float, float, float] = (0.5, 0.3, 0.2),
+                 risk_half_life_hours: float = FRAUD_RISK_HALF_LIFE_HOURS,
+                 journal: Optional[TransactionJournal] = None):
+        self.min_history = min_history
+        self.z_cap = z_cap
+        self.velocity_half_life = velocity_half_life
+        self.velocity_cap = velocity_cap
+        self.weights = weights
+        self.risk_half_life = risk_half_life_hours * 3600
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], _Stats] = {}
+        self._risk: Dict[str, Tuple[float, float]] = {}
+        self.journal = journal
+        self._journal_seq = 0
+        self._journal_offset = 0
+        self.observed = 0
+        self.flagged = 0
+        self.replayed = 0
+
+    def _score(self, stats: _Stats, amount: float, timestamp: float, hour: int) -> float:
+        velocity = 0.0
+        if stats.count:
+            # Other transactions of this kind in about the last velocity_half_life / ln 2 seconds
+            recent = stats.rate * 0.5 ** ((timestamp - stats.last_seen) / self.velocity_half_life)
+            velocity = min(recent / self.velocity_cap, 1.0)
+        if stats.count < self.min_history:
+            return self.weights[1] * velocity
+
+        std = math.sqrt(stats.m2 / (stats.count - 1))
+        # Floor the spread so a user who always sends the same amount is not flagged for cents
+        z = (amount - stats.mean) / max(std, 0.1 * abs(stats.mean), 1.0)
+        amount_score = min(max(z, 0.0) / self.z_cap, 1.0)
+        hour_share = (stats.hours[hour] + 0.5) / (stats.count + 12.0)
+        hour_score = max(1.0 - 24.0 * hour_share, 0.0)
+        return self.weights[0] * amount_score + self.weights[1] * velocity + self.weights[2] * hour_score
+
+    def _update(self, stats: _Stats, amount: float, timestamp: float, hour: int):
+        stats.count += 1
+        delta = amount - stats.mean
+        stats.mean += delta / stats.count
+        stats.m2 += delta * (amount - stats.mean)
+        stats.rate = stats.rate * 0.5 ** ((timestamp - stats.last_seen) / self.velocity_half_life) + 1.0
+        stats.last_seen = timestamp
+        stats.hours[hour] += 1
+
+    def _fold(self, user_id: str, kind: str, amount: float, timestamp: float, score: float):
+        stats = self._stats.get((user_id, kind))
+        if stats is None:
+            stats = self._stats[(user_id, kind)] = _Stats()
+        self._update(stats, amount, timestamp, time.localtime(timestamp).tm_hour)
+        if score > self._decayed_risk(user_id, timestamp):
+            self._risk[user_id] = (score, timestamp)
+
+    def _catch_up(self):
+        """Fold in scored transactions journaled since we last looked, by any process"""
+        if self.journal is None:
+            return
+        try:
+            if os.path.getsize(self.journal.path) <= self._journal_offset:
+                return
+        except FileNotFoundError:
+            return
+        for record, offset in self.journal.read_from(self._journal_offset, self._journal_seq):
+            self._journal_seq, self._journal_offset = record["seq"], offset
+            field = SCORED_KINDS.get(record["kind"])
+            if field is None or "fraud_score" not in record:
+                continue
+            timestamp = datetime.datetime.fromisoformat(record["committed_at"]).timestamp()
+            self._fold(record["user_id"], record["kind"], record[field], timestamp, record["fraud_score"])
+            self.replayed += 1
+
+    def observe(self, user_id: str, kind: str, amount: float, timestamp: Optional[float] = None) -> float:
+        """Score one transaction against the user's statistics, then fold it in (directly, or via the journal)"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            self._catch_up()
+            stats = self._stats.get((user_id, kind)) or _Stats()
+            score = self._score(stats, amount, timestamp, time.localtime(timestamp).tm_hour)
+            if self.journal is None:
+                self._fold(user_id, kind, amount, timestamp, score)
+            self.observed += 1
+            if score >= FRAUD_FLAG_SCORE:
+                self.flagged += 1
+        return score
+
+    def _decayed_risk(self, user_id: str, now: float) -> float:
+        entry = self._risk.get(user_id)
+        if entry is None:
+            return 0.0
+        score, scored_at = entry
+        return score * 0.5 ** (max(now - scored_at, 0.0) / self.risk_half_life)
+
+    def risk(self, user_id: str, now: Optional[float] = None) -> float:
+        """The user's highest recent transaction score, decayed since it was observed"""
+        with self._lock:
+            self._catch_up()
+            return self._decayed_risk(user_id, time.time() if now is None else now)
+
+    def stats(self) -> Dict:
+        return {
+            "scorer": type(self).__name__,
+            "observed": self.observed,
+            "flagged": self.flagged,
+            "tracked_streams": len(self._stats),
+            "users_with_risk": len(self._risk),
+            "risk_half_life_hours": self.risk_half_life / 3600,
+            "journal": self.journal.path if self.journal is not None else None,
+            "replayed": self.replayed,
+        }
+
+
+def load_fraud_scorer(spec: str = FRAUD_SCORER) -> FraudScorer:
+    if spec == "streaming":
+        return StreamingFraudScorer(journal=journal)
+    if spec == "none":
+        return FraudScorer()
+    module, _, factory = spec.partition(":")
+    return getattr(importlib.import_module(module), factory)()
+
+
+fraud_scorer = load_fraud_scorer()
+
+
+# ======================
+# Replay Benchmark
+# ======================
+if __name__ == "__main__":
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Replay a synthetic transaction stream through the fraud scorer")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=2_000_000)
+    parser.add_argument("--anomaly-rate", type=float, default=0.005)
+    parser.add_argument("--threshold", type=float, default=FRAUD_FLAG_SCORE)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    start_time = time.time() - 90 * 86400
+    users = rng.integers(0, args.users, args.events)
+    # Each user has a habitual amount and transacts around a habitual hour of the day
+    habitual_amount = rng.uniform(50, 2000, args.users)
+    habitual_hour = rng.integers(8, 21, args.users)
+    days = np.sort(rng.uniform(0, 90, args.events)).astype(np.int64)
+    hours = (habitual_hour[users] + rng.normal(0, 1.5, args.events)).round().astype(np.int64) % 24
+    timestamps = start_time + days * 86400 + hours * 3600 + rng.uniform(0, 3600, args.events)
+    amounts = habitual_amount[users] * rng.lognormal(0, 0.2, args.events)
+
+    # Injected anomalies: a much larger amount in the small hours
+    anomalous = rng.random(args.events) < args.anomaly_rate
+    amounts[anomalous] *= rng.uniform(5, 20, anomalous.sum())
+    timestamps[anomalous] = start_time + days[anomalous] * 86400 + rng.uniform(1, 5, anomalous.sum()) * 3600
+
+    order = np.argsort(timestamps, kind="stable")
+    stream = list(zip([f"user_{u}" for u in users[order]], amounts[order].tolist(), timestamps[order].tolist()))
+    labels = anomalous[order]
+
+    scorer = StreamingFraudScorer()
+    scores = np.empty(len(stream))
+    start = time.perf_counter()
+    for i, (user_id, amount, timestamp) in enumerate(stream):
+        scores[i] = scorer.observe(user_id, "tfsa_contribution", amount, timestamp)
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {len(stream):,} transactions for {args.users:,} users in {elapsed:.2f}s "
+          f"({elapsed / len(stream) * 1e6:.1f} µs per observe, {len(stream) / elapsed:,.0f}/second)")
+
+    start = time.perf_counter()
+    for user_id, _, _ in stream[:200_000]:
+        scorer.risk(user_id)
+    elapsed = time.perf_counter() - start
+    print(f"risk(): {elapsed / min(len(stream), 200_000) * 1e6:.1f} µs per lookup")
+
+    flagged = scores >= args.threshold
+    true_positives = int((flagged & labels).sum())
+    print(f"Threshold {args.threshold}: flagged {int(flagged.sum()):,}, "
+          f"precision {true_positives / max(int(flagged.sum()), 1):.2f}, "
+          f"recall {true_positives / max(int(labels.sum()), 1):.2f} of {int(labels.sum()):,} injected anomalies")
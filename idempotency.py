@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from single_flight import SingleFlight
+
+load_dotenv('.env')
+
+# How long a completed write can be replayed by key, and how many keys are kept in memory
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+# Optional SQLite file so a retry landing on another server worker still finds the result
+IDEMPOTENCY_STORE_PATH = os.getenv("IDEMPOTENCY_STORE_PATH") or None
+
+
+class IdempotencyKeyReusedError(Exception):
+    """An idempotency key was sent again with different request arguments"""
+
+
+class IdempotencyStore:
+    """Runs a write at most once per idempotency key and replays its result to retries.
+
+    Built on SingleFlight: a retry that arrives while the original call is still running waits
+    for it, and a completed result is kept for ttl seconds in a bounded LRU (plus an optional
+    SQLite tier shared by workers). Failures are never stored, so a retry after an error runs
+    the write again. Reusing a key for a different request raises IdempotencyKeyReusedError
+    instead of returning an unrelated result.
+    """
+
+    def __init__(self, name: str, ttl: float = IDEMPOTENCY_TTL, maxsize: int = IDEMPOTENCY_MAX_KEYS,
+                 path: Optional[str] = IDEMPOTENCY_STORE_PATH):
+        self.name = name
+        self.flight = SingleFlight(f"{name}_idempotency", ttl=ttl, maxsize=maxsize, path=path)
+        self.replays = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def fingerprint(request: Dict) -> str:
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def arun(self, key: str, request: Dict, fn: Callable, *args, **kwargs) -> Dict:
+        """fn(*args, **kwargs) once per key, as {"result": ..., "replayed": whether it was a stored result}"""
+        fingerprint = self.fingerprint(request)
+        execution = uuid.uuid4().hex
+
+        async def execute():
+            result = fn(*args, **kwargs)
+            if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+                result = await result
+            return {"request": fingerprint, "execution": execution, "result": result}
+
+        entry = await self.flight.ado(key, execute)
+        if entry["request"] != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyKeyReusedError("Idempotency key was already used for a different request")
+        replayed = entry["execution"] != execution
+        if replayed:
+            self.replays += 1
+        return {"result": entry["result"], "replayed": replayed}
+
+    def stats(self) -> Dict:
+        flight = self.flight.stats()
+        return {
+            "group": self.name,
+            "calls": flight["calls"],
+            "executions": flight["executions"],
+            "replays": self.replays,
+            "waited_for_in_flight": flight["coalesced"],
+            "key_conflicts": self.conflicts,
+            "ttl_seconds": flight["ttl_seconds"],
+            "path": self.flight.results.path if self.flight.results is not None else None,
+        }
@@ -0,0 +1,76 @@
+import hashlib
+import os
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, BaseMessage
+
+from ttl_cache import MISSING, TieredCache
+
+load_dotenv('.env')
+
+# Shared by every assistant in the process. LLM_CACHE_PATH persists responses to SQLite; leave it
+# empty to keep the cache in memory only
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+llm_response_cache = TieredCache(
+    "llm_responses",
+    maxsize=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "0")) or None,
+    path=os.getenv("LLM_CACHE_PATH") or None)
+
+
+class CachedLLM:
+    """Serves repeated prompts to a deterministic (temperature=0) LLM from llm_response_cache.
+
+    Keys are the model name plus a SHA-256 of the prompt. Chat models get an AIMessage back and
+    text models a str, as they would from the wrapped LLM; anything else passes straight through.
+    """
+
+    def __init__(self, llm, cache: TieredCache = llm_response_cache):
+        self.llm = llm
+        self.cache = cache
+        self.model = getattr(llm, "model", type(llm).__name__)
+
+    def _key(self, prompt: str) -> str:
+        return f"{self.model}:{hashlib.sha256(prompt.encode()).hexdigest()}"
+
+    @staticmethod
+    def _dump(response) -> dict:
+        if isinstance(response, BaseMessage):
+            return {"type": "message", "content": response.content}
+        return {"type": "text", "content": response}
+
+    @staticmethod
+    def _load(entry: dict):
+        return AIMessage(content=entry["content"]) if entry["type"] == "message" else entry["content"]
+
+    def invoke(self, prompt, *args, **kwargs):
+        if not isinstance(prompt, str) or args or kwargs:
+            return self.llm.invoke(prompt, *args, **kwargs)
+        key = self._key(prompt)
+        entry = self.cache.get(key)
+        if entry is MISSING:
+            response = self.llm.invoke(prompt)
+            self.cache.set(key, self._dump(response))
+            return response
+        return self._load(entry)
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        if not isinstance(prompt, str) or args or kwargs:
+            return await self.llm.ainvoke(prompt, *args, **kwargs)
+        key = self._key(prompt)
+        entry = await self.cache.aget(key)
+        if entry is MISSING:
+            response = await self.llm.ainvoke(prompt)
+            await self.cache.aset(key, self._dump(response))
+            return response
+        return self._load(entry)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+def cached_llm(llm):
+    """Wrap llm with the shared response cache when it is deterministic and caching is enabled"""
+    if not LLM_CACHE_ENABLED or getattr(llm, "temperature", None) != 0:
+        return llm
+    return CachedLLM(llm)
@@ -0,0 +1,177 @@
+# Load test for the TFSA and e-Transfer MCP servers over streamable HTTP.
+#
+# Both servers are started under uvicorn with a stubbed LLM (no Ollama or Tavily needed) that
+# burns a fixed amount of CPU per call, then virtual users drive check_contribution_room and
+# increase_limit concurrently. Compare --workers 1 with --workers N to see the core scaling:
+#
+#   python load_test_mcp_servers.py --workers 1 --concurrency 16 --requests 200
+#   python load_test_mcp_servers.py --workers 4 --concurrency 16 --requests 200
+import argparse
+import asyncio
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from langchain_core.messages import AIMessage
+
+os.environ.setdefault("TAVILY_API_KEY", "load-test")
+
+TFSA_PORT = 8101
+E_TRANSFER_PORT = 8102
+
+
+# ======================
+# 1. Stubbed LLM
+# ======================
+class StubLLM:
+    """Deterministic stand-in for ChatOllama that burns a fixed amount of CPU per call"""
+
+    def __init__(self, cpu_ms: float):
+        self.cpu_ms = cpu_ms
+
+    def invoke(self, prompt: str) -> AIMessage:
+        deadline = time.perf_counter() + self.cpu_ms / 1000
+        while time.perf_counter() < deadline:
+            pass
+        return AIMessage(content=self._respond(prompt))
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        # Off the event loop, like a real async client waiting on the model server
+        return await asyncio.to_thread(self.invoke, prompt)
+
+    @staticmethod
+    def _respond(prompt: str) -> str:
+        if "TFSA policy expert" in prompt:
+            return '{"policy_summary": "Historical rules cover the current year.", "needs_current_search": false}'
+        if "confirming a successful" in prompt:
+            reference = re.search(r"Reference ID: (\S+)", prompt)
+            return f"✅ Your e-Transfer limit has been increased. Reference ID: {reference.group(1) if reference else ''}"
+        return "You meet all requirements for an e-Transfer limit increase."
+
+
+def _install_stub_llm():
+    cpu_ms = float(os.getenv("LOAD_TEST_LLM_CPU_MS", "20"))
+    import e_transfer_assistant
+    import tfsa_assistant
+    tfsa_assistant.llm = StubLLM(cpu_ms)
+    e_transfer_assistant.llm = StubLLM(cpu_ms)
+
+
+def create_stubbed_tfsa_app():
+    """uvicorn factory: TFSA MCP server with the stubbed LLM"""
+    _install_stub_llm()
+    import tfsa_mcp_server
+    return tfsa_mcp_server.create_http_app()
+
+
+def create_stubbed_e_transfer_app():
+    """uvicorn factory: e-Transfer MCP server with the stubbed LLM"""
+    _install_stub_llm()
+    import e_transfer_mcp_server
+    return e_transfer_mcp_server.create_http_app()
+
+
+# ======================
+# 2. Server Processes
+# ======================
+def start_server(factory: str, port: int, workers: int, cpu_ms: float) -> subprocess.Popen:
+    env = dict(os.environ, LOAD_TEST_LLM_CPU_MS=str(cpu_ms))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"load_test_mcp_servers:{factory}", "--factory",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL)
+
+
+def wait_for_port(port: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server on port {port} did not start within {timeout:.0f}s")
+
+
+# ======================
+# 3. Virtual Users
+# ======================
+async def drive_tool(url: str, tool: str, arguments: dict, total: int, concurrency: int) -> dict:
+    """Call one tool `total` times from `concurrency` concurrent MCP sessions"""
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    remaining = iter(range(total))
+    latencies = []
+    errors = 0
+
+    async def virtual_user():
+        nonlocal errors
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                for _ in remaining:
+                    start = time.perf_counter()
+                    result = await session.call_tool(tool, arguments)
+                    latencies.append(time.perf_counter() - start)
+                    if result.isError or '"error"' in result.content[0].text:
+                        errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "tool": tool,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def run_load(args) -> list[dict]:
+    return await asyncio.gather(
+        drive_tool(f"http://127.0.0.1:{TFSA_PORT}/mcp", "check_contribution_room",
+                   {"user_id": "user_123"}, args.requests, args.concurrency),
+        drive_tool(f"http://127.0.0.1:{E_TRANSFER_PORT}/mcp", "increase_limit",
+                   {"user_input": "Increase my e-Transfer limit", "user_id": "user_456"},
+                   args.requests, args.concurrency),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the MCP servers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="uvicorn worker processes per server")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent MCP sessions per tool")
+    parser.add_argument("--requests", type=int, default=200, help="Tool calls per tool")
+    parser.add_argument("--llm-cpu-ms", type=float, default=20, help="CPU time burned by each stubbed LLM call")
+    args = parser.parse_args()
+
+    servers = [
+        start_server("create_stubbed_tfsa_app", TFSA_PORT, args.workers, args.llm_cpu_ms),
+        start_server("create_stubbed_e_transfer_app", E_TRANSFER_PORT, args.workers, args.llm_cpu_ms),
+    ]
+    try:
+        wait_for_port(TFSA_PORT)
+        wait_for_port(E_TRANSFER_PORT)
+        print(f"Workers: {args.workers}, concurrency: {args.concurrency}, stub LLM: {args.llm_cpu_ms:.0f} ms CPU/call")
+        for stats in asyncio.run(run_load(args)):
+            print(f"{stats['tool']:<24} {stats['requests']:>6} req  {stats['errors']:>4} err  "
+                  f"{stats['throughput']:>8.1f} req/s  p50 {stats['p50_ms']:>7.1f} ms  p95 {stats['p95_ms']:>7.1f} ms")
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,36 @@
+import asyncio
 import os
-import re
-import subprocess
-from typing import Tuple, List, Dict
+import threading
+import time
+import uuid
+from contextlib import AsyncExitStack
+from typing import Tuple, List, Dict, Set
 
 import streamlit as st
 from langchain_ollama import OllamaLLM
+from mcp import ClientSession
+
+import e_transfer_mcp_client
+import tfsa_mcp_client
+from llm_cache import cached_llm
 
 # Configuration
 MCP_CLIENTS = {
-    "TFSA": "python tfsa_mcp_client.py",
-    "e-Transfer": "python e_transfer_mcp_client.py"
+    "TFSA": tfsa_mcp_client,
+    "e-Transfer": e_transfer_mcp_client
 }
 
-# Initialize a local LLM for client selection
-llm = OllamaLLM(model="deepseek-coder:latest")
+# Number of long-lived MCP sessions kept per service. Each one is a server subprocess
+# over stdio, or a connection to the shared HTTP server when TFSA_MCP_SERVER_URL /
+# E_TRANSFER_MCP_SERVER_URL are set
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+# Pause before reconnecting a pooled session whose server went away
+MCP_RECONNECT_SECONDS = float(os.getenv("MCP_RECONNECT_SECONDS", "1"))
+# How long a session suspected dead after a failed turn gets to answer a ping
+MCP_PING_TIMEOUT = 5.0
+
+# Initialize a local LLM for client selection. Deterministic, so repeated queries hit the response cache
+llm = cached_llm(OllamaLLM(model="deepseek-coder:latest", temperature=0))
 
 
 def classify_query(user_input: str) -> str:
@@ -49,56 +66,138 @@ def classify_query(user_input: str) -> str:
     return "TFSA"  # Default
 
 
-def run_mcp_client(client: str, user_input: str) -> Tuple[str, str, List[Dict]]:
-    """Run MCP client and parse its output"""
-    # Pass current environment variables
-    env = os.environ.copy()
+class MCPSessionPool:
+    """Long-lived MCP client sessions to one server, each with an initialized agent graph.
 
-    # Create a temporary file to capture full output
-    output_file = f"{client}_output.txt"
-    command = f"{MCP_CLIENTS[client]} --message '{user_input}' > {output_file} 2>&1"
+    Every slot reconnects when its session dies: a turn that fails on a session which no longer
+    answers a ping retires it, and the slot opens a fresh session for later turns.
+    """
 
+    def __init__(self, client_module, size: int = MCP_POOL_SIZE):
+        self.client_module = client_module
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._closed = asyncio.Event()
+        self._held: Set[asyncio.Event] = set()
+        self._tasks: List[asyncio.Task] = []
+        self.reconnects = 0
+
+    async def start(self):
+        """Open all sessions and wait until every agent graph is ready"""
+        ready = [asyncio.get_running_loop().create_future() for _ in range(self.size)]
+        self._tasks = [asyncio.create_task(self._hold_session(future)) for future in ready]
+        await asyncio.gather(*ready)
+
+    async def _hold_session(self, ready: asyncio.Future):
+        # MCP transports must be entered and exited by the same task, so every
+        # session lives in its own task until the pool is closed or the session is retired
+        while not self._closed.is_set():
+            retired = asyncio.Event()
+            self._held.add(retired)
+            try:
+                async with AsyncExitStack() as stack:
+                    read, write = await stack.enter_async_context(self.client_module.connect())
+                    session = await stack.enter_async_context(ClientSession(read, write))
+                    await session.initialize()
+                    agent = await self.client_module.create_graph(session)
+                    await self._idle.put((agent, session, retired))
+                    if not ready.done():
+                        ready.set_result(True)
+                    await retired.wait()
+            except Exception as e:
+                if not ready.done():
+                    ready.set_exception(e)
+                    raise
+                # A dead transport can fail on exit too, and a reconnect can fail while the server
+                # is down; either way wait a moment and connect again
+                try:
+                    await asyncio.wait_for(self._closed.wait(), MCP_RECONNECT_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                self._held.discard(retired)
+
+    @staticmethod
+    async def _alive(session: ClientSession) -> bool:
+        try:
+            await asyncio.wait_for(session.send_ping(), MCP_PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def ainvoke(self, user_input: str):
+        """Run one chat turn on the next idle agent"""
+        agent, session, retired = await self._idle.get()
+        # Each turn gets its own thread so conversations don't leak between pooled agents
+        thread_id = f"host-{uuid.uuid4()}"
+        try:
+            return await agent.ainvoke(
+                {"messages": user_input},
+                config={"configurable": {"thread_id": thread_id}}
+            )
+        except Exception:
+            if not await self._alive(session):
+                # The session died under this turn; its slot reconnects instead of handing it out again
+                retired.set()
+                self.reconnects += 1
+            raise
+        finally:
+            agent.checkpointer.delete_thread(thread_id)
+            if not retired.is_set():
+                self._idle.put_nowait((agent, session, retired))
+
+    async def close(self):
+        self._closed.set()
+        for retired in list(self._held):
+            retired.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class MCPHost:
+    """Background event loop owning one MCPSessionPool per service"""
+
+    def __init__(self, pool_size: int = MCP_POOL_SIZE):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="mcp-host-loop", daemon=True)
+        self._thread.start()
+        self.pools = {name: MCPSessionPool(module, pool_size) for name, module in MCP_CLIENTS.items()}
+        for pool in self.pools.values():
+            self.submit(pool.start())
+
+    def submit(self, coro):
+        """Run a coroutine on the host loop and block until it completes"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def close(self):
+        for pool in self.pools.values():
+            self.submit(pool.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@st.cache_resource(show_spinner="Connecting to MCP servers...")
+def get_mcp_host() -> MCPHost:
+    """Shared across Streamlit reruns and browser sessions"""
+    return MCPHost()
+
+
+def run_mcp_client(client: str, user_input: str) -> Tuple[str, str, List[Dict], float]:
+    """Send one chat turn to the pooled MCP agent and collect the invoked components"""
+    host = get_mcp_host()
+    start = time.perf_counter()
     try:
-        subprocess.run(
-            command,
-            shell=True,
-            env=env,
-            check=True
-        )
-
-        # Read the full output
-        with open(output_file, "r") as f:
-            response = f.read()
-        os.remove(output_file)
-    except subprocess.CalledProcessError as e:
-        return f"Error: Client process failed with code {e.returncode}", "error", []
+        response = host.submit(host.pools[client].ainvoke(user_input))
     except Exception as e:
-        return f"Error: {str(e)}", "error", []
+        return f"Error: {str(e)}", "error", [], time.perf_counter() - start
+    latency = time.perf_counter() - start
 
-    # Parse output to detect invoked components
+    # Detect tool usage from the tool calls the agent made during this turn
     invoked_components = []
+    for message in response["messages"]:
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            invoked_components.append({"type": "tool", "name": tool_call["name"]})
 
-    # Detect tool/resource/prompt usage in output
-    if "Tool called:" in response:
-        matches = re.findall(r"Tool called: (\w+)", response)
-        for match in matches:
-            invoked_components.append({"type": "tool", "name": match})
-
-    if "Resource called:" in response:
-        matches = re.findall(r"Resource called: (\w+)", response)
-        for match in matches:
-            invoked_components.append({"type": "resource", "name": match})
-
-    if "Prompt called:" in response:
-        matches = re.findall(r"Prompt called: (\w+)", response)
-        for match in matches:
-            invoked_components.append({"type": "prompt", "name": match})
-
-    # Extract the final AI response
-    ai_response_match = re.search(r"AI: (.+)", response, re.DOTALL)
-    ai_response = ai_response_match.group(1).strip() if ai_response_match else response
-
-    return ai_response, "success", invoked_components
+    ai_response = response["messages"][-1].content
+    return ai_response, "success", invoked_components, latency
 
 
 def main():
@@ -113,6 +212,8 @@ def main():
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+            if "latency" in message:
+                st.caption(f"Service: **{message['client']}** · {message['latency']:.2f}s")
             if "components" in message and message["components"]:
                 st.caption("Invoked components:")
                 for comp in message["components"]:
@@ -134,20 +235,21 @@ def main():
         # Display client selection
         with st.status(f"Routing to {selected_client} service..."):
             # Get response from MCP client
-            response, status, components = run_mcp_client(selected_client, prompt)
+            response, status, components, latency = run_mcp_client(selected_client, prompt)
 
             # Add assistant response to chat history
             st.session_state.messages.append({
                 "role": "assistant",
                 "content": response,
                 "client": selected_client,
-                "components": components
+                "components": components,
+                "latency": latency
             })
 
         # Display assistant response
         with st.chat_message("assistant"):
             st.markdown(response)
-            st.caption(f"Service: **{selected_client}**")
+            st.caption(f"Service: **{selected_client}** · {latency:.2f}s")
 
             # Only show components section if components exist
             if components:
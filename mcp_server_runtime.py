@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict
+
+from dotenv import load_dotenv
+
+load_dotenv('.env')
+
+TRANSPORTS = ["stdio", "sse", "streamable-http"]
+
+# Workflow runs allowed in flight per server process, and how they run: natively on the
+# event loop (async) or as the sync workflow on a thread or process pool
+MCP_TOOL_CONCURRENCY = int(os.getenv("MCP_TOOL_CONCURRENCY", "64"))
+MCP_TOOL_EXECUTOR = os.getenv("MCP_TOOL_EXECUTOR", "async")
+
+
+# ======================
+# 1. Command Line
+# ======================
+def parse_server_args(description: str, default_port: int) -> argparse.Namespace:
+    """Transport options shared by the TFSA and e-Transfer MCP servers"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--transport", choices=TRANSPORTS, default=os.getenv("MCP_TRANSPORT", "stdio"),
+                        help="stdio for a per-client subprocess, sse or streamable-http for a shared network server")
+    parser.add_argument("--host", default=os.getenv("MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MCP_PORT", default_port)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MCP_WORKERS", "1")),
+                        help="Worker processes for streamable-http (graph runs are spread across cores)")
+    return parser.parse_args()
+
+
+# ======================
+# 2. Tool Execution
+# ======================
+class BoundedExecutor:
+    """Runs workflow calls with a concurrency limit.
+
+    Coroutine functions are awaited on the event loop; blocking functions are offloaded to the
+    thread or process pool. Calls beyond the limit wait on a semaphore; the number waiting is
+    reported as queue depth.
+    """
+
+    def __init__(self, max_concurrency: int = MCP_TOOL_CONCURRENCY, kind: str = MCP_TOOL_EXECUTOR):
+        if kind not in ("async", "thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.max_concurrency = max_concurrency
+        self.kind = kind
+        self._executor = None
+        if kind != "async":
+            executor_class = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=max_concurrency)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    def select(self, sync_fn: Callable, async_fn: Callable) -> Callable:
+        """Pick the workflow entry point matching this executor kind"""
+        return async_fn if self.kind == "async" else sync_fn
+
+    async def run(self, fn: Callable, *args):
+        """Await fn(*args) once a slot is free"""
+        self.queue_depth += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queue_depth -= 1
+
+        self.in_flight += 1
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                result = await fn(*args)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        return {
+            "executor": self.kind,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+# ======================
+# 3. Server Launch
+# ======================
+def create_http_app(mcp):
+    """Starlette app serving the streamable HTTP transport.
+
+    Sessions are stateless so any worker process can answer any request.
+    """
+    mcp.settings.stateless_http = True
+    return mcp.streamable_http_app()
+
+
+def run_server(mcp, app_factory: str, args: argparse.Namespace):
+    """Run an MCP server over the transport selected on the command line.
+
+    app_factory is the "module:function" import string of a zero-argument function
+    returning create_http_app(mcp); uvicorn re-imports it inside every worker process.
+    """
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+        return
+
+    import uvicorn
+
+    if args.transport == "sse":
+        if args.workers > 1:
+            raise SystemExit("SSE sessions are pinned to one process; use --transport streamable-http for --workers > 1")
+        print(f"Serving SSE on http://{args.host}:{args.port}{mcp.settings.sse_path}")
+        uvicorn.run(mcp.sse_app(), host=args.host, port=args.port)
+        return
+
+    print(f"Serving streamable HTTP on http://{args.host}:{args.port}{mcp.settings.streamable_http_path} "
+          f"with {args.workers} worker(s)")
+    uvicorn.run(app_factory, factory=True, host=args.host, port=args.port, workers=args.workers)
@@ -0,0 +1,145 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from ttl_cache import MISSING, TieredCache
+
+load_dotenv('.env')
+
+# How long a completed read is reused; 0 only folds calls that overlap in flight
+SINGLE_FLIGHT_TTL = float(os.getenv("SINGLE_FLIGHT_TTL", "2"))
+
+
+class SingleFlight:
+    """Folds concurrent identical read-only calls into one execution and shares its result.
+
+    Callers with the same key that arrive while a call is in flight wait for it instead of
+    starting their own; with a ttl the result is also reused for that many seconds after it
+    completes. Failures are shared with the waiting callers but never cached. Only use this for
+    reads: a write must not be skipped because an identical one is running.
+    """
+
+    def __init__(self, name: str, ttl: float = SINGLE_FLIGHT_TTL, maxsize: int = 1024, path: Optional[str] = None):
+        self.name = name
+        self.ttl = ttl
+        self.results = TieredCache(f"{name}_results", maxsize=maxsize, ttl=ttl, path=path) if ttl else None
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def _join(self, key: str, lookup: bool = True):
+        """(cached result or MISSING, in-flight future, whether this caller leads the call)"""
+        with self._lock:
+            self.calls += 1
+            if lookup and self.results is not None:
+                value = self.results.get(key)
+                if value is not MISSING:
+                    self.cache_hits += 1
+                    return value, None, False
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return MISSING, future, False
+            future = self._in_flight[key] = Future()
+            self.executions += 1
+            return MISSING, future, True
+
+    def _finish(self, key: str, future: Future, value: Any = MISSING, error: BaseException = None,
+                store: bool = True):
+        with self._lock:
+            del self._in_flight[key]
+            if error is None and store and self.results is not None:
+                self.results.set(key, value)
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def do(self, key: str, fn: Callable, *args, **kwargs):
+        value, future, leader = self._join(key)
+        if value is not MISSING:
+            return value
+        if not leader:
+            return future.result()
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value)
+        return value
+
+    async def ado(self, key: str, fn: Callable, *args, **kwargs):
+        """Async variant of do; fn may be a coroutine function or return an awaitable.
+
+        Results are looked up and stored with aget()/aset(), so a SQLite tier is never read or
+        written on the event loop.
+        """
+        if self.results is not None:
+            value = await self.results.aget(key)
+            if value is not MISSING:
+                with self._lock:
+                    self.calls += 1
+                    self.cache_hits += 1
+                return value
+        value, future, leader = self._join(key, lookup=False)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        # A leader that finished while our lookup ran stored its result before letting go of the key
+        value = self.results.peek(key) if self.results is not None else MISSING
+        store = value is MISSING
+        try:
+            if store:
+                value = fn(*args, **kwargs)
+                if asyncio.iscoroutine(value) or isinstance(value, asyncio.Future):
+                    value = await value
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        try:
+            if store and self.results is not None:
+                await self.results.aset(key, value)
+        finally:
+            # Waiters are released even if this caller is cancelled while the result is stored
+            self._finish(key, future, value, store=False)
+        return value
+
+    def stats(self) -> Dict:
+        return {
+            "group": self.name,
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "saved_rate": (self.coalesced + self.cache_hits) / self.calls if self.calls else 0.0,
+            "in_flight": len(self._in_flight),
+            "ttl_seconds": self.ttl,
+        }
+
+
+def coalesce(group: SingleFlight, key: Callable[..., str]):
+    """Decorator routing a sync or async read through group under key(*args, **kwargs)"""
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return await group.ado(key(*args, **kwargs), fn, *args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return group.do(key(*args, **kwargs), fn, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,39 @@
+import numpy as np
+
+from etransfer_eligibility import ELIGIBILITY_RULES
+
+N = 2000
+
+
+def columns():
+    rng = np.random.default_rng(11)
+    return {
+        "account_age": rng.integers(0, 60, N),
+        "account_status": rng.choice(["active", "frozen", "closed"], N, p=[0.8, 0.1, 0.1]),
+        "kyc_status": rng.choice(["verified", "pending"], N, p=[0.9, 0.1]),
+        "fraud_flags": rng.choice([0, 1, 2], N, p=[0.9, 0.05, 0.05]),
+        "fraud_score": rng.uniform(0, 1, N).round(2),
+        "avg_balance": rng.uniform(0, 80000, N).round(2),
+    }
+
+
+def test_batch_matches_per_user_evaluation():
+    batch_columns = columns()
+    batch = ELIGIBILITY_RULES.evaluate_batch(batch_columns)
+    for i in range(N):
+        profile = {field: column[i].item() for field, column in batch_columns.items()}
+        single = ELIGIBILITY_RULES.evaluate(profile)
+        assert bool(batch["eligible"][i]) == single["eligible"]
+        assert ELIGIBILITY_RULES.reasons(batch["failed_rules"][i]) == single["reasons"]
+        assert float(batch["max_possible_limit"][i]) == single["max_possible_limit"]
+    assert 0 < batch["eligible"].sum() < N
+
+
+def test_new_limit_batch_matches_scalar():
+    rng = np.random.default_rng(5)
+    current = rng.choice([1000.0, 3000.0, 5000.0, 9000.0], N)
+    maximum = rng.choice([5000.0, 10000.0, 25000.0], N)
+    peak = rng.uniform(0, 12000, N)
+    batch = ELIGIBILITY_RULES.new_limit(current, maximum, peak)
+    for i in range(N):
+        assert batch[i] == ELIGIBILITY_RULES.new_limit(float(current[i]), float(maximum[i]), float(peak[i]))
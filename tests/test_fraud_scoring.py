@@ -0,0 +1,36 @@
+import time
+
+from fraud_scoring import StreamingFraudScorer
+from transaction_journal import TransactionJournal
+
+
+def contribute(scorer, journal, user_id, amount):
+    score = scorer.observe(user_id, "tfsa_contribution", amount)
+    journal.append("tfsa_contribution", "TFSA", {"user_id": user_id, "amount": amount, "tax_year": 2026,
+                                                 "fraud_score": score})
+    return score
+
+
+def test_risk_follows_transactions_journaled_by_another_process(tmp_path):
+    path = str(tmp_path / "transactions.journal")
+    tfsa_journal, etransfer_journal = TransactionJournal(path), TransactionJournal(path)
+    tfsa = StreamingFraudScorer(journal=tfsa_journal)
+    etransfer = StreamingFraudScorer(journal=etransfer_journal)
+
+    for _ in range(6):
+        contribute(tfsa, tfsa_journal, "u1", 100.0)
+    score = contribute(tfsa, tfsa_journal, "u1", 50_000.0)
+    assert score > 0
+    now = time.time()
+    assert etransfer.risk("u1", now) == tfsa.risk("u1", now) > 0
+    assert etransfer.stats()["replayed"] == 7
+    # The writer folds its own transactions in from the journal too, exactly once
+    assert tfsa._stats[("u1", "tfsa_contribution")].count == 7
+
+
+def test_without_journal_observe_folds_in_directly():
+    scorer = StreamingFraudScorer()
+    for _ in range(6):
+        scorer.observe("u1", "tfsa_contribution", 100.0)
+    assert scorer._stats[("u1", "tfsa_contribution")].count == 6
+    assert scorer.observe("u1", "tfsa_contribution", 50_000.0) > 0.4
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from idempotency import IdempotencyKeyReusedError, IdempotencyStore
+
+
+def test_retry_replays_the_stored_result():
+    store = IdempotencyStore("test", path=None)
+    calls = []
+
+    def write(amount):
+        calls.append(amount)
+        return {"transaction_id": f"TFSA-{len(calls)}"}
+
+    async def main():
+        first = await store.arun("key-1", {"amount": 100}, write, 100)
+        retry = await store.arun("key-1", {"amount": 100}, write, 100)
+        return first, retry
+
+    first, retry = asyncio.run(main())
+    assert calls == [100]
+    assert first == {"result": {"transaction_id": "TFSA-1"}, "replayed": False}
+    assert retry == {"result": {"transaction_id": "TFSA-1"}, "replayed": True}
+    assert store.stats()["replays"] == 1
+
+
+def test_concurrent_retries_wait_for_the_write():
+    store = IdempotencyStore("test", path=None)
+    calls = []
+
+    async def write():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def main():
+        return await asyncio.gather(*(store.arun("key-1", {"amount": 1}, write) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert sum(result["replayed"] for result in results) == 4
+
+
+def test_key_reused_for_another_request():
+    store = IdempotencyStore("test", path=None)
+
+    async def main():
+        await store.arun("key-1", {"amount": 100}, lambda: "done")
+        await store.arun("key-1", {"amount": 200}, lambda: "done")
+
+    with pytest.raises(IdempotencyKeyReusedError):
+        asyncio.run(main())
+    assert store.stats()["key_conflicts"] == 1
+
+
+def test_failures_are_not_stored():
+    store = IdempotencyStore("test", path=None)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("core banking unavailable")
+        return "done"
+
+    async def main():
+        with pytest.raises(ConnectionError):
+            await store.arun("key-1", {"amount": 100}, flaky)
+        return await store.arun("key-1", {"amount": 100}, flaky)
+
+    assert asyncio.run(main()) == {"result": "done", "replayed": False}
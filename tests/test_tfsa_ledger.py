@@ -0,0 +1,36 @@
+import datetime
+
+from tfsa_ledger import TransactionLedger
+from transaction_journal import TransactionJournal
+
+YEAR = datetime.datetime.now().year
+
+
+def totals(ledger, user_id):
+    return ledger.yearly_totals(user_id).get(YEAR, {}).get("contributions", 0.0)
+
+
+def test_journal_replays_exactly_once_across_processes(tmp_path):
+    path = str(tmp_path / "transactions.journal")
+    writer = TransactionJournal(path)
+    # Journaled by a process that died before updating the ledger, interleaved with another writer
+    writer.append("tfsa_contribution", "TFSA", {"user_id": "u1", "amount": 1000.0, "tax_year": YEAR})
+    writer.append("etransfer_limit_increase", "LIMIT", {"user_id": "u1", "new_limit": 5000.0})
+    writer.append("tfsa_contribution", "TFSA", {"user_id": "u2", "amount": 250.0, "tax_year": YEAR})
+
+    a = TransactionLedger(str(tmp_path / "ledger"))
+    b = TransactionLedger(str(tmp_path / "ledger"))
+    assert a.apply_journal(TransactionJournal(path)) == 2
+    assert b.apply_journal(TransactionJournal(path)) == 0
+    assert (totals(b, "u1"), totals(b, "u2")) == (1000.0, 250.0)
+
+    writer.append("tfsa_contribution", "TFSA", {"user_id": "u1", "amount": 500.0, "tax_year": YEAR})
+    assert b.apply_journal(TransactionJournal(path)) == 1
+    assert a.apply_journal(TransactionJournal(path)) == 0
+    assert totals(a, "u1") == 1500.0
+
+    # A restarted process resumes from the committed cursor
+    restarted = TransactionLedger(str(tmp_path / "ledger"))
+    assert restarted.apply_journal(TransactionJournal(path)) == 0
+    assert totals(restarted, "u1") == 1500.0
+    assert (restarted.journal_seq, restarted.journal_offset) == (a.journal_seq, a.journal_offset)
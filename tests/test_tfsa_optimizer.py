@@ -0,0 +1,41 @@
+import datetime
+
+import numpy as np
+
+from tfsa_optimizer import _grid_dp, contribution_bounds, growth_weights, optimize_contributions, plan_contributions
+
+START = datetime.date(2026, 3, 1)
+
+
+def test_shortfall_month_contributes_nothing():
+    plan = plan_contributions({"checking_balance": 1500.0}, 20000.0, 4, cash_buffer=1000.0,
+                              monthly_savings=np.array([-1000.0, 5000.0, 5000.0, 0.0]), start=START)
+    assert plan["contribution"] == [500.0, 0.0, 4000.0, 5000.0]
+    # Month 2 is short by $500 before any contribution; every other month keeps the buffer
+    assert plan["checking_left"] == [1000.0, 0.0, 1000.0, 1000.0]
+
+
+def test_checking_keeps_buffer_where_forecast_does():
+    rng = np.random.default_rng(7)
+    savings = rng.normal(300, 1500, (2000, 36)).round(-2)
+    cash, room = contribution_bounds(1500.0, savings, 4000.0, 36, START.year, START.month, 1000.0)
+    contributions = optimize_contributions(cash, room)
+    total = np.cumsum(contributions, axis=-1)
+    assert (contributions >= 0).all()
+    assert (total <= room + 1e-9).all()
+    # checking_left >= cash_buffer is cash - total >= 0
+    assert (cash - total >= -1e-9)[cash >= 0].all()
+    # A shortfall month only carries what was already contributed
+    assert (contributions[cash < 0] == 0).all()
+
+
+def test_matches_grid_dp():
+    rng = np.random.default_rng(0)
+    months = 36
+    weights = growth_weights(months, 0.05)
+    savings = rng.normal(500, 1200, (40, months)).round(-2)
+    cash, room = contribution_bounds(2000.0, savings, 3000.0, months, START.year, START.month, 1000.0)
+    for row in range(len(savings)):
+        # On a $100 grid the closed form and the brute-force DP must find the same growth
+        grid = np.floor(np.minimum(cash[row], room[row]) / 100) * 100
+        assert abs(optimize_contributions(grid, grid) @ weights - _grid_dp(grid, grid, weights, 100.0)) < 1e-6, row
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+
+from tfsa_room import (ANNUAL_LIMITS, TFSA_ANNUAL_LIMITS_FILE, AnnualLimitTable, calculate_contribution_room,
+                       calculate_contribution_room_batch)
+
+with open(TFSA_ANNUAL_LIMITS_FILE) as f:
+    LIMITS = {int(year): float(limit) for year, limit in json.load(f).items()}
+TABLE = AnnualLimitTable(LIMITS)
+YEARS = range(2005, max(LIMITS) + 6)
+
+
+def table_limit(year: int) -> float:
+    # Years after the last configured one reuse its limit; before the first there is no room
+    if year < min(LIMITS):
+        return 0.0
+    return LIMITS.get(year, LIMITS[max(LIMITS)])
+
+
+def test_accumulated_room_sums_the_table():
+    for first_year in YEARS:
+        for end_year in YEARS:
+            expected = sum(table_limit(year) for year in range(first_year, end_year))
+            assert TABLE.accumulated_room(first_year, end_year) == expected, (first_year, end_year)
+            assert TABLE.limit(end_year) == table_limit(end_year)
+
+
+def test_array_lookups_match_scalar_ones():
+    first, end = np.meshgrid(np.array(YEARS), np.array(YEARS))
+    room = TABLE.accumulated_room(first, end)
+    assert room.shape == first.shape
+    assert all(room[i, j] == TABLE.accumulated_room(int(first[i, j]), int(end[i, j]))
+               for i in range(0, len(YEARS), 3) for j in range(len(YEARS)))
+
+
+def test_room_formula():
+    profile = {"age": 25, "first_tfsa_year": 2015, "past_contributions": 20000,
+               "current_year_contributions": 1500, "withdrawals_last_year": 2000}
+    current_year = 2026
+    # Turned 18 in 2019, after opening the account, so room starts accumulating then
+    accumulated = sum(ANNUAL_LIMITS.limit(year) for year in range(2019, current_year))
+    expected = accumulated + ANNUAL_LIMITS.limit(current_year) - 20000 - 1500 + 2000
+    assert calculate_contribution_room(profile, current_year=current_year) == expected
+
+
+def test_batch_matches_single_profiles():
+    rng = np.random.default_rng(3)
+    n = 500
+    profiles = {
+        "age": rng.integers(18, 80, n),
+        "first_tfsa_year": rng.integers(2000, 2027, n),
+        "past_contributions": rng.uniform(0, 80000, n).round(2),
+        "current_year_contributions": rng.uniform(0, 7000, n).round(2),
+        "withdrawals_last_year": rng.uniform(0, 5000, n).round(2),
+    }
+    batch = calculate_contribution_room_batch(profiles, current_year=2026)
+    for i in range(n):
+        profile = {field: column[i].item() for field, column in profiles.items()}
+        assert abs(batch[i] - calculate_contribution_room(profile, current_year=2026)) < 1e-6
@@ -0,0 +1,101 @@
+import datetime
+
+from tfsa_ledger import TransactionLedger
+from tfsa_room import ANNUAL_LIMITS, calculate_contribution_room
+from tfsa_room_store import ContributionRoomStore
+from transaction_journal import TransactionJournal
+
+PROFILE = {
+    "name": "Melanie",
+    "age": 25,
+    "first_tfsa_year": 2023,
+    "past_contributions": 6500,
+    "withdrawals_last_year": 2000,
+    "current_year_contributions": 1500,
+}
+YEAR = datetime.datetime.now().year
+LIMIT = ANNUAL_LIMITS.limit(YEAR)
+ROOM = calculate_contribution_room(PROFILE, LIMIT, YEAR)
+
+
+class Process:
+    """One server process: its own handles on the shared ledger and journal, and a room store"""
+
+    def __init__(self, tmp_path, store_path: str = ":memory:"):
+        self.ledger = TransactionLedger(str(tmp_path / "ledger"))
+        self.journal = TransactionJournal(str(tmp_path / "transactions.journal"))
+        self.store = ContributionRoomStore(store_path)
+
+    def room(self, user_id: str = "user_123") -> float:
+        # As calculation_agent reads it
+        with self.ledger.snapshot() as position:
+            return self.store.get_or_compute(
+                user_id, YEAR, None, LIMIT, lambda: self.ledger.room_from_history(user_id, PROFILE, LIMIT, YEAR),
+                position, lambda user, since: self.ledger.contributed_since(self.journal, user, since, position[0]))
+
+    def apply(self) -> int:
+        # As apply_journaled_contributions brings the ledger and this process's store up to date
+        return self.ledger.apply_journal(
+            self.journal, lambda record: self.ledger.seed_if_empty(record["user_id"], PROFILE, YEAR),
+            lambda record, since, position: self.store.apply_contribution(
+                record["user_id"], YEAR, record["amount"], since, position))
+
+    def contribute(self, amount: float, user_id: str = "user_123", crash: bool = False):
+        # As execute_tfsa_contribution writes it: journal first, then the shared ledger
+        self.journal.append("tfsa_contribution", "TFSA", {"user_id": user_id, "amount": amount, "tax_year": YEAR})
+        if not crash:
+            self.apply()
+
+
+def test_private_stores_see_each_others_contributions(tmp_path):
+    a, b = Process(tmp_path), Process(tmp_path)
+    assert a.room() == b.room() == ROOM
+
+    a.contribute(1000)
+
+    assert b.room() == ROOM - 1000
+    assert a.room() == ROOM - 1000
+    assert b.store.stats()["ledger_stale"] == 1
+    # a's own entry was updated in place and needed no recompute
+    assert (a.store.contributions, a.store.ledger_stale) == (1, 0)
+
+
+def test_contribution_applied_by_another_process(tmp_path):
+    a, b = Process(tmp_path), Process(tmp_path)
+    assert a.room() == b.room() == ROOM
+
+    # b journals a contribution but dies before the ledger; a's next apply picks it up
+    b.contribute(1000, crash=True)
+    assert a.apply() == 1
+
+    assert b.room() == ROOM - 1000
+    assert a.room() == ROOM - 1000
+    assert b.apply() == 0
+    assert b.room() == ROOM - 1000
+
+
+def test_shared_store_file(tmp_path):
+    path = str(tmp_path / "contribution_room.sqlite")
+    a, b = Process(tmp_path, path), Process(tmp_path, path)
+    assert a.room() == ROOM
+    assert b.room() == ROOM
+    assert b.store.hits == 1
+
+    a.contribute(1000)
+
+    assert b.room() == ROOM - 1000
+    assert a.room() == ROOM - 1000
+    # The shared entry was updated in place once, so neither process recomputed it
+    assert (a.store.ledger_stale, b.store.ledger_stale) == (0, 0)
+
+
+def test_other_users_contributions_keep_the_entry(tmp_path):
+    a, b = Process(tmp_path), Process(tmp_path)
+    assert a.room() == ROOM
+
+    b.contribute(500, "user_456")
+
+    assert a.room() == ROOM
+    assert a.room() == ROOM
+    assert (a.store.hits, a.store.ledger_stale) == (2, 0)
+    assert b.room("user_456") == ROOM - 500
@@ -0,0 +1,16 @@
+import datetime
+
+from tfsa_room import ANNUAL_LIMITS
+from tfsa_schedule import compare_schedules
+
+START = datetime.date(2026, 11, 1)
+
+
+def test_withdrawals_this_year_come_back_next_january():
+    # Fills next year's limit plus $2,000 of room that only this year's withdrawal gives back
+    schedule = [{"month": "2027-01", "contribution": ANNUAL_LIMITS.limit(2027) + 2000.0}]
+    without = compare_schedules([schedule], 0.0, months=3, start=START)
+    withdrawn = compare_schedules([schedule], 0.0, months=3, start=START, withdrawals_this_year=2000.0)
+    assert without["schedules"][0]["peak_excess"] == 2000.0
+    assert withdrawn["schedules"][0]["peak_excess"] == 0.0
+    assert withdrawn["schedules"][0]["total_penalty"] == 0.0
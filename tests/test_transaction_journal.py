@@ -0,0 +1,46 @@
+import pytest
+
+from transaction_journal import JournalCorruptedError, TransactionJournal
+
+
+def write_records(path, count):
+    journal = TransactionJournal(path)
+    return [journal.append("tfsa_contribution", "TFSA", {"user_id": "u1", "amount": 100.0 * i})
+            for i in range(1, count + 1)]
+
+
+def test_torn_tail_is_truncated_on_open(tmp_path):
+    path = str(tmp_path / "transactions.journal")
+    write_records(path, 3)
+    torn = b'1234abcd {"kind":"tfsa_contribution","seq":4'
+    with open(path, "ab") as f:
+        f.write(torn)
+
+    journal = TransactionJournal(path)
+    record = journal.append("tfsa_contribution", "TFSA", {"user_id": "u1", "amount": 400.0})
+
+    assert (journal.recovered_records, journal.truncated_bytes) == (3, len(torn))
+    assert record["seq"] == 4
+    assert [r["amount"] for r in journal.replay()] == [100.0, 200.0, 300.0, 400.0]
+
+
+def test_corruption_before_the_end_is_an_error(tmp_path):
+    path = str(tmp_path / "transactions.journal")
+    write_records(path, 3)
+    with open(path, "r+b") as f:
+        f.seek(12)
+        f.write(b"X")
+
+    with pytest.raises(JournalCorruptedError):
+        TransactionJournal(path).append("tfsa_contribution", "TFSA", {"user_id": "u1", "amount": 1.0})
+
+
+def test_processes_sharing_a_journal_get_unique_sequence_numbers(tmp_path):
+    path = str(tmp_path / "transactions.journal")
+    a, b = TransactionJournal(path), TransactionJournal(path)
+    records = [(a if i % 2 else b).append("etransfer_limit_increase", "LIMIT", {"user_id": "u1", "new_limit": i})
+               for i in range(10)]
+
+    assert [record["seq"] for record in records] == list(range(1, 11))
+    assert len({record["id"] for record in records}) == 10
+    assert [record["new_limit"] for record in a.replay(after_seq=8)] == [8, 9]
@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+from ttl_cache import MISSING, TieredCache, cached
+
+
+def test_async_lookups_read_sqlite_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    TieredCache("search", ttl=60, path=path).set("q", ["result"])
+
+    cache = TieredCache("search", ttl=60, path=path)
+    disk_reads = []
+    get_disk = cache._get_disk
+    cache._get_disk = lambda *args: disk_reads.append(threading.current_thread()) or get_disk(*args)
+    calls = []
+
+    @cached(cache, lambda query: query)
+    async def search(query):
+        calls.append(query)
+        return [query]
+
+    async def main():
+        return await search("q"), await search("q"), await search("other"), threading.current_thread()
+
+    first, second, other, loop_thread = asyncio.run(main())
+    assert first == second == ["result"]
+    assert (other, calls) == (["other"], ["other"])
+    # One disk hit for "q" (then served from memory) and one miss for "other", both in worker threads
+    assert len(disk_reads) == 2 and loop_thread not in disk_reads
+    assert cache.peek("other") == ["other"]
+    assert TieredCache("search", ttl=60, path=path).get("other") == ["other"]
+    assert cache.peek("missing") is MISSING
@@ -1,21 +1,33 @@
+import asyncio
 import datetime
+import functools
 import json
 import operator
 import os
 import re
-from typing import TypedDict, Annotated, Optional
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypedDict, Annotated, Optional
 
 from dotenv import load_dotenv
-from langchain.tools import tool
-from langgraph.graph import StateGraph, END
+from langchain_core.tools import tool
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, START, END
+
+from llm_cache import cached_llm
+from single_flight import SingleFlight, coalesce
+from tfsa_policy_snapshot import PolicySnapshotRefresher, parse_limit, policy_snapshots
+from ttl_cache import TieredCache, cached
+
+# The room arithmetic, ledger, journal, fraud scorer, room store, projection, schedule and optimizer
+# modules (and NumPy behind them) are imported by the nodes that use them, on first use
 
 # Reduces call center volume by 80%+
 # Processes contributions in <2 seconds
 # Ensures 100% compliance with CRA regulations
 # Provides personalized financial guidance
-# TODO: Withdrawal simulation agent
-# TODO: Contribution optimization advisor
-# TODO: Multi-year projection tool
 # TODO: Integrated tax impact analysis
 
 load_dotenv('.env')
@@ -26,13 +38,21 @@ load_dotenv('.env')
 # DEEPSEEK_API_KEY = os.environ['DEEPSEEK_API_KEY']
 # llm = ChatDeepSeek(model="deepseek-chat", temperature=0, api_key=DEEPSEEK_API_KEY)
 
-# Configuration for Ollama. Initialize Ollama with qwen2.5vl:7b model locally
-from langchain_ollama import ChatOllama
+# Configuration for Ollama. Initialize Ollama with qwen2.5vl:7b model locally, on first use
+llm = None
+
+
+def get_llm():
+    """LLM shared by the agents, constructed on first use so importing this module stays cheap"""
+    global llm
+    if llm is None:
+        from langchain_ollama import ChatOllama
 
-llm = ChatOllama(
-    model="qwen2.5vl:7b",
-    # other params...
-    temperature=0)  # Use your preferred qwen2.5vl:7b variant
+        llm = cached_llm(ChatOllama(
+            model="qwen2.5vl:7b",
+            # other params...
+            temperature=0))  # Use your preferred qwen2.5vl:7b variant
+    return llm
 
 # Configuration for Watsonx.ai
 # from ibm_watson_machine_learning.foundation_models import Model
@@ -72,8 +92,10 @@ llm = ChatOllama(
 #
 # llm = WatsonLLM()
 
-# Load Tavily API key (set as environment variable TAVILY_API_KEY)
-TAVILY_API_KEY = os.environ['TAVILY_API_KEY']
+
+def _tavily_api_key() -> str:
+    # Load Tavily API key (set as environment variable TAVILY_API_KEY) when a search runs
+    return os.environ['TAVILY_API_KEY']
 
 
 # ======================
@@ -86,15 +108,42 @@ class AgentState(TypedDict):
     search_results: Optional[list]
     contribution_room: Optional[float]
     contribution_amount: Optional[float]
+    pending_search: Optional[Any]
+    projection_request: Optional[dict]
+    projection: Optional[dict]
+    schedule_request: Optional[dict]
+    schedule_simulation: Optional[dict]
+    advice_request: Optional[dict]
+    contribution_plan: Optional[dict]
     messages: Annotated[list[dict], operator.add]
 
 
+# Policy search results change at most once a year, so cache them in memory and on disk
+policy_search_cache = TieredCache(
+    "policy_search",
+    maxsize=int(os.getenv("POLICY_SEARCH_CACHE_SIZE", "128")),
+    ttl=float(os.getenv("POLICY_SEARCH_CACHE_TTL", "86400")),
+    path=os.getenv("POLICY_SEARCH_CACHE_PATH", ".cache/policy_search.sqlite") or None)
+
+
+def _policy_search_key(backend: str):
+    def key(query: str) -> str:
+        # Queries are normalized and scoped to the year the search is made for
+        normalized = " ".join(query.lower().split())
+        return f"{backend}:{datetime.datetime.now().year}:{normalized}"
+
+    return key
+
+
 # ======================
 # 2. Tool Definitions
 # ======================
-@tool
-def retrieve_user_profile(user_id: str) -> dict:
-    """Retrieves user's profile from bank database"""
+# Identical concurrent profile reads (page refreshes, polling front ends) share one lookup
+profile_reads = SingleFlight("tfsa_profile")
+
+
+def load_user_profile(user_id: str) -> dict:
+    """Retrieves user's profile from bank database, uncoalesced (writes read through this)"""
     # Mock implementation - replace with actual DB call or API
     # TODO: Add JWT validation using PyJWT for user sessions
     # TODO: Integrate with bank's SSO system
@@ -107,11 +156,21 @@ def retrieve_user_profile(user_id: str) -> dict:
         "past_contributions": 6500,  # 2023 limit
         "withdrawals_last_year": 2000,
         "current_year_contributions": 1500,
-        "checking_balance": 8500.00
+        "tfsa_balance": 8000.00,
+        "checking_balance": 8500.00,
+        "monthly_savings": 1200.00  # projected income left after expenses
     }
 
 
 @tool
+@coalesce(profile_reads, key=lambda user_id: user_id)
+def retrieve_user_profile(user_id: str) -> dict:
+    """Retrieves user's profile from bank database"""
+    return load_user_profile(user_id)
+
+
+@tool
+@cached(policy_search_cache, _policy_search_key("duckduckgo"))
 def search_cra_tfsa_policy_duck_duck_go(query: str) -> str:
     """Searches Canada CRA website for current TFSA policies"""
     from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
@@ -121,11 +180,12 @@ def search_cra_tfsa_policy_duck_duck_go(query: str) -> str:
 
 
 @tool
+@cached(policy_search_cache, _policy_search_key("tavily"))
 def search_cra_tfsa_policy(query: str) -> list:
     """Searches Canada CRA website for current TFSA policies using Tavily"""
     # pip install -U langchain-tavily
     from langchain_tavily import TavilySearch
-    tavily = TavilySearch(api_key=TAVILY_API_KEY, max_results=3)
+    tavily = TavilySearch(api_key=_tavily_api_key(), max_results=3)
     # Real-time policy verification using Tavily search
     results = tavily.invoke({
         "query": f"site:canada.ca TFSA {datetime.datetime.now().year} {query}",
@@ -136,29 +196,79 @@ def search_cra_tfsa_policy(query: str) -> list:
     return results
 
 
+@tool
+@cached(policy_search_cache, _policy_search_key("tavily"))
+async def asearch_cra_tfsa_policy(query: str) -> list:
+    """Searches Canada CRA website for current TFSA policies using Tavily (async client)"""
+    from langchain_tavily import TavilySearch
+    tavily = TavilySearch(api_key=_tavily_api_key(), max_results=3)
+    return await tavily.ainvoke({
+        "query": f"site:canada.ca TFSA {datetime.datetime.now().year} {query}",
+        "search_depth": "advanced",
+        "include_answer": True,
+        "include_raw_content": True
+    })
+
+
+def apply_journaled_contributions() -> int:
+    """Brings the ledger and room_store up to date with the contributions committed to the journal.
+
+    Whoever journaled a contribution (this call, another process, or a write a crash kept from the
+    ledger), it is subtracted in place from a materialized room that reflects the ledger just
+    before it. Any other entry for the user, in this process's store or another's, is recomputed
+    on its next read because the ledger moved past the journal position it was tagged with.
+    """
+    from tfsa_ledger import ledger
+    from tfsa_room_store import room_store
+    from transaction_journal import journal
+
+    def before_apply(record: dict):
+        user_id = record["user_id"]
+        # Event-sourced history: opened from the profile aggregates on a user's first write
+        ledger.seed_if_empty(user_id, load_user_profile(user_id), record["tax_year"])
+
+    def after_apply(record: dict, since: tuple, position: tuple):
+        room_store.apply_contribution(record["user_id"], record["tax_year"], record["amount"], since, position)
+
+    return ledger.apply_journal(journal, before_apply, after_apply)
+
+
 @tool
 def execute_tfsa_contribution(user_id: str, amount: float) -> dict:
     """Executes TFSA contribution transaction from checking account"""
+    from fraud_scoring import fraud_scorer
+    from tfsa_ledger import ledger
+    from transaction_journal import journal
+
     # Mock implementation - replace with banking API
-    profile = retrieve_user_profile.invoke(user_id)
+    profile = load_user_profile(user_id)
     if amount > profile["checking_balance"]:
         return {"status": "failed", "reason": "Insufficient funds"}
 
-    new_contributions = profile["current_year_contributions"] + amount
+    # Scored before it is written so the score is journaled with the contribution
+    fraud_score = fraud_scorer.observe(user_id, "tfsa_contribution", amount)
+
+    # The journal is the system of record: the contribution exists once it is fsynced there
+    current_year = datetime.datetime.now().year
+    record = journal.append("tfsa_contribution", "TFSA", {"user_id": user_id, "amount": amount,
+                                                          "tax_year": current_year, "fraud_score": fraud_score})
+
+    # Ledger and materialized room follow from the journal, including anything an earlier crash left behind
+    apply_journaled_contributions()
+    new_contributions = ledger.yearly_totals(user_id)[current_year]["contributions"]
     return {
         "status": "success",
         "new_balance": 6500 + new_contributions,  # Base + contributions
         "new_contributions": new_contributions,
-        "transaction_id": f"TFSA-{datetime.datetime.now().year}-{hash(str(datetime.datetime.now()))}"
+        "transaction_id": record["id"],
+        "fraud_score": fraud_score
     }
 
 
 # ======================
 # 3. Agent Definitions
 # ======================
-def profile_agent(state: AgentState):
-    """Retrieves user profile and initializes state"""
-    profile = retrieve_user_profile.invoke(state["user_id"])
+def _profile_update(profile: dict):
     return {
         "user_profile": profile,
         "messages": [{
@@ -168,21 +278,26 @@ def profile_agent(state: AgentState):
     }
 
 
-def document_agent(state: AgentState):
-    """Agent with knowledge of historical TFSA rules"""
+def profile_agent(state: AgentState):
+    """Retrieves user profile and initializes state"""
+    return _profile_update(retrieve_user_profile.invoke(state["user_id"]))
+
+
+async def aprofile_agent(state: AgentState):
+    """Async variant of profile_agent"""
+    return _profile_update(await retrieve_user_profile.ainvoke(state["user_id"]))
+
+
+def _document_prompt(state: AgentState) -> str:
+    from tfsa_room import ANNUAL_LIMITS
+
     current_year = datetime.datetime.now().year
-    prompt = f"""
+    return f"""
     You are a TFSA policy expert. Current year: {current_year}
     User: {state['user_profile']['name']}, Age: {state['user_profile']['age']}
 
     Known historical rules:
-    - Annual limit 2009-2012: $5000
-    - Annual limit 2013-2014: $5500
-    - Annual limit 2015: $10000
-    - Annual limit 2016-2018: $5500
-    - Annual limit 2019-2022: $6000
-    - Annual limit 2023: $6500
-    - Annual limit 2024: $7000
+{ANNUAL_LIMITS.describe(prefix="    - Annual limit ")}
     - Withdrawals re-added to room NEXT calendar year
     - Overcontribution penalty: 1% per month
 
@@ -207,7 +322,48 @@ def document_agent(state: AgentState):
     - Suggestions for how I could improve or scale it later
     """
 
-    response = llm.invoke(prompt)
+
+# "rules" answers document_agent from the limit table whenever it covers the current year and only
+# falls back to the LLM otherwise; "llm" always asks the LLM
+TFSA_DOCUMENT_AGENT_MODE = os.getenv("TFSA_DOCUMENT_AGENT_MODE", "rules")
+document_agent_stats = Counter(rules=0, llm=0)
+
+
+def _rules_answer_document() -> bool:
+    from tfsa_room import ANNUAL_LIMITS
+
+    # When this holds document_agent answers from the table and never asks for a search
+    return TFSA_DOCUMENT_AGENT_MODE == "rules" and datetime.datetime.now().year <= ANNUAL_LIMITS.last_year
+
+
+def _rules_document_update(state: AgentState):
+    """Deterministic policy summary, or None when the rules table can't answer"""
+    if not _rules_answer_document():
+        return None
+    from tfsa_room import ANNUAL_LIMITS, room_start_year
+
+    current_year = datetime.datetime.now().year
+    document_agent_stats["rules"] += 1
+    profile = state['user_profile']
+    # Same start year calculation_agent counts room from
+    first_year = room_start_year(profile, current_year)
+    summary = (
+        f"The {current_year} TFSA annual limit is ${ANNUAL_LIMITS.limit(current_year):.0f}, and unused room "
+        f"accumulates from {first_year}, the later of the year {profile['name']} turned 18 and the first "
+        f"TFSA year on file. "
+        f"Withdrawals are re-added to contribution room the next calendar year, and over-contributions "
+        f"are taxed at 1% per month."
+    )
+    return {
+        "messages": [{
+            "role": "document_agent",
+            "content": summary,
+            "needs_search": False
+        }]
+    }
+
+
+def _document_update(response):
     try:
         data = json.loads(response.content.strip() if hasattr(response, 'content') else response.strip())
     except:
@@ -222,14 +378,26 @@ def document_agent(state: AgentState):
     }
 
 
-def search_agent(state: AgentState):
-    """Agent that searches for current TFSA policies using Tavily"""
-    try:
-        results = search_cra_tfsa_policy.invoke("contribution limit")
+def document_agent(state: AgentState):
+    """Agent with knowledge of historical TFSA rules"""
+    if update := _rules_document_update(state):
+        return update
+    document_agent_stats["llm"] += 1
+    return _document_update(get_llm().invoke(_document_prompt(state)))
+
+
+async def adocument_agent(state: AgentState):
+    """Async variant of document_agent"""
+    if update := _rules_document_update(state):
+        return update
+    document_agent_stats["llm"] += 1
+    return _document_update(await get_llm().ainvoke(_document_prompt(state)))
 
-        # Search results: {results}
-        # Extract key information. Process results with LLM
-        prompt = f"""
+
+def _policy_prompt(results) -> str:
+    # Search results: {results}
+    # Extract key information. Process results with LLM
+    return f"""
         Analyze these CRA TFSA policy search results for {datetime.datetime.now().year}:
         {json.dumps(results, indent=2)}
 
@@ -240,78 +408,176 @@ def search_agent(state: AgentState):
           "withdrawal_rules": "1-2 sentence summary of withdrawal rules"
         }}
         """
-        response = llm.invoke(prompt)
-        # Access the content attribute of the response
-        response_content = response.content.strip() if hasattr(response, 'content') else response.strip()
 
-        # Try to parse the JSON response
-        try:
-            policy_data = json.loads(response_content)
-        except json.JSONDecodeError:
-            # If parsing fails, try to extract JSON from the response
-            json_match = re.search(r'\{.*}', response_content, re.DOTALL)
-            if json_match:
-                policy_data = json.loads(json_match.group())
-            else:
-                policy_data = {"error": "Could not parse policy data"}
 
-        return {
-            "search_results": results,
-            "messages": [{
-                "role": "search_agent",
-                "content": f"Current TFSA Policy: {policy_data}",
-                "policy_data": policy_data
-            }]
-        }
+def _parse_policy_data(response) -> dict:
+    # Access the content attribute of the response
+    response_content = response.content.strip() if hasattr(response, 'content') else response.strip()
+
+    # Try to parse the JSON response
+    try:
+        return json.loads(response_content)
+    except json.JSONDecodeError:
+        # If parsing fails, try to extract JSON from the response
+        json_match = re.search(r'\{.*}', response_content, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+        return {"error": "Could not parse policy data"}
+
+
+def _search_update(results, policy_data: dict):
+    return {
+        "search_results": results,
+        "messages": [{
+            "role": "search_agent",
+            "content": f"Current TFSA Policy: {policy_data}",
+            "policy_data": policy_data
+        }]
+    }
+
+
+def _search_failed(e: Exception):
+    return {
+        "messages": [{
+            "role": "search_agent",
+            "content": f"⚠️ Search failed: {str(e)}"
+        }]
+    }
+
+
+def fetch_policy_data() -> dict:
+    """Live search + LLM extraction of the current policy (used by the background refresher)"""
+    results = search_cra_tfsa_policy.invoke("contribution limit")
+    return _parse_policy_data(get_llm().invoke(_policy_prompt(results)))
+
+
+policy_refresher = PolicySnapshotRefresher(policy_snapshots, fetch_policy_data)
+
+
+def start_policy_refresher():
+    """Keep the policy snapshot fresh in the background so search_agent never waits on it"""
+    policy_refresher.start()
+
+
+def _snapshot_update():
+    # Serve the last good snapshot for this tax year without any search or LLM call
+    snapshot = policy_snapshots.current(datetime.datetime.now().year)
+    if snapshot is None:
+        return None
+    return _search_update(None, snapshot["policy_data"])
+
+
+def search_agent(state: AgentState):
+    """Agent that searches for current TFSA policies using Tavily"""
+    if update := _snapshot_update():
+        return update
+    try:
+        results = search_cra_tfsa_policy.invoke("contribution limit")
+        return _search_update(results, _parse_policy_data(get_llm().invoke(_policy_prompt(results))))
     except Exception as e:
-        return {
-            "messages": [{
-                "role": "search_agent",
-                "content": f"⚠️ Search failed: {str(e)}"
-            }]
-        }
+        return _search_failed(e)
+
+
+async def asearch_agent(state: AgentState):
+    """Async variant of search_agent"""
+    if update := _snapshot_update():
+        return update
+    try:
+        results = await asearch_cra_tfsa_policy.ainvoke("contribution limit")
+        return _search_update(results, _parse_policy_data(await get_llm().ainvoke(_policy_prompt(results))))
+    except Exception as e:
+        return _search_failed(e)
+
+
+# Runs speculative policy searches for the sync graph (app.stream); app.astream uses asyncio tasks
+_prefetch_executor: Optional[ThreadPoolExecutor] = None
+_prefetch_executor_lock = threading.Lock()
+
+
+def _get_prefetch_executor() -> ThreadPoolExecutor:
+    # Created on the first speculative search, so importing this module starts no threads
+    global _prefetch_executor
+    with _prefetch_executor_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TFSA_PREFETCH_WORKERS", "8")),
+                                                    thread_name_prefix="policy-prefetch")
+        return _prefetch_executor
+
+
+def policy_prefetch_agent(state: AgentState):
+    """Starts the policy search in the background and returns at once (parallel graph).
+
+    The search needs nothing from the profile, so it runs speculatively while profile_agent and
+    document_agent do; prefetched_search_agent waits for it only if after_document asks for it.
+    The handle lives in state, which is fine because the graph is compiled without a checkpointer.
+    """
+    if _rules_answer_document():
+        # document_agent will not ask for a search, so don't spend one
+        return {"pending_search": None}
+    return {"pending_search": _get_prefetch_executor().submit(search_agent, state)}
+
+
+async def apolicy_prefetch_agent(state: AgentState):
+    """Async variant of policy_prefetch_agent"""
+    if _rules_answer_document():
+        return {"pending_search": None}
+    return {"pending_search": asyncio.ensure_future(asearch_agent(state))}
+
+
+def prefetched_search_agent(state: AgentState):
+    """Joins the prefetch with document_agent: uses the search if needed, otherwise discards it"""
+    prefetch = state["pending_search"]
+    if after_document(state) != "search_agent":
+        if prefetch is not None:
+            prefetch.cancel()
+        return {"pending_search": None}
+    return {**(prefetch.result() if prefetch is not None else search_agent(state)), "pending_search": None}
+
+
+async def aprefetched_search_agent(state: AgentState):
+    """Async variant of prefetched_search_agent"""
+    prefetch = state["pending_search"]
+    if after_document(state) != "search_agent":
+        if prefetch is not None:
+            prefetch.cancel()
+        return {"pending_search": None}
+    update = await asyncio.wrap_future(prefetch) if prefetch is not None else await asearch_agent(state)
+    return {**update, "pending_search": None}
 
 
 def calculation_agent(state: AgentState):
     """Calculates contribution room based on profile and policies"""
+    from tfsa_ledger import ledger
+    from tfsa_room import ANNUAL_LIMITS
+    from tfsa_room_store import room_store
+    from transaction_journal import journal
+
     # Dynamic contribution room calculation
     current_year = datetime.datetime.now().year
     profile = state["user_profile"]
 
-    # Get current year limit
-    current_limit = 7000  # Default for 2024
+    # Get current year limit: searched policy, then the policy snapshot, then the limit table
+    current_limit = ANNUAL_LIMITS.limit(current_year)
+    policy_version = None
+    if snapshot := policy_snapshots.current(current_year):
+        current_limit = parse_limit(snapshot["policy_data"]["current_limit"])
+        policy_version = snapshot["version"]
     for msg in reversed(state["messages"]):
         if "policy_data" in msg:
             try:
                 # Extract numerical value from string
-                limit_str = re.search(r'\$?(\d{1,3}(?:,\d{3})*(?:\.\d+)?)',
-                                      str(msg["policy_data"].get("current_limit", "")))
-                if limit_str:
-                    current_limit = float(limit_str.group(1).replace(',', ''))
+                current_limit = parse_limit(msg["policy_data"].get("current_limit", "")) or current_limit
             except:
                 pass
             break
 
-    # Calculate total accumulated room
-    birth_year = current_year - profile["age"]
-    first_year = max(profile["first_tfsa_year"], birth_year + 18)
-
-    # Historical limits
-    limits = {
-        2019: 6000, 2020: 6000, 2021: 6000, 2022: 6000,
-        2023: 6500, 2024: 7000
-    }
-
-    total_room = 0
-    for year in range(first_year, current_year):
-        total_room += limits.get(year, 6000)  # Default to 6000 for unknown years
-
-    # Add current year's limit
-    total_room += current_limit
-
-    # Calculate available room
-    used_room = profile["past_contributions"] + profile["current_year_contributions"]
-    available_room = total_room - used_room + profile["withdrawals_last_year"]
+    # Materialized room for this user and year, recomputed when it is missing, the policy changed or
+    # any process applied a contribution by the user to the ledger since it was stored
+    with ledger.snapshot() as position:
+        available_room = room_store.get_or_compute(
+            state["user_id"], current_year, policy_version, current_limit,
+            lambda: ledger.room_from_history(state["user_id"], profile, current_limit, current_year),
+            position, lambda user_id, since: ledger.contributed_since(journal, user_id, since, position[0]))
 
     return {
         "contribution_room": available_room,
@@ -322,12 +588,8 @@ def calculation_agent(state: AgentState):
     }
 
 
-def transaction_agent(state: AgentState):
-    """Handles transaction execution"""
-    # TODO: Encrypt PII data using AES-256
-    # TODO: Add transaction confirmation step
-    # TODO: Implement fraud detection hooks
-
+def _validate_transaction(state: AgentState):
+    """Returns (amount, None) for a valid request or (0, rejection update)"""
     # Extract amount from user input
     amount = 0
     amount_match = re.search(r"\$?(\d{1,3}(?:,\d{3})*\d*(?:\.\d+)?)", state["user_input"])
@@ -339,25 +601,55 @@ def transaction_agent(state: AgentState):
             amount = 0
 
     if amount <= 0:
-        return {
-            "messages": [{
-                "role": "assistant",
-                "content": "Please specify a valid contribution amount (e.g., '$500')"
-            }]
-        }
+        # No amount given: suggest this month's amount from the optimized contribution plan
+        advice = contribution_advisor_agent(state)
+        suggested = advice["contribution_plan"]["suggested_amount"]
+        if suggested <= 0:
+            return 0, {
+                "messages": [{
+                    "role": "assistant",
+                    "content": "Please specify a valid contribution amount (e.g., '$500')"
+                }]
+            }
+        advice["messages"][-1]["content"] += f"\nReply with an amount (e.g., 'Contribute ${suggested:,.2f}') to proceed"
+        return 0, advice
 
     # Validate against contribution room
     if amount > state["contribution_room"]:
-        return {
+        return 0, {
             "messages": [{
                 "role": "assistant",
                 "content": f"⚠️ Amount exceeds contribution room by ${amount - state['contribution_room']:.2f}"
             }]
         }
 
-    # Execute transaction
-    result = execute_tfsa_contribution.invoke({"user_id": state["user_id"], "amount": amount})
+    return amount, None
+
+
+def contribution_advisor_agent(state: AgentState):
+    """Suggests how much to contribute now from the growth-maximizing contribution schedule"""
+    from tfsa_optimizer import plan_contributions
+
+    plan = plan_contributions(state["user_profile"], state["contribution_room"], **(state["advice_request"] or {}))
+    upcoming = [f"${amount:,.2f} in {month}" for month, amount in zip(plan["month"][1:], plan["contribution"][1:])
+                if amount > 0][:3]
+    return {
+        "contribution_plan": plan,
+        "messages": [{
+            "role": "assistant",
+            "content": (
+                f"💡 Suggested contribution now: ${plan['suggested_amount']:,.2f}"
+                + (f", then {', '.join(upcoming)}" if upcoming else "")
+                + f". This puts ${plan['total_contributions']:,.2f} in your TFSA over {plan['assumptions']['months']} "
+                f"months without over-contributing or dipping below ${plan['assumptions']['cash_buffer']:,.2f} in "
+                f"checking, for about ${plan['projected_growth']:,.2f} of tax-free growth at "
+                f"{plan['assumptions']['expected_return']:.0%} a year"
+            )
+        }]
+    }
 
+
+def _transaction_update(state: AgentState, amount: float, result: dict):
     if result["status"] == "success":
         new_room = state["contribution_room"] - amount
         return {
@@ -381,21 +673,82 @@ def transaction_agent(state: AgentState):
         }
 
 
+def transaction_agent(state: AgentState):
+    """Handles transaction execution"""
+    # TODO: Encrypt PII data using AES-256
+    # TODO: Add transaction confirmation step
+    amount, rejection = _validate_transaction(state)
+    if rejection:
+        return rejection
+
+    # Execute transaction
+    result = execute_tfsa_contribution.invoke({"user_id": state["user_id"], "amount": amount})
+    return _transaction_update(state, amount, result)
+
+
+async def atransaction_agent(state: AgentState):
+    """Async variant of transaction_agent"""
+    amount, rejection = _validate_transaction(state)
+    if rejection:
+        return rejection
+
+    result = await execute_tfsa_contribution.ainvoke({"user_id": state["user_id"], "amount": amount})
+    return _transaction_update(state, amount, result)
+
+
+def projection_agent(state: AgentState):
+    """Projects balance and contribution room from the room calculation_agent found"""
+    from tfsa_projection import project
+
+    projection = project(state["user_profile"], current_room=state["contribution_room"],
+                         **state["projection_request"])
+    final = projection["final_balance"]
+    return {
+        "projection": projection,
+        "messages": [{
+            "role": "assistant",
+            "content": (
+                f"📈 Contributing ${projection['assumptions']['annual_contribution']:,.2f} a year, your TFSA could "
+                f"reach ${final['p50']:,.2f} by {projection['year'][-1]} (median of "
+                f"{projection['assumptions']['paths']:,} simulations; 10th-90th percentile "
+                f"${final['p10']:,.2f} - ${final['p90']:,.2f}) from ${projection['total_contributions']:,.2f} "
+                f"of contributions"
+            )
+        }]
+    }
+
+
+def schedule_simulation_agent(state: AgentState):
+    """Simulates candidate withdrawal/contribution schedules month by month from the current room"""
+    from tfsa_ledger import ledger
+    from tfsa_schedule import compare_schedules
+
+    # Withdrawals already made this year are re-added next January, like the simulated ones
+    current_year = datetime.datetime.now().year
+    withdrawals_this_year = ledger.yearly_totals(state["user_id"]).get(current_year, {}).get("withdrawals", 0.0)
+    simulation = compare_schedules(starting_room=state["contribution_room"],
+                                   withdrawals_this_year=withdrawals_this_year, **state["schedule_request"])
+    best = simulation["schedules"][simulation["best_schedule"]]
+    penalized = sum(1 for schedule in simulation["schedules"] if schedule["total_penalty"] > 0)
+    return {
+        "schedule_simulation": simulation,
+        "messages": [{
+            "role": "assistant",
+            "content": (
+                f"🗓️ Simulated {len(simulation['schedules'])} schedule(s) over {simulation['months']} months: "
+                f"{penalized} would over-contribute. Schedule #{best['schedule']} is best with "
+                f"${best['total_penalty']:,.2f} in penalties and ${best['final_room']:,.2f} of room left"
+            )
+        }]
+    }
+
+
 # ======================
 # 4. Graph Construction
 # ======================
-workflow = StateGraph(AgentState)
-
-# Define nodes
-workflow.add_node("profile_agent", profile_agent)
-workflow.add_node("document_agent", document_agent)
-workflow.add_node("search_agent", search_agent)
-workflow.add_node("calculation_agent", calculation_agent)
-workflow.add_node("transaction_agent", transaction_agent)
-
-# Define edges
-workflow.set_entry_point("profile_agent")
-workflow.add_edge("profile_agent", "document_agent")
+# "parallel" starts the policy search speculatively alongside profile_agent -> document_agent and
+# joins before calculation_agent; "sequential" is the original one-node-at-a-time graph
+TFSA_GRAPH_MODE = os.getenv("TFSA_GRAPH_MODE", "parallel")
 
 
 # Conditional edges
@@ -405,61 +758,276 @@ def after_document(state: AgentState):
     return "calculation_agent"
 
 
-workflow.add_conditional_edges(
-    "document_agent",
-    after_document,
-    {"search_agent": "search_agent", "calculation_agent": "calculation_agent"}
-)
-
-workflow.add_edge("search_agent", "calculation_agent")
-workflow.add_edge("calculation_agent", "transaction_agent")
-workflow.add_edge("transaction_agent", END)
-
-# Compile the graph
-app = workflow.compile()
-
-png_graph = app.get_graph().draw_mermaid_png()
-with open("tfsa_graph.png", "wb") as f:
-    f.write(png_graph)
-
-print(f"Graph saved as 'tfsa_graph.png' in {os.getcwd()}")
+def build_workflow(mode: str = TFSA_GRAPH_MODE) -> StateGraph:
+    if mode not in ("parallel", "sequential"):
+        raise ValueError(f"Unknown TFSA graph mode: {mode}")
+    workflow = StateGraph(AgentState)
+
+    # Define nodes. Each node has a sync body for app.stream and an async body for app.astream
+    workflow.add_node("profile_agent", RunnableLambda(profile_agent, afunc=aprofile_agent))
+    workflow.add_node("document_agent", RunnableLambda(document_agent, afunc=adocument_agent))
+    workflow.add_node("calculation_agent", calculation_agent)
+    workflow.add_node("transaction_agent", RunnableLambda(transaction_agent, afunc=atransaction_agent))
+
+    # Define edges
+    if mode == "parallel":
+        workflow.add_node("policy_prefetch", RunnableLambda(policy_prefetch_agent, afunc=apolicy_prefetch_agent))
+        workflow.add_node("search_agent", RunnableLambda(prefetched_search_agent, afunc=aprefetched_search_agent))
+        workflow.add_edge(START, "profile_agent")
+        workflow.add_edge(START, "policy_prefetch")
+        workflow.add_edge("profile_agent", "document_agent")
+        # Waits for both branches; after_document is applied inside the join
+        workflow.add_edge(["document_agent", "policy_prefetch"], "search_agent")
+    else:
+        workflow.add_node("search_agent", RunnableLambda(search_agent, afunc=asearch_agent))
+        workflow.set_entry_point("profile_agent")
+        workflow.add_edge("profile_agent", "document_agent")
+        workflow.add_conditional_edges(
+            "document_agent",
+            after_document,
+            {"search_agent": "search_agent", "calculation_agent": "calculation_agent"}
+        )
+    workflow.add_edge("search_agent", "calculation_agent")
+    workflow.add_edge("calculation_agent", "transaction_agent")
+    workflow.add_edge("transaction_agent", END)
+    return workflow
+
+
+@functools.lru_cache(maxsize=None)
+def get_app():
+    """Compiled graph, built on first use"""
+    return build_workflow().compile()
+
+
+def build_room_workflow() -> StateGraph:
+    """Read-only pipeline that stops at contribution_room: profile_agent -> calculation_agent.
+
+    calculation_agent takes the current limit from the policy snapshot or the annual limit table,
+    so a room check costs one profile lookup plus arithmetic (no LLM, search or transaction).
+    """
+    workflow = StateGraph(AgentState)
+    workflow.add_node("profile_agent", RunnableLambda(profile_agent, afunc=aprofile_agent))
+    workflow.add_node("calculation_agent", calculation_agent)
+    workflow.set_entry_point("profile_agent")
+    workflow.add_edge("profile_agent", "calculation_agent")
+    workflow.add_edge("calculation_agent", END)
+    return workflow
+
+
+@functools.lru_cache(maxsize=None)
+def get_room_app():
+    """Compiled room-only graph, built on first use"""
+    return build_room_workflow().compile()
+
+
+def build_projection_workflow() -> StateGraph:
+    """profile_agent -> calculation_agent -> projection_agent, for multi-year projections"""
+    workflow = StateGraph(AgentState)
+    workflow.add_node("profile_agent", RunnableLambda(profile_agent, afunc=aprofile_agent))
+    workflow.add_node("calculation_agent", calculation_agent)
+    workflow.add_node("projection_agent", projection_agent)
+    workflow.set_entry_point("profile_agent")
+    workflow.add_edge("profile_agent", "calculation_agent")
+    workflow.add_edge("calculation_agent", "projection_agent")
+    workflow.add_edge("projection_agent", END)
+    return workflow
+
+
+@functools.lru_cache(maxsize=None)
+def get_projection_app():
+    """Compiled projection graph, built on first use"""
+    return build_projection_workflow().compile()
+
+
+def build_schedule_workflow() -> StateGraph:
+    """profile_agent -> calculation_agent -> schedule_simulation_agent, for withdrawal planning"""
+    workflow = StateGraph(AgentState)
+    workflow.add_node("profile_agent", RunnableLambda(profile_agent, afunc=aprofile_agent))
+    workflow.add_node("calculation_agent", calculation_agent)
+    workflow.add_node("schedule_simulation_agent", schedule_simulation_agent)
+    workflow.set_entry_point("profile_agent")
+    workflow.add_edge("profile_agent", "calculation_agent")
+    workflow.add_edge("calculation_agent", "schedule_simulation_agent")
+    workflow.add_edge("schedule_simulation_agent", END)
+    return workflow
+
+
+@functools.lru_cache(maxsize=None)
+def get_schedule_app():
+    """Compiled schedule simulation graph, built on first use"""
+    return build_schedule_workflow().compile()
+
+
+def build_advice_workflow() -> StateGraph:
+    """profile_agent -> calculation_agent -> contribution_advisor_agent, for contribution suggestions"""
+    workflow = StateGraph(AgentState)
+    workflow.add_node("profile_agent", RunnableLambda(profile_agent, afunc=aprofile_agent))
+    workflow.add_node("calculation_agent", calculation_agent)
+    workflow.add_node("contribution_advisor_agent", contribution_advisor_agent)
+    workflow.set_entry_point("profile_agent")
+    workflow.add_edge("profile_agent", "calculation_agent")
+    workflow.add_edge("calculation_agent", "contribution_advisor_agent")
+    workflow.add_edge("contribution_advisor_agent", END)
+    return workflow
+
+
+@functools.lru_cache(maxsize=None)
+def get_advice_app():
+    """Compiled contribution advice graph, built on first use"""
+    return build_advice_workflow().compile()
+
+
+def render_graph(path: str = "tfsa_graph.png"):
+    """Render the workflow as a Mermaid PNG (only when explicitly requested)"""
+    png_graph = get_app().get_graph().draw_mermaid_png()
+    with open(path, "wb") as f:
+        f.write(png_graph)
+
+    print(f"Graph saved as '{path}' in {os.getcwd()}")
 
 
 # ======================
 # 5. Execution Function
 # ======================
-def run_tfsa_assistant(user_input: str, user_id: str = "user_123"):
-    """Run the agent workflow"""
-    state = {
+def _initial_state(user_input: str, user_id: str) -> AgentState:
+    return {
         "user_input": user_input,
         "user_id": user_id,
         "user_profile": None,
         "search_results": None,
         "contribution_room": None,
         "contribution_amount": None,
+        "pending_search": None,
+        "projection_request": None,
+        "projection": None,
+        "schedule_request": None,
+        "schedule_simulation": None,
+        "advice_request": None,
+        "contribution_plan": None,
         "messages": []
     }
 
+
+def _print_step(node: str, value: dict):
+    # Print node output
+    if 'messages' in value and value['messages']:
+        msg = value["messages"][-1]
+        print(f"🔹 [{node.upper()}]: {msg['content']}")
+
+
+def run_tfsa_assistant(user_input: str, user_id: str = "user_123"):
+    """Run the agent workflow"""
+    state = _initial_state(user_input, user_id)
+
     # Execute workflow
     print(f"\n🔹 USER QUERY: '{user_input}'")
     accumulated_state = state.copy()
-    for step in app.stream(state):
+    for step in get_app().stream(state):
         for node, value in step.items():
             # Update accumulated state with node value
             accumulated_state.update(value)
+            _print_step(node, value)
+
+    return accumulated_state
+
 
-            # Print node output
-            if 'messages' in value and value['messages']:
-                msg = value["messages"][-1]
-                print(f"🔹 [{node.upper()}]: {msg['content']}")
+async def arun_tfsa_assistant(user_input: str, user_id: str = "user_123"):
+    """Run the agent workflow on the event loop with async LLM, search and tool calls"""
+    state = _initial_state(user_input, user_id)
+
+    print(f"\n🔹 USER QUERY: '{user_input}'")
+    accumulated_state = state.copy()
+    async for step in get_app().astream(state):
+        for node, value in step.items():
+            accumulated_state.update(value)
+            _print_step(node, value)
 
     return accumulated_state
 
 
+def run_contribution_room(user_id: str = "user_123") -> AgentState:
+    """Final state of the read-only room pipeline (contribution_room and user_profile)"""
+    return get_room_app().invoke(_initial_state("What's my contribution room?", user_id))
+
+
+async def arun_contribution_room(user_id: str = "user_123") -> AgentState:
+    """Async variant of run_contribution_room"""
+    return await get_room_app().ainvoke(_initial_state("What's my contribution room?", user_id))
+
+
+def _projection_state(user_id: str, annual_contribution: float, years: int, expected_return: float,
+                      volatility: float, paths: Optional[int]) -> AgentState:
+    request = {"annual_contribution": annual_contribution, "years": years, "expected_return": expected_return,
+               "volatility": volatility}
+    if paths is not None:
+        request["paths"] = paths
+    return {**_initial_state(f"Project my TFSA over {years} years", user_id), "projection_request": request}
+
+
+def run_projection(user_id: str = "user_123", annual_contribution: float = 7000.0, years: int = 20,
+                   expected_return: float = 0.05, volatility: float = 0.10,
+                   paths: Optional[int] = None) -> AgentState:
+    """Final state of the projection pipeline (projection, contribution_room and user_profile).
+
+    paths defaults to TFSA_PROJECTION_PATHS.
+    """
+    return get_projection_app().invoke(
+        _projection_state(user_id, annual_contribution, years, expected_return, volatility, paths))
+
+
+async def arun_projection(user_id: str = "user_123", annual_contribution: float = 7000.0, years: int = 20,
+                          expected_return: float = 0.05, volatility: float = 0.10,
+                          paths: Optional[int] = None) -> AgentState:
+    """Async variant of run_projection"""
+    return await get_projection_app().ainvoke(
+        _projection_state(user_id, annual_contribution, years, expected_return, volatility, paths))
+
+
+def _schedule_state(user_id: str, schedules: list, months: int, detail: bool) -> AgentState:
+    return {**_initial_state(f"Simulate {len(schedules)} TFSA withdrawal schedule(s)", user_id),
+            "schedule_request": {"schedules": schedules, "months": months, "detail": detail}}
+
+
+def run_schedule_simulation(user_id: str = "user_123", schedules: Optional[list] = None, months: int = 24,
+                            detail: bool = False) -> AgentState:
+    """Final state of the schedule pipeline (schedule_simulation, contribution_room and user_profile)"""
+    return get_schedule_app().invoke(_schedule_state(user_id, schedules or [[]], months, detail))
+
+
+async def arun_schedule_simulation(user_id: str = "user_123", schedules: Optional[list] = None, months: int = 24,
+                                   detail: bool = False) -> AgentState:
+    """Async variant of run_schedule_simulation"""
+    return await get_schedule_app().ainvoke(_schedule_state(user_id, schedules or [[]], months, detail))
+
+
+def _advice_state(user_id: str, months: Optional[int], expected_return: Optional[float]) -> AgentState:
+    request = {"months": months, "expected_return": expected_return}
+    return {**_initial_state("How much should I contribute to my TFSA?", user_id),
+            "advice_request": {name: value for name, value in request.items() if value is not None}}
+
+
+def run_contribution_advice(user_id: str = "user_123", months: Optional[int] = None,
+                            expected_return: Optional[float] = None) -> AgentState:
+    """Final state of the advice pipeline (contribution_plan, contribution_room and user_profile).
+
+    months and expected_return default to TFSA_ADVISOR_MONTHS and TFSA_ADVISOR_EXPECTED_RETURN.
+    """
+    return get_advice_app().invoke(_advice_state(user_id, months, expected_return))
+
+
+async def arun_contribution_advice(user_id: str = "user_123", months: Optional[int] = None,
+                                   expected_return: Optional[float] = None) -> AgentState:
+    """Async variant of run_contribution_advice"""
+    return await get_advice_app().ainvoke(_advice_state(user_id, months, expected_return))
+
+
 # ======================
 # 6. Example Usage
 # ======================
 if __name__ == "__main__":
+    if "--render-graph" in sys.argv:
+        render_graph()
+
     print("===== TFSA CONTRIBUTION ASSISTANT =====")
 
     # First message: Initiate process
@@ -467,7 +1035,9 @@ if __name__ == "__main__":
 
     # Second message: Provide amount
     if state.get("contribution_room") is not None:
-        amount = input(f"\nHow much would you like to contribute? (Room: ${state['contribution_room']:.2f}): ")
+        suggested = (state.get("contribution_plan") or {}).get("suggested_amount", 0)
+        amount = input(f"\nHow much would you like to contribute? (Room: ${state['contribution_room']:.2f}, "
+                       f"suggested: ${suggested:.2f}): ")
         state = run_tfsa_assistant(f"Contribute ${amount}", "user_123")
 
         # Display final transaction result
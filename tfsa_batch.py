@@ -0,0 +1,93 @@
+import argparse
+import datetime
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+from tfsa_policy_snapshot import parse_limit, policy_snapshots
+from tfsa_room import ANNUAL_LIMITS, calculate_contribution_room_batch
+
+
+# ======================
+# 1. Data Access
+# ======================
+def retrieve_user_profiles_batch(user_ids: np.ndarray) -> Dict[str, np.ndarray]:
+    """Retrieves the room-related profile fields for many users as columns"""
+    # Mock implementation - replace with a columnar warehouse/DB export
+    n = len(user_ids)
+    return {
+        "age": np.full(n, 25, dtype=np.int64),
+        "first_tfsa_year": np.full(n, 2023, dtype=np.int64),
+        "past_contributions": np.full(n, 6500.0),
+        "withdrawals_last_year": np.full(n, 2000.0),
+        "current_year_contributions": np.full(n, 1500.0),
+    }
+
+
+def fetch_policy_snapshot() -> Dict:
+    """Policy inputs shared by every user in a batch run"""
+    current_year = datetime.datetime.now().year
+    snapshot = policy_snapshots.current(current_year)
+    return {
+        "current_year": current_year,
+        "current_limit": parse_limit(snapshot["policy_data"]["current_limit"]) if snapshot
+        else ANNUAL_LIMITS.limit(current_year),
+        "version": snapshot["version"] if snapshot else None,
+    }
+
+
+# ======================
+# 2. Batch Evaluation
+# ======================
+def compute_contribution_room_batch(user_ids: Iterable[str], chunk_size: int = 100_000,
+                                    policy: Optional[Dict] = None,
+                                    profile_loader: Callable[[np.ndarray], Dict[str, np.ndarray]]
+                                    = retrieve_user_profiles_batch) -> Iterator[Dict[str, np.ndarray]]:
+    """Computes TFSA contribution room for many users, yielding one result chunk at a time.
+
+    The policy snapshot is fetched once and shared by every chunk; each chunk is one columnar
+    profile load plus the vectorized calculation_agent formula.
+    """
+    policy = policy or fetch_policy_snapshot()
+    user_ids = np.asarray(user_ids)
+
+    for start in range(0, len(user_ids), chunk_size):
+        chunk_ids = user_ids[start:start + chunk_size]
+        profiles = profile_loader(chunk_ids)
+        yield {
+            "user_id": chunk_ids,
+            "contribution_room": calculate_contribution_room_batch(
+                profiles, policy["current_limit"], policy["current_year"]),
+        }
+
+
+# ======================
+# 3. Benchmark
+# ======================
+def synthetic_profiles(user_ids: np.ndarray) -> Dict[str, np.ndarray]:
+    """Randomized but plausible profiles for benchmarking"""
+    rng = np.random.default_rng(len(user_ids))
+    n = len(user_ids)
+    return {
+        "age": rng.integers(18, 90, n),
+        "first_tfsa_year": rng.integers(2009, datetime.datetime.now().year + 1, n),
+        "past_contributions": rng.uniform(0, 60000, n).round(2),
+        "withdrawals_last_year": rng.uniform(0, 5000, n).round(2),
+        "current_year_contributions": rng.uniform(0, 7000, n).round(2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch contribution room evaluation")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    user_ids = np.array([f"user_{i}" for i in range(args.users)])
+    start = time.perf_counter()
+    evaluated = 0
+    for chunk in compute_contribution_room_batch(user_ids, args.chunk_size, profile_loader=synthetic_profiles):
+        evaluated += len(chunk["user_id"])
+    elapsed = time.perf_counter() - start
+    print(f"Evaluated {evaluated:,} users in {elapsed:.2f}s ({evaluated / elapsed:,.0f} users/second)")
@@ -0,0 +1,484 @@
+import argparse
+import contextlib
+import datetime
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from tfsa_room import ANNUAL_LIMITS, calculate_contribution_room, room_start_year
+
+load_dotenv('.env')
+
+TFSA_LEDGER_DIR = os.getenv("TFSA_LEDGER_DIR", ".cache/tfsa_ledger")
+
+CONTRIBUTION = 1
+WITHDRAWAL = 2
+
+# One memory-mapped file per column; row i of every column is one transaction
+COLUMNS = {
+    "user": np.int32,
+    "year": np.int16,
+    "kind": np.int8,
+    "amount": np.float64,
+    "timestamp": np.int64,  # epoch milliseconds
+}
+
+# Appended rows are scanned linearly until there are this many, then the per-user index is rebuilt
+INDEX_TAIL_ROWS = 1 << 18
+
+
+class TransactionLedger:
+    """Append-only TFSA contributions and withdrawals, stored column-wise in memory-mapped files.
+
+    Per-user reads go through a user-sorted row index (rebuilt lazily) plus a scan of rows appended
+    since; whole-ledger aggregations are single vectorized passes. Several processes can share a
+    directory: writers append under an exclusive lock on ledger.lock after catching up on rows
+    and users the others appended, and every read catches up the same way first. users.txt is
+    appended before meta.json (the committed row count) is replaced, so a reader never sees a row
+    whose user it cannot resolve.
+
+    The transaction journal is the system of record: apply_journal() appends the contributions
+    committed there after the ledger's journal cursor, which meta.json stores with the row count,
+    so a crash between the journal and the ledger is repaired by the next apply.
+    """
+
+    def __init__(self, directory: str = TFSA_LEDGER_DIR):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._columns: Optional[Dict[str, np.memmap]] = None
+        self._lock_file = None
+        self._lock_depth = 0
+        self._frozen = 0
+        self._users: List[str] = []
+        self._user_index: Dict[str, int] = {}
+        self._users_offset = 0
+        self._meta_stamp = None
+        self.count = 0
+        self.capacity = 0
+        # Last journal record applied and the byte offset just past it (None: ledger predates the cursor)
+        self.journal_seq = 0
+        self.journal_offset: Optional[int] = 0
+        self._order = None
+        self._offsets = None
+        self._indexed = 0
+
+    # ----- storage -----
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open(self):
+        # Mapped on first use so importing this module does no I/O
+        if self._columns is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._lock_file = open(self._path("ledger.lock"), "a")
+            self._catch_up()
+            self._map(max(self.count, 1 << 16))
+        elif not self._frozen:
+            self._catch_up()
+
+    def _catch_up(self):
+        """Pick up users and rows other processes appended since we last looked"""
+        try:
+            if os.path.getsize(self._path("users.txt")) > self._users_offset:
+                with open(self._path("users.txt"), "rb") as f:
+                    f.seek(self._users_offset)
+                    data = f.read()
+                # Only whole lines; a writer may be mid-append
+                data = data[:data.rfind(b"\n") + 1]
+                for user_id in data.decode().splitlines():
+                    self._user_index[user_id] = len(self._users)
+                    self._users.append(user_id)
+                self._users_offset += len(data)
+            stat = os.stat(self._path("meta.json"))
+        except FileNotFoundError:
+            return
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._meta_stamp:
+            return
+        with open(self._path("meta.json")) as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.journal_seq = meta.get("journal_seq", 0)
+        self.journal_offset = meta.get("journal_offset")
+        self._meta_stamp = stamp
+        if self._columns is not None and self.count > self.capacity:
+            self._map(max(self.capacity * 2, self.count))
+
+    @contextlib.contextmanager
+    def _exclusive(self):
+        """Thread lock plus the cross-process ledger.lock, re-entrant within this process"""
+        with self._lock:
+            self._open()
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                self._catch_up()
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _map(self, capacity: int):
+        if self._columns is not None:
+            self.flush()
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            path = self._path(f"{name}.bin")
+            size = capacity * np.dtype(dtype).itemsize
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            columns[name] = np.memmap(path, dtype=dtype, mode="r+", shape=(capacity,))
+        self._columns = columns
+        self.capacity = capacity
+
+    def _reserve(self, rows: int):
+        if self.count + rows > self.capacity:
+            self._map(max(self.capacity * 2, self.count + rows))
+
+    def _user_indices(self, user_ids: np.ndarray) -> np.ndarray:
+        unique, inverse = np.unique(user_ids, return_inverse=True)
+        new_users = [user_id for user_id in unique.tolist() if user_id not in self._user_index]
+        if new_users:
+            for user_id in new_users:
+                self._user_index[user_id] = len(self._users)
+                self._users.append(user_id)
+            data = "".join(f"{user_id}\n" for user_id in new_users).encode()
+            with open(self._path("users.txt"), "ab") as f:
+                f.write(data)
+            self._users_offset += len(data)
+        return np.array([self._user_index[user_id] for user_id in unique.tolist()], dtype=np.int32)[inverse]
+
+    def flush(self):
+        """Write mapped column pages back to their files"""
+        with self._lock:
+            if self._columns is None:
+                return
+            for column in self._columns.values():
+                column.flush()
+
+    def _commit_count(self):
+        # Called holding ledger.lock; replacing meta.json publishes the new rows to other processes
+        tmp_path = self._path("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"count": self.count, "journal_seq": self.journal_seq,
+                       "journal_offset": self.journal_offset}, f)
+        os.replace(tmp_path, self._path("meta.json"))
+        stat = os.stat(self._path("meta.json"))
+        self._meta_stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    # ----- appends -----
+    def extend(self, user_ids: Iterable[str], kinds, amounts, timestamps=None, flush: bool = True,
+               journal_position: Optional[Tuple[int, int]] = None) -> int:
+        """Append many transactions at once; timestamps are datetimes or epoch milliseconds.
+
+        journal_position (seq, offset) advances the journal cursor in the same meta.json commit.
+        """
+        user_ids = np.asarray(user_ids, dtype=str)
+        rows = len(user_ids)
+        if timestamps is None:
+            timestamps = np.full(rows, int(time.time() * 1000), dtype=np.int64)
+        elif len(timestamps) and isinstance(timestamps[0], datetime.datetime):
+            timestamps = np.array([int(ts.timestamp() * 1000) for ts in timestamps], dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        years = (timestamps.astype("datetime64[ms]").astype("datetime64[Y]").astype(np.int64) + 1970)
+
+        with self._exclusive():
+            self._reserve(rows)
+            start, end = self.count, self.count + rows
+            self._columns["user"][start:end] = self._user_indices(user_ids)
+            self._columns["year"][start:end] = years
+            self._columns["kind"][start:end] = kinds
+            self._columns["amount"][start:end] = amounts
+            self._columns["timestamp"][start:end] = timestamps
+            self.count = end
+            if journal_position is not None:
+                self.journal_seq, self.journal_offset = journal_position
+            if flush:
+                self.flush()
+            self._commit_count()
+        return rows
+
+    def append(self, user_id: str, kind: int, amount: float, when: Optional[datetime.datetime] = None,
+               journal_position: Optional[Tuple[int, int]] = None) -> int:
+        """Append one transaction; returns its row number"""
+        when = when or datetime.datetime.now()
+        with self._exclusive():
+            self.extend([user_id], [kind], [amount], [when], journal_position=journal_position)
+            return self.count - 1
+
+    def apply_journal(self, journal, before_apply: Optional[Callable[[Dict], None]] = None,
+                      after_apply: Optional[Callable[[Dict, Tuple[int, int], Tuple[int, int]], None]] = None) -> int:
+        """Append the TFSA contributions committed to the journal after the cursor, in journal order.
+
+        Runs under the exclusive ledger lock, and each row is committed together with its cursor
+        position, so every contribution is applied exactly once whichever thread or process gets
+        here first. before_apply(record) runs just before a record's row is appended and
+        after_apply(record, since, position) just after it is committed, with the journal positions
+        readers saw before and see after it. Returns the number of contributions applied.
+        """
+        applied = 0
+        with self._exclusive():
+            if self.journal_offset is None:
+                # Written before the ledger tracked the journal: it already holds everything journaled
+                for record, offset in journal.read_from(0):
+                    self.journal_seq, self.journal_offset = record["seq"], offset
+                self.journal_offset = self.journal_offset or 0
+                self._commit_count()
+            committed = (self.journal_seq, self.journal_offset)
+            for record, offset in journal.read_from(self.journal_offset, self.journal_seq):
+                if record["kind"] != "tfsa_contribution":
+                    # Other writers share the journal; the cursor still moves past their records
+                    self.journal_seq, self.journal_offset = record["seq"], offset
+                    continue
+                if before_apply is not None:
+                    before_apply(record)
+                position = (record["seq"], offset)
+                self.append(record["user_id"], CONTRIBUTION, record["amount"],
+                            datetime.datetime.fromisoformat(record["committed_at"]), journal_position=position)
+                if after_apply is not None:
+                    after_apply(record, committed, position)
+                committed = position
+                applied += 1
+            if (self.journal_seq, self.journal_offset) != committed:
+                self._commit_count()
+        return applied
+
+    @contextlib.contextmanager
+    def snapshot(self):
+        """Holds this process's view of the ledger still and yields its journal position (seq, offset).
+
+        Reads inside the block neither catch up on other processes nor race this process's
+        appends, so a room computed there is exactly the room at that position, which is what
+        materialized rooms are tagged with.
+        """
+        with self._lock:
+            self._open()
+            self._frozen += 1
+            try:
+                yield self.journal_seq, self.journal_offset
+            finally:
+                self._frozen -= 1
+
+    def contributed_since(self, journal, user_id: str, since: Tuple[int, int], until_seq: int) -> bool:
+        """Whether a contribution by user_id was journaled after position since, up to record until_seq"""
+        for record, _ in journal.read_from(since[1], since[0]):
+            if record["seq"] > until_seq:
+                break
+            if record["kind"] == "tfsa_contribution" and record["user_id"] == user_id:
+                return True
+        return False
+
+    def seed_from_profile(self, user_id: str, profile: dict, current_year: int):
+        """Open a user's history from the profile's pre-aggregated fields.
+
+        Past contributions and last year's withdrawals land in the previous year and this year's
+        contributions in the current one, which reproduces calculate_contribution_room exactly.
+        """
+        events = [(profile["past_contributions"], CONTRIBUTION, current_year - 1),
+                  (profile["withdrawals_last_year"], WITHDRAWAL, current_year - 1),
+                  (profile["current_year_contributions"], CONTRIBUTION, current_year)]
+        events = [(amount, kind, year) for amount, kind, year in events if amount]
+        if events:
+            self.extend([user_id] * len(events), [kind for _, kind, _ in events],
+                        [amount for amount, _, _ in events],
+                        [datetime.datetime(year, 1, 1) for _, _, year in events])
+
+    def seed_if_empty(self, user_id: str, profile: dict, current_year: int) -> bool:
+        """seed_from_profile unless the user already has history, as one step across threads and
+        processes, so concurrent first writes never seed the aggregates twice"""
+        with self._exclusive():
+            if len(self._rows(user_id)):
+                return False
+            self.seed_from_profile(user_id, profile, current_year)
+            return True
+
+    # ----- per-user reads -----
+    def _ensure_index(self):
+        if self.count - self._indexed > INDEX_TAIL_ROWS:
+            users = np.asarray(self._columns["user"][:self.count])
+            self._order = np.argsort(users, kind="stable")
+            # Rows of user u are _order[_offsets[u]:_offsets[u + 1]]
+            self._offsets = np.searchsorted(users[self._order], np.arange(len(self._users) + 1, dtype=np.int32))
+            self._indexed = self.count
+
+    def _rows(self, user_id: str) -> np.ndarray:
+        self._open()
+        user = self._user_index.get(user_id)
+        if user is None:
+            return np.empty(0, dtype=np.int64)
+        self._ensure_index()
+        indexed = np.empty(0, dtype=np.int64)
+        if self._order is not None and user + 1 < len(self._offsets):
+            indexed = self._order[self._offsets[user]:self._offsets[user + 1]]
+        tail = np.flatnonzero(self._columns["user"][self._indexed:self.count] == user) + self._indexed
+        return np.concatenate((indexed, tail))
+
+    def has_history(self, user_id: str) -> bool:
+        # Rows, not just a users.txt entry: a writer can die between the two
+        with self._lock:
+            return len(self._rows(user_id)) > 0
+
+    def yearly_totals(self, user_id: str) -> Dict[int, Dict[str, float]]:
+        """{year: {"contributions": ..., "withdrawals": ...}} for one user"""
+        with self._lock:
+            rows = self._rows(user_id)
+            years = self._columns["year"][rows]
+            kinds = self._columns["kind"][rows]
+            amounts = self._columns["amount"][rows]
+        totals = {}
+        for year in np.unique(years).tolist():
+            in_year = years == year
+            totals[year] = {
+                "contributions": float(amounts[in_year & (kinds == CONTRIBUTION)].sum()),
+                "withdrawals": float(amounts[in_year & (kinds == WITHDRAWAL)].sum()),
+            }
+        return totals
+
+    def room_history(self, user_id: str, first_year: int, through_year: Optional[int] = None,
+                     current_limit: Optional[float] = None) -> List[Dict[str, float]]:
+        """Per-year room: opening room, the year's contributions/withdrawals and room carried forward.
+
+        A year's opening room is last year's unused room plus this year's limit plus last year's
+        withdrawals; current_limit overrides the table for through_year.
+        """
+        through_year = through_year or datetime.datetime.now().year
+        totals = self.yearly_totals(user_id)
+        history = []
+        carried, withdrawn = 0.0, 0.0
+        for year in range(min([first_year, *totals]), through_year + 1):
+            limit = ANNUAL_LIMITS.limit(year) if year >= first_year else 0.0
+            if year == through_year and current_limit is not None:
+                limit = current_limit
+            year_totals = totals.get(year, {"contributions": 0.0, "withdrawals": 0.0})
+            opening = carried + limit + withdrawn
+            carried = opening - year_totals["contributions"]
+            withdrawn = year_totals["withdrawals"]
+            history.append({"year": year, "limit": limit, "opening_room": opening,
+                            "contributions": year_totals["contributions"],
+                            "withdrawals": year_totals["withdrawals"], "carried_forward": carried})
+        return history
+
+    def room_from_history(self, user_id: str, profile: dict, current_limit: float, current_year: int) -> float:
+        """Available room from the ledger when the user has history, otherwise from the profile aggregates"""
+        if not self.has_history(user_id):
+            return calculate_contribution_room(profile, current_limit, current_year)
+        first_year = room_start_year(profile, current_year)
+        return self.available_room(user_id, first_year, current_year, current_limit)
+
+    def available_room(self, user_id: str, first_year: int, current_year: int,
+                       current_limit: Optional[float] = None) -> float:
+        """Room left this year: accumulated limits - contributions so far + withdrawals before this year"""
+        if current_limit is None:
+            current_limit = ANNUAL_LIMITS.limit(current_year)
+        with self._lock:
+            rows = self._rows(user_id)
+            years = self._columns["year"][rows]
+            kinds = self._columns["kind"][rows]
+            amounts = self._columns["amount"][rows]
+        contributed = amounts[(kinds == CONTRIBUTION) & (years <= current_year)].sum()
+        withdrawn = amounts[(kinds == WITHDRAWAL) & (years < current_year)].sum()
+        total_room = ANNUAL_LIMITS.accumulated_room(first_year, current_year) + current_limit
+        return float(total_room - contributed + withdrawn)
+
+    # ----- whole-ledger aggregation -----
+    def totals_by_year(self) -> Dict[int, Dict[str, float]]:
+        """Contributions and withdrawals per year across every user, in one vectorized pass"""
+        with self._lock:
+            self._open()
+            years = self._columns["year"][:self.count].astype(np.int64)
+            kinds = self._columns["kind"][:self.count]
+            amounts = self._columns["amount"][:self.count]
+        if not len(years):
+            return {}
+        base = years.min()
+        offsets = years - base
+        contributions = np.bincount(offsets, weights=np.where(kinds == CONTRIBUTION, amounts, 0.0))
+        withdrawals = np.bincount(offsets, weights=np.where(kinds == WITHDRAWAL, amounts, 0.0))
+        return {int(base + i): {"contributions": float(contributions[i]), "withdrawals": float(withdrawals[i])}
+                for i in range(len(contributions)) if contributions[i] or withdrawals[i]}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._open()
+            return {"rows": self.count, "users": len(self._users), "capacity": self.capacity,
+                    "indexed_rows": self._indexed, "journal_seq": self.journal_seq, "directory": self.directory}
+
+
+ledger = TransactionLedger()
+
+
+def room_from_history(user_id: str, profile: dict, current_limit: float, current_year: int) -> float:
+    """ledger.room_from_history for the shared ledger"""
+    return ledger.room_from_history(user_id, profile, current_limit, current_year)
+
+
+# ======================
+# Benchmark
+# ======================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the columnar TFSA transaction ledger")
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="tfsa_ledger_")
+    try:
+        rng = np.random.default_rng(42)
+        user_ids = np.array([f"user_{i}" for i in range(args.users)])
+        bench = TransactionLedger(directory)
+
+        start = time.perf_counter()
+        first_ms = int(datetime.datetime(2009, 1, 1).timestamp() * 1000)
+        last_ms = int(datetime.datetime.now().timestamp() * 1000)
+        for offset in range(0, args.rows, args.chunk_size):
+            rows = min(args.chunk_size, args.rows - offset)
+            bench.extend(user_ids[rng.integers(0, args.users, rows)],
+                         np.where(rng.random(rows) < 0.8, CONTRIBUTION, WITHDRAWAL).astype(np.int8),
+                         rng.uniform(10, 7000, rows).round(2), rng.integers(first_ms, last_ms, rows))
+        elapsed = time.perf_counter() - start
+        print(f"Appended {args.rows:,} rows in {elapsed:.2f}s ({args.rows / elapsed:,.0f} rows/second)")
+
+        reopened = TransactionLedger(directory)
+        start = time.perf_counter()
+        reopened.has_history("user_0")
+        print(f"Reopened {reopened.count:,} rows / {len(reopened._users):,} users in "
+              f"{time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        totals = reopened.totals_by_year()
+        print(f"totals_by_year over {reopened.count:,} rows: {(time.perf_counter() - start) * 1000:.0f} ms "
+              f"({len(totals)} years)")
+
+        start = time.perf_counter()
+        reopened.yearly_totals("user_0")
+        print(f"First per-user query (builds the index): {time.perf_counter() - start:.2f}s")
+
+        current_year = datetime.datetime.now().year
+        latencies = []
+        for user in rng.integers(0, args.users, args.queries):
+            start = time.perf_counter()
+            reopened.available_room(f"user_{user}", 2009, current_year)
+            latencies.append(time.perf_counter() - start)
+        latencies = np.array(latencies) * 1e6
+        print(f"available_room over {args.queries:,} random users: p50 {np.percentile(latencies, 50):.0f} us, "
+              f"p99 {np.percentile(latencies, 99):.0f} us")
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            reopened.append("user_0", CONTRIBUTION, 100.0)
+        print(f"Single appends (flushed each): {1000 / (time.perf_counter() - start):,.0f}/second")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
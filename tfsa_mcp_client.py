@@ -3,6 +3,7 @@ import argparse
 import asyncio
 import os
 import shlex
+from contextlib import asynccontextmanager
 from typing import Annotated, List
 
 from dotenv import load_dotenv
@@ -16,6 +17,7 @@ from langgraph.graph.message import AnyMessage, add_messages
 from langgraph.prebuilt import tools_condition, ToolNode
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 from typing_extensions import TypedDict
 
 load_dotenv('.env')
@@ -26,6 +28,20 @@ server_params = StdioServerParameters(
     args=["tfsa_mcp_server.py"],
     env=dict(os.environ))
 
+# Shared streamable HTTP server (e.g. http://localhost:8001/mcp); stdio subprocess when unset
+server_url = os.getenv("TFSA_MCP_SERVER_URL")
+
+
+@asynccontextmanager
+async def connect():
+    """Open the MCP transport streams to the configured server"""
+    if server_url:
+        async with streamablehttp_client(server_url) as (read, write, _get_session_id):
+            yield read, write
+    else:
+        async with stdio_client(server_params) as (read, write):
+            yield read, write
+
 
 # LangGraph state definition
 class State(TypedDict):
@@ -193,7 +209,7 @@ async def handle_prompt(session, _tools, command, agent):
 
 # Entry point
 async def main():
-    async with stdio_client(server_params) as (read, write):
+    async with connect() as (read, write):
         async with ClientSession(read, write) as session:
             await session.initialize()
             tools = await load_mcp_tools(session)
@@ -238,7 +254,7 @@ async def main():
 
 
 async def main_async(user_input: str):
-    async with stdio_client(server_params) as (read, write):
+    async with connect() as (read, write):
         async with ClientSession(read, write) as session:
             await session.initialize()
             _tools = await load_mcp_tools(session)
@@ -255,7 +271,10 @@ async def main_async(user_input: str):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--message", type=str, help="Direct message to process")
+    parser.add_argument("--url", type=str, help="Streamable HTTP server URL (defaults to a stdio subprocess)")
     args = parser.parse_args()
+    if args.url:
+        server_url = args.url
 
     if args.message:
         asyncio.run(main_async(args.message))
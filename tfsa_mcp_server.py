@@ -1,11 +1,19 @@
 import re
+import sys
 from datetime import datetime
-from typing import Dict, Annotated
+from typing import Dict, Annotated, List, Optional
 
 # Initialize FastMCP with API metadata
 from mcp.server.fastmcp import FastMCP
 
-from tfsa_assistant import run_tfsa_assistant
+from idempotency import IdempotencyStore
+from llm_cache import llm_response_cache
+from mcp_server_runtime import BoundedExecutor, create_http_app as create_mcp_http_app, parse_server_args, run_server
+from single_flight import SingleFlight
+from tfsa_assistant import (apply_journaled_contributions, arun_contribution_advice, arun_contribution_room, arun_projection,
+                            arun_schedule_simulation, arun_tfsa_assistant, document_agent_stats, policy_refresher,
+                            policy_search_cache, profile_reads, run_contribution_advice, run_contribution_room,
+                            run_projection, run_schedule_simulation, run_tfsa_assistant, start_policy_refresher)
 
 # Initialize FastMCP with API metadata
 mcp = FastMCP(
@@ -14,6 +22,23 @@ mcp = FastMCP(
     version="1.2.0"
 )
 
+# Workflow runs use the async graph on the event loop, or the sync graph on a thread/process pool
+workflow_executor = BoundedExecutor()
+tfsa_workflow = workflow_executor.select(run_tfsa_assistant, arun_tfsa_assistant)
+# Room checks only need profile_agent -> calculation_agent
+room_workflow = workflow_executor.select(run_contribution_room, arun_contribution_room)
+# Projections run profile_agent -> calculation_agent -> projection_agent
+projection_workflow = workflow_executor.select(run_projection, arun_projection)
+# Schedule comparisons run profile_agent -> calculation_agent -> schedule_simulation_agent
+schedule_workflow = workflow_executor.select(run_schedule_simulation, arun_schedule_simulation)
+# Contribution suggestions run profile_agent -> calculation_agent -> contribution_advisor_agent
+advice_workflow = workflow_executor.select(run_contribution_advice, arun_contribution_advice)
+
+# Bursts of identical room checks for a user share one workflow run. Writes are never coalesced
+room_reads = SingleFlight("contribution_room")
+# Contributions sent with an idempotency key run once per key; retries replay the stored result
+contribution_writes = IdempotencyStore("contribution")
+
 
 # ==============================================
 # resources, tools, and prompts to be added here
@@ -26,11 +51,11 @@ mcp = FastMCP(
 # Tools
 # ======
 @mcp.tool()
-def check_contribution_room(user_id: Annotated[str, "bank user ID"]) -> Dict:
+async def check_contribution_room(user_id: Annotated[str, "bank user ID"]) -> Dict:
     """Check user's available TFSA contribution room"""
     print(f"[{datetime.now().isoformat()}] Tool called: check_contribution_room with parameters: user_id='{user_id}'")
     try:
-        result = run_tfsa_assistant("What's my contribution room?", user_id)
+        result = await room_reads.ado(user_id, workflow_executor.run, room_workflow, user_id)
         return {
             "contribution_room": result.get("contribution_room"),
             "user_id": user_id,
@@ -44,38 +69,122 @@ def check_contribution_room(user_id: Annotated[str, "bank user ID"]) -> Dict:
         }
 
 
+async def _execute_contribution(user_input: str, user_id: str) -> Dict:
+    result = await workflow_executor.run(tfsa_workflow, user_input, user_id)
+
+    # Extract transaction ID from response
+    transaction_id = None
+    response = next(
+        (msg['content'] for msg in reversed(result['messages'])
+         if msg.get('role') == 'assistant'),
+        ""
+    )
+    if match := re.search(r"Transaction ID: (\S+)", response):
+        transaction_id = match.group(1)
+
+    success = "✅" in response
+
+    return {
+        "success": success,
+        "transaction_id": transaction_id,
+        "new_contribution_room": result.get("contribution_room"),
+        "user_id": user_id,
+        "response": response,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 @mcp.tool()
-def execute_contribution(user_input: Annotated[str, "User input contains a contribution transaction amount"],
-                         user_id: Annotated[str, "bank user ID"]) -> Dict:
+async def execute_contribution(user_input: Annotated[str, "User input contains a contribution transaction amount"],
+                         user_id: Annotated[str, "bank user ID"],
+                         idempotency_key: Annotated[Optional[str], "Optional unique key for this contribution; "
+                                                    "send the same key when retrying"] = None) -> Dict:
     """Execute TFSA contribution transaction with an amount"""
     print(
-        f"[{datetime.now().isoformat()}] Tool called: execute_contribution with parameters: user_input='{user_input}', user_id='{user_id}'")
+        f"[{datetime.now().isoformat()}] Tool called: execute_contribution with parameters: user_input='{user_input}', user_id='{user_id}', idempotency_key='{idempotency_key}'")
     try:
-        result = run_tfsa_assistant(user_input, user_id)
+        if not idempotency_key:
+            return await _execute_contribution(user_input, user_id)
+        # A retry with the same key gets the original result back without re-running the workflow
+        outcome = await contribution_writes.arun(f"{user_id}:{idempotency_key}",
+                                                 {"user_input": user_input, "user_id": user_id},
+                                                 _execute_contribution, user_input, user_id)
+        return {**outcome["result"], "idempotency_key": idempotency_key, "idempotent_replay": outcome["replayed"]}
+    except Exception as e:
+        return {
+            "error": f"Contribution failed: {str(e)}",
+            "user_id": user_id,
+            "timestamp": datetime.now().isoformat()
+        }
 
-        # Extract transaction ID from response
-        transaction_id = None
-        response = next(
-            (msg['content'] for msg in reversed(result['messages'])
-             if msg.get('role') == 'assistant'),
-            ""
-        )
-        if match := re.search(r"Transaction ID: (\S+)", response):
-            transaction_id = match.group(1)
 
-        success = "✅" in response
+@mcp.tool()
+async def project_tfsa_growth(user_id: Annotated[str, "bank user ID"],
+                              annual_contribution: Annotated[float, "Planned contribution per year"],
+                              years: Annotated[int, "Projection horizon in years (1-40)"] = 20,
+                              expected_return: Annotated[float, "Expected annual return, e.g. 0.05"] = 0.05,
+                              volatility: Annotated[float, "Annual return volatility, e.g. 0.10"] = 0.10) -> Dict:
+    """Project TFSA balance and contribution room over the coming years with Monte Carlo simulation"""
+    print(
+        f"[{datetime.now().isoformat()}] Tool called: project_tfsa_growth with parameters: user_id='{user_id}', annual_contribution={annual_contribution}, years={years}, expected_return={expected_return}, volatility={volatility}")
+    try:
+        result = await workflow_executor.run(projection_workflow, user_id, annual_contribution, years,
+                                             expected_return, volatility)
+        return {
+            **result["projection"],
+            "user_id": user_id,
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        return {
+            "error": f"Projection failed: {str(e)}",
+            "user_id": user_id,
+            "timestamp": datetime.now().isoformat()
+        }
+
 
+@mcp.tool()
+async def simulate_tfsa_schedules(user_id: Annotated[str, "bank user ID"],
+                                  schedules: Annotated[List[List[Dict]], "Candidate schedules to compare. Each is a list of events like {'month': 'YYYY-MM', 'contribution': 500} or {'month': 'YYYY-MM', 'withdrawal': 2000}"],
+                                  months: Annotated[int, "Months to simulate from the current month (extended to cover every event, max 120)"] = 24,
+                                  detail: Annotated[bool, "Include month-by-month room, excess and penalty for each schedule"] = False) -> Dict:
+    """Simulate planned TFSA withdrawals and contributions month by month and compare over-contribution penalties"""
+    print(
+        f"[{datetime.now().isoformat()}] Tool called: simulate_tfsa_schedules with parameters: user_id='{user_id}', schedules={len(schedules)}, months={months}, detail={detail}")
+    try:
+        result = await workflow_executor.run(schedule_workflow, user_id, schedules, months, detail)
         return {
-            "success": success,
-            "transaction_id": transaction_id,
-            "new_contribution_room": result.get("contribution_room"),
+            **result["schedule_simulation"],
             "user_id": user_id,
-            "response": response,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         return {
-            "error": f"Contribution failed: {str(e)}",
+            "error": f"Schedule simulation failed: {str(e)}",
+            "user_id": user_id,
+            "timestamp": datetime.now().isoformat()
+        }
+
+
+@mcp.tool()
+async def suggest_tfsa_contribution(user_id: Annotated[str, "bank user ID"],
+                                    months: Annotated[Optional[int], "Planning horizon in months (1-120); "
+                                                      "defaults to TFSA_ADVISOR_MONTHS"] = None,
+                                    expected_return: Annotated[Optional[float], "Expected annual return, e.g. 0.05; "
+                                                               "defaults to TFSA_ADVISOR_EXPECTED_RETURN"] = None) -> Dict:
+    """Suggest how much to contribute now, with the monthly schedule that maximizes tax-free growth without over-contributing"""
+    print(
+        f"[{datetime.now().isoformat()}] Tool called: suggest_tfsa_contribution with parameters: user_id='{user_id}', months={months}, expected_return={expected_return}")
+    try:
+        result = await workflow_executor.run(advice_workflow, user_id, months, expected_return)
+        return {
+            **result["contribution_plan"],
+            "user_id": user_id,
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        return {
+            "error": f"Contribution advice failed: {str(e)}",
             "user_id": user_id,
             "timestamp": datetime.now().isoformat()
         }
@@ -109,7 +218,7 @@ def explain_tfsa_rules(query: str) -> str:
 # Resources
 # ==========
 @mcp.resource("tfsa-advice://{user_input}/{user_id}")
-def get_tfsa_advice(user_input: str, user_id: str = "user_123") -> Dict:
+async def get_tfsa_advice(user_input: str, user_id: str = "user_123") -> Dict:
     """
     As a certified TFSA specialist, respond to user queries using these guidelines:
     1. Verify contribution room before suggesting amounts
@@ -126,7 +235,7 @@ def get_tfsa_advice(user_input: str, user_id: str = "user_123") -> Dict:
         f"[{datetime.now().isoformat()}] Resource called: get_tfsa_advice with parameters: user_input='{user_input}', user_id='{user_id}'")
     try:
         # Execute workflow
-        result = run_tfsa_assistant(user_input, user_id)
+        result = await workflow_executor.run(tfsa_workflow, user_input, user_id)
 
         # Extract final assistant response
         response = next(
@@ -163,20 +272,104 @@ def get_tfsa_advice(user_input: str, user_id: str = "user_123") -> Dict:
 
 @mcp.resource("tfsa-annual://limit")
 def get_tfsa_annual_dollar_limit() -> str:
-    """The annual Tax-Free Savings Account (TFSA) dollar limit for each of the years from 2009 to 2025"""
+    """The annual Tax-Free Savings Account (TFSA) dollar limit for each year since 2009"""
+    from tfsa_room import ANNUAL_LIMITS
+
     print(f"[{datetime.now().isoformat()}] Resource called: get_tfsa_annual_dollar_limit with parameters: (none)")
-    return """
-        Annual limit for 2009-2012: $5000
-        Annual limit for 2013-2014: $5500
-        Annual limit for 2015: $10000
-        Annual limit for 2016-2018: $5500
-        Annual limit for 2019-2022: $6000
-        Annual limit for 2023: $6500
-        Annual limit for 2024 and 2025: $7000
-    """
+    return ANNUAL_LIMITS.describe()
+
+
+@mcp.resource("tfsa-metrics://executor")
+def get_executor_metrics() -> Dict:
+    """Concurrency limit, in-flight runs and queue depth of the workflow executor"""
+    return {**workflow_executor.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("tfsa-metrics://policy-search-cache")
+def get_policy_search_cache_metrics() -> Dict:
+    """Hit/miss counters of the CRA policy search cache"""
+    return {**policy_search_cache.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("tfsa-metrics://policy-snapshot")
+def get_policy_snapshot_metrics() -> Dict:
+    """Current policy snapshot version and background refresh counters"""
+    return {**policy_refresher.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("tfsa-metrics://document-agent")
+def get_document_agent_metrics() -> Dict:
+    """How often document_agent answered from the rules table versus the LLM"""
+    return {**document_agent_stats, "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("tfsa-metrics://llm-cache")
+def get_llm_cache_metrics() -> Dict:
+    """Hit rate of the shared LLM response cache"""
+    return {**llm_response_cache.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("tfsa-metrics://room-store")
+def get_room_store_metrics() -> Dict:
+    """Hit/miss/staleness of the materialized contribution room store"""
+    from tfsa_room_store import room_store
+
+    return {**room_store.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("tfsa-metrics://journal")
+def get_journal_metrics() -> Dict:
+    """Group commit statistics of the durable transaction journal"""
+    from transaction_journal import journal
+
+    return {**journal.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("tfsa-metrics://idempotency")
+def get_idempotency_metrics() -> Dict:
+    """How many keyed contribution retries were replayed instead of re-executed"""
+    return {**contribution_writes.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("tfsa-metrics://fraud")
+def get_fraud_metrics() -> Dict:
+    """Transactions scored and flagged by the streaming fraud scorer"""
+    from fraud_scoring import fraud_scorer
+
+    return {**fraud_scorer.stats(), "timestamp": datetime.now().isoformat()}
+
+
+@mcp.resource("tfsa-metrics://single-flight")
+def get_single_flight_metrics() -> Dict:
+    """How many identical read calls were coalesced or served from the short result cache"""
+    return {
+        "contribution_room": room_reads.stats(),
+        "user_profile": profile_reads.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def recover_journal():
+    """Apply contributions journaled before a crash that never reached the ledger"""
+    applied = apply_journaled_contributions()
+    if applied:
+        print(f"[{datetime.now().isoformat()}] Recovered {applied} journaled contribution(s) into the ledger",
+              file=sys.stderr)
+
+
+def create_http_app():
+    """App factory used by uvicorn for the streamable HTTP transport"""
+    recover_journal()
+    start_policy_refresher()
+    return create_mcp_http_app(mcp)
 
 
 if __name__ == "__main__":
+    args = parse_server_args("TFSA Assistant MCP Server", default_port=8001)
     print("Starting TFSA Assistant MCP Server...")
+    # uvicorn runs these inside each streamable HTTP worker through create_http_app
+    if args.transport != "streamable-http":
+        recover_journal()
+        start_policy_refresher()
     # Initialize and run the server
-    mcp.run(transport='stdio')
+    run_server(mcp, "tfsa_mcp_server:create_http_app", args)
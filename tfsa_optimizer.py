@@ -0,0 +1,170 @@
+import argparse
+import datetime
+import os
+import time
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from dotenv import load_dotenv
+
+from tfsa_room import ANNUAL_LIMITS
+
+load_dotenv('.env')
+
+# Planning horizon for contribution suggestions, in months
+TFSA_ADVISOR_MONTHS = int(os.getenv("TFSA_ADVISOR_MONTHS", "24"))
+# Cash always left in checking; suggestions never dip below it
+TFSA_ADVISOR_CASH_BUFFER = float(os.getenv("TFSA_ADVISOR_CASH_BUFFER", "1000"))
+TFSA_ADVISOR_EXPECTED_RETURN = float(os.getenv("TFSA_ADVISOR_EXPECTED_RETURN", "0.05"))
+MAX_ADVISOR_MONTHS = 120
+
+
+# ======================
+# 1. Constraints
+# ======================
+def contribution_bounds(checking_balance: float, monthly_savings: Union[float, np.ndarray], current_room: float,
+                        months: int, start_year: int, start_month: int,
+                        cash_buffer: float = TFSA_ADVISOR_CASH_BUFFER) -> Tuple[np.ndarray, np.ndarray]:
+    """(cash, room): how much could have been contributed in total by the end of each month.
+
+    cash is checking above the buffer plus savings from earlier months; room is the current room
+    plus each January's annual limit. monthly_savings is a scalar, a (months,) array or a
+    (scenarios, months) array of projected income left after expenses (negative for months that
+    draw on checking).
+    """
+    savings = np.broadcast_to(np.asarray(monthly_savings, dtype=np.float64), (months,)) \
+        if np.ndim(monthly_savings) < 2 else np.asarray(monthly_savings, dtype=np.float64)
+    # A month's savings arrive by its end, so they can be contributed from the next month on
+    cash = checking_balance - cash_buffer + np.cumsum(savings, axis=-1) - savings
+
+    offsets = np.arange(months)
+    calendar = start_year + (start_month - 1 + offsets) // 12
+    january = ((start_month - 1 + offsets) % 12 == 0) & (offsets > 0)
+    room = current_room + np.cumsum(np.where(january, ANNUAL_LIMITS.limit(calendar), 0.0))
+    return cash, np.broadcast_to(room, cash.shape)
+
+
+def growth_weights(months: int, expected_return: float) -> np.ndarray:
+    """Tax-free growth by the end of the horizon per dollar contributed in each month"""
+    return (1 + expected_return) ** ((months - np.arange(months)) / 12) - 1
+
+
+# ======================
+# 2. Solver
+# ======================
+def optimize_contributions(cash: np.ndarray, room: np.ndarray) -> np.ndarray:
+    """Monthly contributions maximizing tax-free growth without overdrawing or over-contributing.
+
+    This is the DP over cumulative contributions C_t, with C_t <= cash_t, C_t <= room_t and C_t
+    non-decreasing. Every month a dollar waits costs it growth, so the optimal policy keeps C_t
+    as high as every later month can still afford: C_t = min over s >= t of min(cash_s, room_s),
+    a reverse running minimum. One vectorized pass over the last axis solves all scenarios.
+
+    A month whose cash is negative before any contribution is a shortfall the forecast has
+    anyway: nothing is contributed that month (C_t = C_t-1), and it does not bound earlier months,
+    or one such month would zero every suggestion before it. Every other month keeps its cash
+    bound, so checking only goes below the buffer in months the forecast already does.
+    """
+    shortfall = cash < 0
+    # Room only grows, so a shortfall month's room never binds tighter than C_t-1's month did
+    bound = np.where(shortfall, np.inf, np.maximum(np.minimum(cash, room), 0.0))
+    total = np.minimum.accumulate(bound[..., ::-1], axis=-1)[..., ::-1]
+    # Shortfall months carry the total of the last month that could contribute (0 before any)
+    months = np.arange(cash.shape[-1])
+    last = np.maximum.accumulate(np.where(shortfall, -1, months), axis=-1)
+    total = np.where(last >= 0, np.take_along_axis(total, np.maximum(last, 0), axis=-1), 0.0)
+    return np.diff(total, axis=-1, prepend=0.0)
+
+
+def plan_contributions(profile: Dict, current_room: float, months: int = TFSA_ADVISOR_MONTHS,
+                       expected_return: float = TFSA_ADVISOR_EXPECTED_RETURN,
+                       cash_buffer: float = TFSA_ADVISOR_CASH_BUFFER, monthly_savings: Optional[float] = None,
+                       start: Optional[datetime.date] = None) -> Dict:
+    """Best contribution schedule for a profile, starting with a suggested amount for this month.
+
+    profile needs checking_balance and may have monthly_savings (projected income left after
+    expenses). Returns the monthly schedule with room and checking left after each month, the
+    total contributed and the projected tax-free growth by the end of the horizon.
+    """
+    if not 1 <= months <= MAX_ADVISOR_MONTHS:
+        raise ValueError(f"months must be between 1 and {MAX_ADVISOR_MONTHS}")
+    started = time.perf_counter()
+    start = start or datetime.date.today()
+    if monthly_savings is None:
+        monthly_savings = profile.get("monthly_savings", 0.0)
+    cash, room = contribution_bounds(profile.get("checking_balance", 0.0), monthly_savings, current_room,
+                                     months, start.year, start.month, cash_buffer)
+    contributions = optimize_contributions(cash, room)
+    total = np.cumsum(contributions)
+    labels = [f"{start.year + (start.month - 1 + m) // 12}-{(start.month - 1 + m) % 12 + 1:02d}"
+              for m in range(months)]
+    return {
+        "assumptions": {
+            "months": months,
+            "expected_return": expected_return,
+            "checking_balance": profile.get("checking_balance", 0.0),
+            "monthly_savings": monthly_savings,
+            "cash_buffer": cash_buffer,
+            "starting_room": current_room,
+        },
+        "suggested_amount": round(float(contributions[0]), 2),
+        "month": labels,
+        "contribution": contributions.round(2).tolist(),
+        "room_left": (room - total).round(2).tolist(),
+        "checking_left": (cash - total + cash_buffer).round(2).tolist(),
+        "total_contributions": round(float(total[-1]), 2),
+        "projected_growth": round(float(contributions @ growth_weights(months, expected_return)), 2),
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+    }
+
+
+# ======================
+# 3. Benchmark
+# ======================
+def _grid_dp(cash: np.ndarray, room: np.ndarray, weights: np.ndarray, step: float) -> float:
+    """Textbook DP over cumulative contributions on a `step` grid, for checking the solver"""
+    shortfall = cash < 0
+    bound = np.floor(np.maximum(np.minimum(cash, room), 0.0) / step).astype(np.int64)
+    levels = np.arange(bound[~shortfall].max(initial=0) + 1)
+    # value[k]: best growth from month t on, having contributed k steps so far
+    value = np.zeros(len(levels))
+    for t in range(len(weights) - 1, -1, -1):
+        if shortfall[t]:
+            # Nothing is contributed in a shortfall month, so the level carries over unchanged
+            continue
+        # Choosing to reach level j >= k this month earns weights[t] * (j - k) * step
+        gain = weights[t] * step * levels + np.where(levels <= bound[t], value, -np.inf)
+        best_from = np.maximum.accumulate(gain[::-1])[::-1]
+        value = best_from - weights[t] * step * levels
+    return float(value[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the TFSA contribution optimizer")
+    parser.add_argument("--months", type=int, nargs="*", default=[12, 24, 60])
+    parser.add_argument("--scenarios", type=int, default=100_000)
+    args = parser.parse_args()
+
+    profile = {"checking_balance": 8500.0, "monthly_savings": 1200.0}
+    for months in args.months:
+        plan_contributions(profile, 3000.0, months)  # warm-up
+        timings = sorted(plan_contributions(profile, 3000.0, months)["elapsed_ms"] for _ in range(50))
+        plan = plan_contributions(profile, 3000.0, months)
+        print(f"{months:>3} months: median {timings[25]:.3f} ms, suggest ${plan['suggested_amount']:,.2f} now, "
+              f"${plan['total_contributions']:,.2f} in total, ${plan['projected_growth']:,.2f} projected growth")
+
+    rng = np.random.default_rng(0)
+    today = datetime.date.today()
+    savings = rng.normal(800, 900, (args.scenarios, 60)).round(-2)
+    start = time.perf_counter()
+    cash, room = contribution_bounds(5000.0, savings, 3000.0, 60, today.year, today.month)
+    contributions = optimize_contributions(cash, room)
+    print(f"{args.scenarios:,} savings scenarios x 60 months: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # The closed-form policy must match a brute-force DP on a $100 grid
+    weights = growth_weights(60, 0.05)
+    for row in range(20):
+        grid = np.floor(np.minimum(cash[row], room[row]) / 100) * 100
+        solved = optimize_contributions(grid, grid) @ weights
+        assert abs(solved - _grid_dp(grid, grid, weights, 100.0)) < 1e-6, row
+    print("Matches the grid DP on 20 scenarios")
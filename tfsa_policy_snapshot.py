@@ -0,0 +1,205 @@
+import contextlib
+import datetime
+import fcntl
+import json
+import os
+import re
+import sys
+import threading
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv('.env')
+
+TFSA_POLICY_SNAPSHOT_PATH = os.getenv("TFSA_POLICY_SNAPSHOT_PATH", ".cache/policy_snapshots.json")
+TFSA_POLICY_REFRESH_SECONDS = float(os.getenv("TFSA_POLICY_REFRESH_SECONDS", "21600"))
+
+# Plausible bounds for an annual TFSA dollar limit; anything else is a bad extraction
+MIN_ANNUAL_LIMIT = 1000
+MAX_ANNUAL_LIMIT = 50000
+
+
+# ======================
+# 1. Validation
+# ======================
+def parse_limit(value) -> Optional[float]:
+    """Extract a dollar amount such as '$7,000' from an LLM-extracted field"""
+    match = re.search(r'\$?(\d{1,3}(?:,\d{3})*(?:\.\d+)?)', str(value))
+    return float(match.group(1).replace(',', '')) if match else None
+
+
+def validate_policy_data(policy_data: Dict) -> Dict:
+    """Normalized policy_data, or ValueError when the extraction is unusable"""
+    if not isinstance(policy_data, dict) or "error" in policy_data:
+        raise ValueError(f"Policy extraction failed: {policy_data}")
+
+    current_limit = parse_limit(policy_data.get("current_limit", ""))
+    if current_limit is None or not MIN_ANNUAL_LIMIT <= current_limit <= MAX_ANNUAL_LIMIT:
+        raise ValueError(f"Implausible current_limit: {policy_data.get('current_limit')!r}")
+
+    for field in ("penalty_info", "withdrawal_rules"):
+        if not isinstance(policy_data.get(field), str) or not policy_data[field].strip():
+            raise ValueError(f"Missing {field}")
+
+    return {
+        "current_limit": f"${current_limit:,.0f}",
+        "penalty_info": policy_data["penalty_info"].strip(),
+        "withdrawal_rules": policy_data["withdrawal_rules"].strip(),
+    }
+
+
+# ======================
+# 2. Snapshot Store
+# ======================
+class PolicySnapshotStore:
+    """Versioned, validated policy snapshots persisted to a JSON file.
+
+    Readers get the last good snapshot with a single attribute read; a failed refresh never
+    replaces it. Several server processes can share the file: publish() re-reads it under an
+    exclusive file lock and only adds a version when the policy content actually changed, so
+    versions never race and unchanged refreshes do not invalidate materialized room.
+    """
+
+    def __init__(self, path: Optional[str] = TFSA_POLICY_SNAPSHOT_PATH, history: int = 10):
+        self.path = path
+        self.history = history
+        self._lock = threading.Lock()
+        self._snapshots: List[Dict] = []
+        self._current: Optional[Dict] = None
+        self._loaded = False
+
+    def _load(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                self._snapshots = json.load(f)
+            self._current = self._snapshots[-1] if self._snapshots else None
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        # Read on first use so importing this module does no I/O
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+
+    def current(self, tax_year: Optional[int] = None) -> Optional[Dict]:
+        """Latest snapshot, optionally only if it is for the given tax year"""
+        self._ensure_loaded()
+        snapshot = self._current
+        if snapshot is None or (tax_year is not None and snapshot["tax_year"] != tax_year):
+            return None
+        return snapshot
+
+    def publish(self, policy_data: Dict, source: str = "search") -> Dict:
+        """Validate and store a new snapshot version; returns the current snapshot if unchanged"""
+        snapshot = {
+            "tax_year": datetime.datetime.now().year,
+            "fetched_at": datetime.datetime.now().isoformat(),
+            "source": source,
+            "policy_data": validate_policy_data(policy_data),
+        }
+        with self._lock, self._file_lock():
+            # Another process may have published since we last looked
+            self._load()
+            latest = self._current
+            if latest and (latest["tax_year"], latest["policy_data"]) == (snapshot["tax_year"],
+                                                                        snapshot["policy_data"]):
+                return latest
+            snapshot["version"] = latest["version"] + 1 if latest else 1
+            self._snapshots = (self._snapshots + [snapshot])[-self.history:]
+            self._persist()
+            self._current = snapshot
+        return snapshot
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        if not self.path:
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _persist(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._snapshots, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def versions(self) -> List[Dict]:
+        self._ensure_loaded()
+        return list(self._snapshots)
+
+
+policy_snapshots = PolicySnapshotStore()
+
+
+# ======================
+# 3. Background Refresher
+# ======================
+class PolicySnapshotRefresher:
+    """Runs the search + LLM extraction on a schedule and publishes validated snapshots"""
+
+    def __init__(self, store: PolicySnapshotStore, fetch: Callable[[], Dict],
+                 interval: float = TFSA_POLICY_REFRESH_SECONDS):
+        self.store = store
+        self.fetch = fetch
+        self.interval = interval
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh_once(self) -> bool:
+        # Logged to stderr: on the stdio transport stdout carries the MCP protocol
+        try:
+            previous = self.store.current()
+            snapshot = self.store.publish(self.fetch())
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"[{datetime.datetime.now().isoformat()}] Policy refresh failed, keeping last good snapshot: {e}",
+                  file=sys.stderr)
+            return False
+        self.refreshes += 1
+        if previous is not None and snapshot["version"] == previous["version"]:
+            print(f"[{datetime.datetime.now().isoformat()}] Policy unchanged, keeping snapshot v{snapshot['version']}",
+                  file=sys.stderr)
+        else:
+            print(f"[{datetime.datetime.now().isoformat()}] Policy snapshot v{snapshot['version']} published: "
+                  f"{snapshot['policy_data']['current_limit']}", file=sys.stderr)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="policy-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        current = self.store.current()
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval_seconds": self.interval,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "current_version": current["version"] if current else None,
+            "current_fetched_at": current["fetched_at"] if current else None,
+        }
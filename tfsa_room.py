@@ -0,0 +1,132 @@
+import datetime
+import json
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv('.env')
+
+# Annual dollar limits by year. New years are added to this file (or TFSA_ANNUAL_LIMITS, a JSON
+# object such as {"2027": 7500}) without a code change
+TFSA_ANNUAL_LIMITS_FILE = os.getenv(
+    "TFSA_ANNUAL_LIMITS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tfsa_annual_limits.json"))
+
+
+# ======================
+# 1. Annual Limit Table
+# ======================
+class AnnualLimitTable:
+    """Annual TFSA dollar limits precomputed into prefix sums.
+
+    Accumulated room between two years is an O(1) lookup, and every lookup also accepts NumPy
+    arrays so batch code shares the same table. Years after the last configured year reuse its
+    limit; years before the first one (2009) have no room.
+    """
+
+    def __init__(self, limits: Dict[int, float]):
+        years = sorted(limits)
+        if years != list(range(years[0], years[-1] + 1)):
+            raise ValueError(f"Annual limits must cover consecutive years, got {years}")
+        self.first_year = years[0]
+        self.last_year = years[-1]
+        self.limits = np.array([limits[year] for year in years], dtype=np.float64)
+        # cumulative[i] = sum of the limits for years before first_year + i
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self.limits)))
+
+    def limit(self, year):
+        """Annual limit for a year (scalar or array)"""
+        index = np.clip(np.asarray(year) - self.first_year, 0, len(self.limits) - 1)
+        limit = np.where(np.asarray(year) < self.first_year, 0.0, self.limits[index])
+        return float(limit) if limit.ndim == 0 else limit
+
+    def room_before(self, year):
+        """Sum of the annual limits for every year before `year` (scalar or array)"""
+        year = np.asarray(year)
+        index = np.clip(year - self.first_year, 0, len(self.limits))
+        beyond = np.maximum(year - self.last_year - 1, 0) * self.limits[-1]
+        room = self.cumulative[index] + beyond
+        return float(room) if room.ndim == 0 else room
+
+    def accumulated_room(self, first_year, end_year):
+        """Sum of the annual limits for first_year <= year < end_year (scalar or array)"""
+        return self.room_before(end_year) - self.room_before(np.minimum(first_year, end_year))
+
+    def ranges(self) -> List[Tuple[int, int, float]]:
+        """(start_year, end_year, limit) for each run of years sharing the same limit"""
+        runs = []
+        for offset, limit in enumerate(self.limits):
+            year = self.first_year + offset
+            if runs and runs[-1][2] == limit:
+                runs[-1] = (runs[-1][0], year, limit)
+            else:
+                runs.append((year, year, limit))
+        return runs
+
+    def describe(self, prefix: str = "Annual limit for ") -> str:
+        """One line per range, e.g. 'Annual limit for 2009-2012: $5000'"""
+        return "\n".join(
+            f"{prefix}{start if start == end else f'{start}-{end}'}: ${limit:.0f}"
+            for start, end, limit in self.ranges())
+
+
+def load_annual_limit_table(path: str = TFSA_ANNUAL_LIMITS_FILE) -> AnnualLimitTable:
+    with open(path) as f:
+        limits = {int(year): float(limit) for year, limit in json.load(f).items()}
+    overrides = os.getenv("TFSA_ANNUAL_LIMITS")
+    if overrides:
+        limits.update({int(year): float(limit) for year, limit in json.loads(overrides).items()})
+    return AnnualLimitTable(limits)
+
+
+ANNUAL_LIMITS = load_annual_limit_table()
+
+
+# ======================
+# 2. Single Profile
+# ======================
+def room_start_year(profile: dict, current_year: int):
+    """First year that accumulates room: the later of the first TFSA year and the year the user
+    turned 18, and never before the first configured limit. Accepts columnar profiles too."""
+    year = np.maximum(np.maximum(profile["first_tfsa_year"], current_year - profile["age"] + 18),
+                      ANNUAL_LIMITS.first_year)
+    return int(year) if np.ndim(year) == 0 else year
+
+
+def calculate_contribution_room(profile: dict, current_limit: float = None, current_year: int = None) -> float:
+    """Available contribution room for one profile (the calculation_agent formula)"""
+    current_year = current_year or datetime.datetime.now().year
+    if current_limit is None:
+        current_limit = ANNUAL_LIMITS.limit(current_year)
+
+    # Calculate total accumulated room
+    first_year = room_start_year(profile, current_year)
+    total_room = ANNUAL_LIMITS.accumulated_room(first_year, current_year)
+
+    # Add current year's limit
+    total_room += current_limit
+
+    # Calculate available room
+    used_room = profile["past_contributions"] + profile["current_year_contributions"]
+    return total_room - used_room + profile["withdrawals_last_year"]
+
+
+# ======================
+# 3. Columnar Batch
+# ======================
+def calculate_contribution_room_batch(profiles: dict, current_limit: float = None,
+                                      current_year: int = None) -> np.ndarray:
+    """Vectorized calculate_contribution_room over columnar profile data.
+
+    profiles maps each profile field used by the formula to a NumPy array (one entry per user).
+    """
+    current_year = current_year or datetime.datetime.now().year
+    if current_limit is None:
+        current_limit = ANNUAL_LIMITS.limit(current_year)
+
+    first_year = room_start_year(profiles, current_year)
+    total_room = ANNUAL_LIMITS.accumulated_room(first_year, current_year) + current_limit
+
+    used_room = profiles["past_contributions"] + profiles["current_year_contributions"]
+    return total_room - used_room + profiles["withdrawals_last_year"]
@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv('.env')
+
+# A file every server process shares, so a room materialized or updated by one worker is a hit for
+# the others. ":memory:" keeps a private store per process (entries are still checked against the ledger)
+TFSA_ROOM_STORE_PATH = os.getenv("TFSA_ROOM_STORE_PATH") or ".cache/contribution_room.sqlite"
+
+# (seq, byte offset) of the last journal record the ledger had applied; offset None for legacy ledgers
+JournalPosition = Tuple[int, Optional[int]]
+
+
+class ContributionRoomStore:
+    """Materialized TFSA contribution room per (user, tax year), updated incrementally.
+
+    An entry records the policy snapshot version and annual limit it was computed with; reading
+    it under a different version or limit counts as stale and recomputes. It also records the
+    ledger's journal position at the time, because every process applies contributions to the
+    shared ledger: once the ledger has moved on, the entry is only a hit if no contribution by
+    that user was applied in between (whoever applied it), and otherwise it is recomputed. A
+    successful contribution subtracts from the stored room, and withdrawals recorded during a
+    year are re-added when the next year's room is derived from it.
+    """
+
+    def __init__(self, path: str = TFSA_ROOM_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.ledger_stale = 0
+        self.rollovers = 0
+        self.contributions = 0
+        self.withdrawals = 0
+        self.last_hit_age = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use (under self._lock) so importing this module does no I/O
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(room)")}
+            if columns and "journal_seq" not in columns:
+                # Entries from before they were tagged with a journal position can't be checked; drop them
+                self._db.execute("DROP TABLE room")
+            self._db.execute("CREATE TABLE IF NOT EXISTS room ("
+                             "user_id TEXT NOT NULL, tax_year INTEGER NOT NULL, room REAL NOT NULL, "
+                             "withdrawals REAL NOT NULL DEFAULT 0, policy_version INTEGER, "
+                             "current_limit REAL NOT NULL, computed_at REAL NOT NULL, updated_at REAL NOT NULL, "
+                             "journal_seq INTEGER NOT NULL, journal_offset INTEGER, "
+                             "PRIMARY KEY (user_id, tax_year))")
+            self._db.commit()
+        return self._db
+
+    def _row(self, db, user_id: str, tax_year: int) -> Optional[tuple]:
+        return db.execute("SELECT room, withdrawals, policy_version, current_limit, computed_at, journal_seq, "
+                          "journal_offset FROM room WHERE user_id = ? AND tax_year = ?", (user_id, tax_year)).fetchone()
+
+    def _put(self, db, user_id: str, tax_year: int, room: float, policy_version: Optional[int],
+             current_limit: float, position: JournalPosition):
+        now = time.time()
+        db.execute("INSERT OR REPLACE INTO room (user_id, tax_year, room, withdrawals, policy_version, "
+                   "current_limit, computed_at, updated_at, journal_seq, journal_offset) "
+                   "VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?, ?)",
+                   (user_id, tax_year, room, policy_version, current_limit, now, now, *position))
+        db.commit()
+
+    @staticmethod
+    def _current(row: tuple, user_id: str, position: JournalPosition,
+                 changed: Optional[Callable[[str, JournalPosition], bool]]) -> bool:
+        """Whether an entry still reflects the ledger at position"""
+        if row[5] >= position[0]:
+            return True
+        if changed is None or row[6] is None:
+            return False
+        return not changed(user_id, (row[5], row[6]))
+
+    def get_or_compute(self, user_id: str, tax_year: int, policy_version: Optional[int], current_limit: float,
+                       compute: Callable[[], float], position: JournalPosition = (0, 0),
+                       changed: Optional[Callable[[str, JournalPosition], bool]] = None) -> float:
+        """Stored room when it matches the current policy and ledger, otherwise compute() and store it.
+
+        position is the ledger's journal position that compute() sees (TransactionLedger.snapshot()).
+        An entry tagged with an earlier position is still a hit when changed(user_id, entry_position)
+        finds no contribution by the user since then; it is re-tagged with position so the next read
+        skips that check.
+        """
+        with self._lock:
+            db = self._connection()
+            row = self._row(db, user_id, tax_year)
+            if row is not None and row[2] == policy_version and row[3] == current_limit:
+                if self._current(row, user_id, position, changed):
+                    self.hits += 1
+                    self.last_hit_age = time.time() - row[4]
+                    if row[5] < position[0]:
+                        db.execute("UPDATE room SET journal_seq = ?, journal_offset = ? "
+                                   "WHERE user_id = ? AND tax_year = ? AND journal_seq = ?",
+                                   (*position, user_id, tax_year, row[5]))
+                        db.commit()
+                    return row[0]
+                self.ledger_stale += 1
+                room = compute()
+            elif row is not None:
+                self.stale += 1
+                room = compute()
+            else:
+                previous = self._row(db, user_id, tax_year - 1)
+                if previous is not None and self._current(previous, user_id, position, changed):
+                    # Year boundary: unused room carries over and last year's withdrawals come back
+                    self.rollovers += 1
+                    room = previous[0] + previous[1] + current_limit
+                else:
+                    self.misses += 1
+                    room = compute()
+            self._put(db, user_id, tax_year, room, policy_version, current_limit, position)
+            return room
+
+    def apply_contribution(self, user_id: str, tax_year: int, amount: float, since: JournalPosition,
+                           position: JournalPosition) -> Optional[float]:
+        """Subtract a contribution the ledger applied between journal positions since and position.
+
+        Only an entry tagged with since (the ledger just before the contribution) is updated, and it
+        is re-tagged with position; any other entry is left for the next read to recompute. Returns
+        the new room, or None when no entry was updated.
+        """
+        with self._lock:
+            db = self._connection()
+            updated = db.execute("UPDATE room SET room = room - ?, journal_seq = ?, journal_offset = ?, updated_at = ? "
+                                 "WHERE user_id = ? AND tax_year = ? AND journal_seq = ?",
+                                 (amount, *position, time.time(), user_id, tax_year, since[0])).rowcount
+            db.commit()
+            if not updated:
+                return None
+            self.contributions += 1
+            return self._row(db, user_id, tax_year)[0]
+
+    def record_withdrawal(self, user_id: str, tax_year: int, amount: float) -> Optional[float]:
+        """Remember a withdrawal so it is re-added to next year's room (not this year's)"""
+        with self._lock:
+            db = self._connection()
+            updated = db.execute("UPDATE room SET withdrawals = withdrawals + ?, updated_at = ? "
+                                 "WHERE user_id = ? AND tax_year = ?", (amount, time.time(), user_id, tax_year)).rowcount
+            db.commit()
+            if not updated:
+                return None
+            self.withdrawals += 1
+            return self._row(db, user_id, tax_year)[0]
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop one user's rooms, or every room"""
+        with self._lock:
+            db = self._connection()
+            if user_id is None:
+                db.execute("DELETE FROM room")
+            else:
+                db.execute("DELETE FROM room WHERE user_id = ?", (user_id,))
+            db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, oldest = self._connection().execute("SELECT COUNT(*), MIN(computed_at) FROM room").fetchone()
+        reads = self.hits + self.misses + self.stale + self.ledger_stale + self.rollovers
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "ledger_stale": self.ledger_stale,
+            "rollovers": self.rollovers,
+            "hit_rate": self.hits / reads if reads else 0.0,
+            "contributions_applied": self.contributions,
+            "withdrawals_recorded": self.withdrawals,
+            "entries": entries,
+            "oldest_entry_age_seconds": time.time() - oldest if oldest else None,
+            "last_hit_age_seconds": self.last_hit_age,
+            "path": self.path,
+        }
+
+
+room_store = ContributionRoomStore()
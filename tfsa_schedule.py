@@ -0,0 +1,170 @@
+import argparse
+import datetime
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tfsa_room import ANNUAL_LIMITS
+
+# CRA: 1% per month on the highest excess TFSA amount in that month
+OVER_CONTRIBUTION_PENALTY_RATE = 0.01
+MAX_SCHEDULE_MONTHS = 120
+
+
+# ======================
+# 1. Schedule Parsing
+# ======================
+def month_offset(label: str, start_year: int, start_month: int) -> int:
+    """Months from the start month to a 'YYYY-MM' label"""
+    year, month = (int(part) for part in label.split("-")[:2])
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month {label!r}")
+    return (year - start_year) * 12 + month - start_month
+
+
+def schedule_arrays(schedules: List[List[Dict]], start_year: int, start_month: int,
+                    months: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(contributions, withdrawals), each (schedules, months), from lists of planned events.
+
+    An event is {"month": "YYYY-MM", "contribution": amount} and/or {"withdrawal": amount}.
+    """
+    contributions = np.zeros((len(schedules), months))
+    withdrawals = np.zeros((len(schedules), months))
+    for row, events in enumerate(schedules):
+        for event in events:
+            offset = month_offset(event["month"], start_year, start_month)
+            if offset < 0:
+                raise ValueError(f"Event month {event['month']} is before {start_year}-{start_month:02d}")
+            if offset >= months:
+                raise ValueError(f"Event month {event['month']} is outside the {months}-month schedule")
+            contributions[row, offset] += float(event.get("contribution", 0.0))
+            withdrawals[row, offset] += float(event.get("withdrawal", 0.0))
+    if (contributions < 0).any() or (withdrawals < 0).any():
+        raise ValueError("Contribution and withdrawal amounts must be non-negative")
+    return contributions, withdrawals
+
+
+def schedule_months(schedules: List[List[Dict]], start_year: int, start_month: int, months: int) -> int:
+    """Horizon long enough for every event and at least `months`"""
+    last = max((month_offset(event["month"], start_year, start_month)
+                for events in schedules for event in events), default=0)
+    return min(max(months, last + 1), MAX_SCHEDULE_MONTHS)
+
+
+# ======================
+# 2. Vectorized Simulation
+# ======================
+def simulate_schedules(contributions: np.ndarray, withdrawals: np.ndarray, starting_room: float,
+                       start_year: int, start_month: int, withdrawals_this_year: float = 0.0) -> Dict[str, np.ndarray]:
+    """Month-by-month room, excess and penalty for many candidate schedules at once.
+
+    Row s of contributions/withdrawals is one schedule. Contributions use room immediately.
+    A withdrawal first cancels any excess; the rest is re-added to room on January 1 with the
+    new annual limit (never in the year it is taken). The penalty is 1% of the month's highest
+    excess, taken after the month's contributions and before its withdrawals. All schedules move
+    through the months together.
+    """
+    count, months = contributions.shape
+    room = np.full(count, float(starting_room))
+    re_add = np.full(count, float(withdrawals_this_year))
+    room_end = np.empty((count, months))
+    excess = np.empty((count, months))
+    labels = []
+    for m in range(months):
+        year, month = divmod(start_month - 1 + m, 12)
+        year, month = start_year + year, month + 1
+        labels.append(f"{year}-{month:02d}")
+        if month == 1 and m > 0:
+            room += ANNUAL_LIMITS.limit(year) + re_add
+            re_add[:] = 0.0
+        room -= contributions[:, m]
+        excess[:, m] = np.maximum(-room, 0.0)
+        corrected = np.minimum(withdrawals[:, m], excess[:, m])
+        room += corrected
+        re_add += withdrawals[:, m] - corrected
+        room_end[:, m] = room
+    penalty = OVER_CONTRIBUTION_PENALTY_RATE * excess
+    return {
+        "month": np.array(labels),
+        "room": room_end,
+        "excess": excess,
+        "penalty": penalty,
+        "total_penalty": penalty.sum(axis=1),
+        "peak_excess": excess.max(axis=1),
+        "months_in_excess": (excess > 0).sum(axis=1),
+        "final_room": room,
+        "pending_re_add": re_add,
+        "total_contributions": contributions.sum(axis=1),
+        "total_withdrawals": withdrawals.sum(axis=1),
+    }
+
+
+def compare_schedules(schedules: List[List[Dict]], starting_room: float, months: int = 24,
+                      detail: bool = False, start: Optional[datetime.date] = None,
+                      withdrawals_this_year: float = 0.0) -> Dict:
+    """simulate_schedules for planned-event schedules, as a JSON-ready comparison.
+
+    withdrawals_this_year are withdrawals already made in the start month's year; they come back
+    as room next January along with the simulated ones.
+    """
+    if not schedules:
+        raise ValueError("At least one schedule is required")
+    start = start or datetime.date.today()
+    months = schedule_months(schedules, start.year, start.month, months)
+    contributions, withdrawals = schedule_arrays(schedules, start.year, start.month, months)
+    result = simulate_schedules(contributions, withdrawals, starting_room, start.year, start.month,
+                                withdrawals_this_year)
+
+    summaries = []
+    for s in range(len(schedules)):
+        summary = {
+            "schedule": s,
+            "total_penalty": round(float(result["total_penalty"][s]), 2),
+            "peak_excess": round(float(result["peak_excess"][s]), 2),
+            "months_in_excess": int(result["months_in_excess"][s]),
+            "final_room": round(float(result["final_room"][s]), 2),
+            "pending_re_add": round(float(result["pending_re_add"][s]), 2),
+            "total_contributions": round(float(result["total_contributions"][s]), 2),
+            "total_withdrawals": round(float(result["total_withdrawals"][s]), 2),
+        }
+        if detail:
+            summary["monthly"] = [
+                {"month": label, "room": round(float(room), 2), "excess": round(float(excess), 2),
+                 "penalty": round(float(penalty), 2)}
+                for label, room, excess, penalty in zip(result["month"], result["room"][s], result["excess"][s],
+                                                        result["penalty"][s])]
+        summaries.append(summary)
+
+    # Lowest penalty first; among equals, the one that gets the most money in
+    best = min(range(len(schedules)),
+               key=lambda s: (result["total_penalty"][s], -result["total_contributions"][s]))
+    return {
+        "starting_room": starting_room,
+        "withdrawals_this_year": withdrawals_this_year,
+        "months": months,
+        "first_month": str(result["month"][0]),
+        "schedules": summaries,
+        "best_schedule": best,
+    }
+
+
+# ======================
+# 3. Benchmark
+# ======================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vectorized TFSA schedule simulation")
+    parser.add_argument("--schedules", type=int, nargs="*", default=[50, 10_000, 100_000])
+    parser.add_argument("--months", type=int, default=60)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    today = datetime.date.today()
+    for count in args.schedules:
+        contributions = rng.choice([0.0, 500.0, 1000.0, 7000.0], (count, args.months), p=[0.7, 0.15, 0.1, 0.05])
+        withdrawals = rng.choice([0.0, 1000.0, 5000.0], (count, args.months), p=[0.9, 0.07, 0.03])
+        start = time.perf_counter()
+        result = simulate_schedules(contributions, withdrawals, 7000.0, today.year, today.month)
+        elapsed = time.perf_counter() - start
+        print(f"{count:>7,} schedules x {args.months} months: {elapsed * 1000:7.1f} ms, "
+              f"{(result['total_penalty'] > 0).mean():.0%} incur a penalty")
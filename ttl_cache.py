@@ -0,0 +1,180 @@
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+MISSING = object()
+
+
+class TieredCache:
+    """In-memory LRU tier in front of an optional SQLite tier, with a per-entry TTL.
+
+    Values must be JSON-serializable. The SQLite tier survives restarts; entries read from it are
+    promoted back into memory. aget()/aset() serve coroutines: memory hits are answered inline and
+    SQLite reads and writes run in a worker thread, so the event loop never waits on disk. The
+    SQLite tier has its own lock, so memory lookups never queue behind disk I/O either.
+    """
+
+    def __init__(self, name: str, maxsize: int = 256, ttl: Optional[float] = None, path: Optional[str] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connection(self) -> Optional["sqlite3.Connection"]:
+        # Opened on first use (under self._db_lock) so importing a module that declares a cache does no I/O
+        if self._db is None and self.path:
+            import sqlite3
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache "
+                             "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+            self._db.commit()
+        return self._db
+
+    def _get_memory(self, key: str, now: float) -> Any:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+            if not self.path:
+                self.misses += 1
+            return MISSING
+
+    def _get_disk(self, key: str, now: float) -> Any:
+        with self._db_lock:
+            row = self._connection().execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if key in self._memory:
+                # Set while we were reading the disk; that value is newer than the row
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key][0]
+            if row is not None and (row[1] is None or row[1] > now):
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                self.disk_hits += 1
+                return value
+            self.misses += 1
+            return MISSING
+
+    def _set_disk(self, key: str, value: Any, expires_at: Optional[float]):
+        with self._db_lock:
+            db = self._connection()
+            db.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                       (key, json.dumps(value), expires_at))
+            db.commit()
+
+    def peek(self, key: str) -> Any:
+        """Memory-tier value without touching disk or the hit counters, or MISSING"""
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None and (entry[1] is None or entry[1] > time.time()):
+            return entry[0]
+        return MISSING
+
+    def get(self, key: str) -> Any:
+        """Cached value, or MISSING when absent or expired"""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is MISSING and self.path:
+            return self._get_disk(key, now)
+        return value
+
+    async def aget(self, key: str) -> Any:
+        """get() for coroutines: the SQLite tier is read in a worker thread"""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is MISSING and self.path:
+            return await asyncio.to_thread(self._get_disk, key, now)
+        return value
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self.path:
+            self._set_disk(key, value, expires_at)
+
+    async def aset(self, key: str, value: Any):
+        """set() for coroutines: the SQLite tier is written in a worker thread"""
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self.path:
+            await asyncio.to_thread(self._set_disk, key, value, expires_at)
+
+    def _remember(self, key: str, value: Any, expires_at: Optional[float]):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM cache")
+                db.commit()
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "cache": self.name,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "ttl_seconds": self.ttl,
+            "path": self.path,
+        }
+
+
+def cached(cache: TieredCache, key: Callable[..., str]):
+    """Decorator caching a sync or async function's result under key(*args, **kwargs)"""
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = key(*args, **kwargs)
+                value = await cache.aget(cache_key)
+                if value is MISSING:
+                    value = await fn(*args, **kwargs)
+                    await cache.aset(cache_key, value)
+                return value
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            value = cache.get(cache_key)
+            if value is MISSING:
+                value = fn(*args, **kwargs)
+                cache.set(cache_key, value)
+            return value
+
+        return wrapper
+
+    return decorator